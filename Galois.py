@@ -3,10 +3,31 @@ from __future__ import print_function
 Computations involving finite fields.
 """
 import copy
+import operator
+import os
+from array import array
+from concurrent.futures import ProcessPoolExecutor
 from functools import reduce
+from itertools import islice
+
+import gf2
+from cache import field_key
+from linalg import PLU
+from matmul import multiply
+from matrices import GFMatrix, GFVector, _is_compact
+from tracing import PrintTracer
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
 
 __author__ = "Jerry Yin"
 
+# Fields larger than this do not get log/antilog/inverse lookup tables and fall
+# back to computing each result directly.  Each table holds about one Python
+# object pointer per field element.
+TABLE_LIMIT = 1 << 16
 
 class GF:
     """
@@ -16,28 +37,177 @@ class GF:
     answer just as much as what the answer is.  You can change the verbose
     member any time after initialization as well.
 
+    The steps are reported to a tracer (see the tracing module); verbose=True
+    uses a PrintTracer.  Pass another tracer, such as a ListTracer, to record
+    the steps as structured events instead.  With no tracer, no steps are
+    reported at all.
+
     Usage:
 
         GF2 = GF(2)
         GF4 = GF(4, verbose=True)
         GF7 = GF(7)
         GF7.verbose = True
+        GF256 = GF(256, poly=0x11d)
+        GF3 = GF(3, tracer=ListTracer())
+
+    Vectors and matrices may also be given as NumPy integer arrays, in which
+    case the vector operations work on whole arrays at once and return arrays,
+    or as the compact GFVector and GFMatrix types of the matrices module.
+
+    Fields of prime size p hold the integers 0 to p - 1.  Fields of size p**m
+    hold the integers 0 to p**m - 1, whose base-p digits are the coefficients
+    of a polynomial over GF(p) reduced modulo an irreducible polynomial poly of
+    degree m.  poly is encoded the same way, leading coefficient included, so
+    x**8 + x**4 + x**3 + x**2 + 1 is 0x11d.  If poly is not given, a standard
+    one is chosen.
+
+    By default multiplication, inverses and powers are looked up in tables
+    built from a primitive element when the field is created.  Pass
+    tables=False, or a smaller table_limit, to skip building them.  Pass a
+    TableCache (see the cache module) as cache to keep the tables on disk, so
+    that later fields of the same size and poly map them in instead; codes
+    over the field keep their artifacts there too.
     """
     size = 0
-    verbose = False
     elements = []
+    poly = None
+    tracer = None
+    cache = None
+    table_limit = TABLE_LIMIT
 
-    def __init__(self, size, verbose=False):
+    def __init__(self, size, verbose=False, tables=True,
+                 table_limit=TABLE_LIMIT, poly=None, tracer=None, cache=None):
         self.size = size
-        self.verbose = verbose
+        self.tracer = tracer
+        self.cache = cache
+        self.table_limit = table_limit
+        if verbose:
+            self.verbose = True
         self._modular = _is_prime(size)
         self._digits = len(str(size - 1))
         if self._modular:
-            self.elements = list(range(0, self.size))
-        elif self.size == 4:
-            self.elements = [0, 1, "a", "b"]
+            self._char = size
+            self._degree = 1
+        else:
+            power = _prime_power(size)
+            if power is None:
+                raise ValueError("No field has %s elements." % size)
+            (self._char, self._degree) = power
+            if poly is None:
+                poly = _default_poly(self._char, self._degree)
+            elif not size <= poly < 2 * size or poly % self._char == 0:
+                raise ValueError("poly must be monic of degree %d with a "
+                                 "nonzero constant term." % self._degree)
+            elif not _is_irreducible(poly, self._char, self._degree):
+                raise ValueError("poly %s is not irreducible." % poly)
+            self.poly = poly
+        self.elements = list(range(0, self.size))
+
+        self._exp = None
+        self._log = None
+        self._inv = None
+        self._zech = None
+        self._np_exp = None
+        self._np_log = None
+        if tables and size <= table_limit:
+            if cache is None or not self._load_tables():
+                self._build_tables()
+                if cache is not None:
+                    self._store_tables()
+
+    def _build_tables(self):
+        """
+        Builds the antilog table _exp, log table _log and inverse table _inv
+        from the first primitive element found.  _exp is stored twice over so
+        that _exp[_log[x] + _log[y]] needs no reduction.  Extension fields of
+        odd characteristic also get a table of Zech logarithms, _zech[k] being
+        the log of 1 + g**k, so that addition is a lookup as well.
+        """
+        order = self.size - 1
+        factors = _prime_factors(order)
+        for g in self.elements[2:]:
+            if (self.exp_scalar(g, order) == 1 and
+                    all(self.exp_scalar(g, order // r) != 1 for r in factors)):
+                break
         else:
-            raise NotImplementedError()
+            g = 1
+            if order > 1:
+                raise ValueError("poly %s is not irreducible." % self.poly)
+
+        if not self._modular and self._char != 2 and g == self._char:
+            # g is the polynomial x, so each power is a shift and a reduction
+            (p, size) = (self._char, self.size)
+            low = _to_digits(self.poly - size, p)
+            reduce_by = [_from_digits([-t * c % p for c in low], p)
+                         for t in range(p)]
+            def step(x):
+                x *= p
+                top = x // size
+                return _add_digits(x - top * size, reduce_by[top], p)
+        else:
+            def step(x, mult=self.mult_scalar):
+                return mult(x, g)
+
+        powers = [1]
+        x = g
+        while len(powers) < order:
+            powers.append(x)
+            x = step(x)
+
+        log = [None] * self.size
+        for i, x in enumerate(powers):
+            log[x] = i
+        inv = [None] * self.size
+        for i, x in enumerate(powers):
+            inv[x] = powers[-i]
+
+        if not self._modular and self._char != 2:
+            # Adding 1 only changes the lowest digit
+            p = self._char
+            self._zech = [log[x + 1 if x % p != p - 1 else x + 1 - p]
+                          for x in powers]
+        self._exp = powers + powers
+        self._log = log
+        self._inv = inv
+
+    def _store_tables(self):
+        """Stores the tables in the cache, without the Nones for zero"""
+        arrays = {"exp": self._exp[:self.size - 1], "log": self._log[1:],
+                  "inv": self._inv[1:]}
+        if self._zech is not None:
+            arrays["zech"] = [-1 if k is None else k for k in self._zech]
+        self.cache.store(field_key(self), arrays)
+
+    def _load_tables(self):
+        """
+        Sets the tables from the cache and returns True, or returns False if
+        they are not there.
+        """
+        arrays = self.cache.load(field_key(self))
+        if arrays is None:
+            return False
+        powers = arrays["exp"].tolist()
+        self._exp = powers + powers
+        self._log = [None] + arrays["log"].tolist()
+        self._inv = [None] + arrays["inv"].tolist()
+        if "zech" in arrays:
+            # The one None, the log of 1 + g**k = 0, is stored as -1
+            self._zech = arrays["zech"].tolist()
+            self._zech[self._zech.index(-1)] = None
+        return True
+
+    @property
+    def verbose(self):
+        """True iff steps are being reported to a tracer"""
+        return self.tracer is not None and self.tracer.enabled
+
+    @verbose.setter
+    def verbose(self, value):
+        if not value:
+            self.tracer = None
+        elif not self.verbose:
+            self.tracer = PrintTracer()
 
     def __repr__(self):
         return "GF(%d)" % self.size
@@ -46,42 +216,55 @@ class GF:
         """Returns an equivalent scalar or vector in the field, if possible"""
         if isinstance(x, list):
             return [self.identity(a) for a in x]
+        elif _is_array(x):
+            return self._np_identity(x)
+        elif _is_compact(x):
+            return x.copy()
         else:
             if self._modular:
                 return x % self.size
-            elif self.size == 4:
-                if x not in self.elements:
-                    raise ValueError("Passed value not in GF(4).")
-                return x
-            else:
-                raise NotImplementedError()
+            if not 0 <= x < self.size:
+                raise ValueError("Passed value %s not in GF(%d)."
+                                 % (x, self.size))
+            return x
 
     def mult_scalar(self, x, y):
         """Multiply two scalars x and y and return the result."""
         if self._modular:
             return (x * y) % self.size
-        elif self.size == 4:
+        elif self._log is not None:
+            MSG = "Passed values %s, %s not in GF(%d)."
+            # Negative values would wrap around the tables
+            if x < 0 or y < 0:
+                raise ValueError(MSG % (x, y, self.size))
             if x == 0 or y == 0:
-                return 0
-            elif x == 1:
-                return y
-            elif y == 1:
-                return x
-
-            if x == "a" and y == "a":
-                return "b"
-            elif (x == "a" and y == "b") or (x == "b" and y == "a"):
-                return 1
-            elif x == "b" and y == "b":
-                return "a"
-
-            raise ValueError("Passed values %s, %s not in GF(4)." % (x, y))
+                if x < self.size and y < self.size:
+                    return 0
+                raise ValueError(MSG % (x, y, self.size))
+            try:
+                return self._exp[self._log[x] + self._log[y]]
+            except (IndexError, TypeError):
+                raise ValueError(MSG % (x, y, self.size))
+        elif self._char == 2:
+            self.identity(x)
+            self.identity(y)
+            return _clmul_mod(x, y, self.poly, self._degree)
         else:
-            raise NotImplementedError()
+            self.identity(x)
+            self.identity(y)
+            p = self._char
+            product = _poly_mod(_poly_mult(_to_digits(x, p), _to_digits(y, p),
+                                           p),
+                                _to_digits(self.poly, p), p)
+            return _from_digits(product, p)
 
     def add(self, x, y):
         """Add two scalars or vectors x and y and return the result."""
-        if isinstance(x, list) and isinstance(y, list):
+        if _is_array(x) or _is_array(y):
+            if np.shape(x) != np.shape(y):
+                raise ValueError("Tried to add vectors of different dimensions")
+            return self.add_vec(x, y)
+        if isinstance(x, (list, GFVector)) and isinstance(y, (list, GFVector)):
             if len(x) != len(y):
                 raise ValueError("Tried to add vectors of different dimensions")
             return self.add_vec(x, y)
@@ -91,49 +274,65 @@ class GF:
         """Add two scalars x and y and return the result."""
         if self._modular:
             return (x + y) % self.size
-        elif self.size == 4:
-            if x == y:
-                return 0
-
+        if not (0 <= x < self.size and 0 <= y < self.size):
+            raise ValueError("Passed values %s, %s not in GF(%d)."
+                             % (x, y, self.size))
+        if self._char == 2:
+            return x ^ y
+        elif self._zech is not None:
             if x == 0:
                 return y
             elif y == 0:
                 return x
-            elif (x == "a" and y == "b") or (x == "b" and y == "a"):
-                return 1
-            elif (x == 1 and y == "b") or (x == "b" and y == 1):
-                return "a"
-            elif (x == 1 and y == "a") or (x == "a" and y == 1):
-                return "b"
-            else:
-                raise ValueError("%s + %s" % (x, y))
+            log = self._log
+            k = self._zech[(log[y] - log[x]) % (self.size - 1)]
+            return 0 if k is None else self._exp[log[x] + k]
         else:
-            raise NotImplementedError()
+            return _add_digits(x, y, self._char)
 
     def exp_scalar(self, a, n):
         """Returns a**n over the appropriate finite field."""
-        if self._modular:
-            return (a**n) % self.size
-        elif self.size == 4:
-            if n == 0:
-                return 1
-            elif n == 1:
-                return a
-            else:
-                return self.mult_scalar(a, self.exp_scalar(a, n-1))
+        if self._log is not None:
+            a = self.identity(a)
+            if a == 0:
+                if n < 0:
+                    raise ZeroDivisionError()
+                return 0 if n != 0 else 1
+            return self._exp[(self._log[a] * n) % (self.size - 1)]
+        elif self._modular:
+            if n < 0 and a % self.size == 0:
+                raise ZeroDivisionError()
+            return pow(a, n, self.size)
         else:
-            raise NotImplementedError()
+            if a == 0:
+                if n < 0:
+                    raise ZeroDivisionError()
+                return 0 if n != 0 else 1
+            if n < 0:
+                n %= self.size - 1
+            result = 1
+            while n:
+                if n & 1:
+                    result = self.mult_scalar(result, a)
+                a = self.mult_scalar(a, a)
+                n >>= 1
+            return result
 
     def add_inverse(self, x):
         """Returns the additive inverse of scalar or vector x"""
         if isinstance(x, list):
             return [self.add_inverse(a) for a in x]
+        elif _is_array(x):
+            return self._np_negative(x)
+        elif _is_compact(x):
+            return type(x)(self, self.add_inverse(x.tolist()))
         else:
             if self._modular:
                 return self.size - x
-            elif self.size == 4:
+            elif self._char == 2:
                 return x
-            raise NotImplementedError()
+            p = self._char
+            return _from_digits([-a % p for a in _to_digits(x, p)], p)
 
     def negative(self, x):
         """
@@ -148,16 +347,22 @@ class GF:
             raise ZeroDivisionError()
         if a == 1:
             return 1
+        elif self._inv is not None and not self._tracer(verbose):
+            if self._modular:
+                a %= self.size
+                if a == 0:
+                    raise ZeroDivisionError()
+            elif a < 0:
+                # Negative values would wrap around the table
+                raise TypeError("Value %s was not in GF(%d)." % (a, self.size))
+            try:
+                return self._inv[a]
+            except (IndexError, TypeError):
+                raise TypeError("Value %s was not in GF(%d)." % (a, self.size))
         elif self._modular:
             return self._prime_field_mult_inverse(a % self.size, verbose)
-        elif self.size == 4:
-            if a == "a":
-                return "b"
-            elif a == "b":
-                return "a"
-            else:
-                raise TypeError("Value %s was not in GF(4)." % a)
-        raise NotImplementedError()
+        self.identity(a)
+        return self.exp_scalar(a, self.size - 2)
 
     def _prime_field_mult_inverse(self, a, verbose=None):
         """
@@ -167,42 +372,47 @@ class GF:
         if a == 0:
             raise ZeroDivisionError("0 is not invertible.")
 
-        self._v_print("", verbose)
+        tracer = self._tracer(verbose)
+        if tracer:
+            tracer.event(self, "inverse.start", value=a, modulus=self.size)
         t = 0
         r = self.size
         newt = 1
         newr = a
-        MSG1 = "%s = %s * %s + %s"
-        MSG2 = "   ==>   %s = %s - %s * %s"
-        MSG3 = "   ==>   t = %s - %s * %s = %s"
         while newr != 0:
             quotient = r // newr
-            remain = (r % newr if newr != 0 else 1)
-            self._v_print(MSG1 % (r, r // newr, newr, remain), verbose, end="")
-            self._v_print(MSG2 % (remain, r, r // newr, newr), verbose, end="")
-            if (r - quotient * newr) != 0:
-                self._v_print(MSG3 % (t, quotient, newt, t - quotient * newt),
-                              verbose)
-            else:
-                self._v_print("", verbose)
+            if tracer:
+                tracer.event(self, "inverse.step", dividend=r,
+                             quotient=quotient, divisor=newr,
+                             remainder=r % newr, t=t, coefficient=newt,
+                             new_t=t - quotient * newt)
             (t, newt) = (newt, t - quotient * newt)
             (r, newr) = (newr, r - quotient * newr)
 
         if t < 0:
             t += self.size
-            MSG = u"%s mod %s = %s"
-            self._v_print(MSG % (t - self.size, self.size, t), verbose)
-        self._v_print("Multiplicative inverse is %s"%(t), verbose)
+            if tracer:
+                tracer.event(self, "inverse.reduce", value=t - self.size,
+                             modulus=self.size, result=t)
+        if tracer:
+            tracer.event(self, "inverse.result", result=t)
 
         return t
 
     def add_vec(self, u, v):
         """Add two vectors u and v and returns the result."""
-        return [self.add_scalar(a, b) for a, b in zip(u, v)]
+        if _is_array(u) or _is_array(v):
+            return self._np_add(self._np_array(u), self._np_array(v))
+        result = [self.add_scalar(a, b) for a, b in zip(u, v)]
+        return GFVector(self, result) if _is_compact(u) or _is_compact(v) \
+            else result
 
     def scale_vec(self, a, v):
         """Multiplies vector v by scalar a."""
-        return [self.mult_scalar(a, b) for b in v]
+        if _is_array(v):
+            return self._np_mult(self._np_array(a), self._np_array(v))
+        result = [self.mult_scalar(a, b) for b in v]
+        return GFVector(self, result) if _is_compact(v) else result
 
     def is_lin_indep(self, S):
         """Determine whether a set is linearly independent."""
@@ -212,9 +422,13 @@ class GF:
         """Return the inner (dot) product of vectors u and v"""
         if len(u) != len(v):
             raise ValueError("Vectors must be same length.")
+        if _is_array(u) or _is_array(v):
+            return self._np_sum(self._mult_vec(u, v), 0).item()
         return reduce(self.add_scalar, self._mult_vec(u, v), 0)
 
     def _mult_vec(self, u, v):
+        if _is_array(u) or _is_array(v):
+            return self._np_mult(self._np_array(u), self._np_array(v))
         return [self.mult_scalar(a, b) for a, b in zip(u, v)]
 
     def is_generator_matrix(self, M):
@@ -223,29 +437,49 @@ class GF:
         """
         return self.is_lin_indep(M)
 
-    def is_pc_matrix(self, A, B, verbose=None):
+    def is_pc_matrix(self, A, B, verbose=None, block=None):
         """
-        Returns true iff B and A are parity-check matrices of each other.
+        Returns true iff B and A are parity-check matrices of each other, that
+        is, iff A B^T is zero.  The product is one call to matmul().  With
+        block given, it is computed that many rows of A at a time instead,
+        stopping at the first block with a nonzero entry, which saves most of
+        the work when the check fails early.  Blocks of a few hundred rows
+        keep the overhead of each product small.
         """
-        for u in A:
-            for v in B:
-                if self.dot_vec(u, v) != 0:
-                    MSG = "%s and %s are not orthogonal."
-                    self._v_print(MSG % (u, v), verbose)
-                    return False
+        if _is_compact(A) or _is_compact(B):
+            (A, B) = (_as_rows(A), _as_rows(B))
+        if not len(A) or not len(B):
+            return True
+        B_T = B.T if _is_array(B) else _transpose(B)
+        if len(B_T) != len(A[0]):
+            raise ValueError("Vectors must be same length.")
+        step = block or len(A)
+        for start in range(0, len(A), step):
+            nonzero = _first_nonzero(self.matmul(A[start:start + step], B_T))
+            if nonzero is not None:
+                (i, j) = (start + nonzero[0], nonzero[1])
+                tracer = self._tracer(verbose)
+                if tracer:
+                    tracer.event(self, "pc_matrix.failed", i=i, j=j, u=A[i],
+                                 v=B[j])
+                return False
         return True
 
     def create_pc_matrix(self, G, verbose=None):
         """Returns a parity-check matrix for generator matrix G"""
+        if _is_compact(G):
+            return GFMatrix(self, self.create_pc_matrix(G.tolist(), verbose))
         rows = len(G)
         cols = len(G[0])
         for row in G:
             if len(row) != cols:
                 raise ValueError("Matrix not valid, check row lengths.")
+        # A matrix in standard form always has full rank, and the rank of an
+        # RREF matrix is its number of nonzero rows, so one RREF is enough
         if not self.is_standard_form(G, 'g'):
             G = self.rref(G)
-        if not self.is_generator_matrix(G):
-            raise ValueError("Passed matrix was not a generator matrix.")
+            if not all(any(row) for row in G):
+                raise ValueError("Passed matrix was not a generator matrix.")
 
         H = _transpose(G)
         H = self.negative(H[rows:])
@@ -262,6 +496,8 @@ class GF:
         Using 'parity' or 'p' as type, returns True iff M is a parity-check
         matrix in standard form.
         """
+        if _is_compact(M):
+            M = M.tolist()
         rows = len(M)
         cols = len(M[0])
         if rows > cols:
@@ -293,6 +529,11 @@ class GF:
         Returns a reduced row echelon form matrix that is row equivalent to
         matrix M.
         """
+        tracer = self._tracer(verbose)
+        if not tracer:
+            return self.rref_with_pivots(M)[0]
+        if _is_compact(M):
+            return GFMatrix(self, self.rref(M.tolist(), verbose))
         rows = len(M)
         cols = len(M[0])
         for row in M:
@@ -301,56 +542,57 @@ class GF:
         M = copy.deepcopy(M)
         M = self.identity(M)
 
+        def event(name, **data):
+            tracer.event(self, name, matrix=[list(row) for row in M], **data)
+
         def exchange_rows(m1, m2):
             if m1 != m2:
                 (M[m1], M[m2]) = (M[m2], M[m1])
-                MSG = "Exchange rows %s and %s."
-                self._v_printM(M, MSG % (m1 + 1, m2 + 1), verbose)
+                event("rref.exchange", rows=(m1, m2))
 
         def add_row(m1, a, m2):
             M[m2] = self.add(M[m2], self.scale_vec(a, M[m1]))
-            MSG = "Added %s times row %s to row %s."
-            self._v_printM(M, MSG % (a, m1 + 1, m2 + 1), verbose)
+            event("rref.add", multiplier=a, source=m1, target=m2)
 
         def pivot_down(m, n):
             pivot = M[m][n]
             if pivot == 0:
                 raise Exception("There has been a terrible error in RREF")
+            inverse = self.mult_inverse(pivot, False)
             first = True
             for i in range(m + 1, rows):
                 if first:
-                    MSG = "PLAN: Pivot down from position (%s, %s)"
-                    self._v_printM(M, MSG % (m+1, n+1), verbose)
+                    event("rref.plan", direction="down", row=m, col=n)
                     first = False
                 below = M[i][n]
                 if below != 0:
                     multiplier = self.negative(
-                        self.mult_scalar(self.mult_inverse(pivot, False), below))
+                        self.mult_scalar(inverse, below))
                     add_row(m, multiplier, i)
 
         def pivot_up(m, n):
             pivot = M[m][n]
             if pivot == 0:
                 raise Exception("There has been a terrible error in RREF")
+            inverse = self.mult_inverse(pivot, False)
             first = True
             for i in range(m - 1, -1, -1):
                 if first:
-                    MSG = "PLAN: Pivot up from position (%s, %s)"
-                    self._v_printM(M, MSG%(m+1, n+1), verbose)
+                    event("rref.plan", direction="up", row=m, col=n)
                     first = False
                 above = M[i][n]
                 if above != 0:
                     multiplier = self.negative(
-                        self.mult_scalar(self.mult_inverse(pivot, False), above))
+                        self.mult_scalar(inverse, above))
                     add_row(m, multiplier, i)
 
         def reduce_row(m, n):
             pivot = M[m][n]
             scale = self.mult_inverse(pivot, False)
             M[m] = self.scale_vec(scale, M[m])
-            self._v_printM(M, "Scale row %s by %s." % (m+1, scale), verbose)
+            event("rref.scale", row=m, multiplier=scale)
 
-        self._v_printM(M, "Original matrix.", verbose)
+        event("rref.start")
         pivots = []
         m = 0; n = 0
         while (m < rows and n < cols):
@@ -377,10 +619,244 @@ class GF:
 
         return M
 
+    def rref_with_pivots(self, M, inplace=False):
+        """
+        Returns (R, pivots), where R is the reduced row echelon form of matrix
+        M and pivots lists the column of the leading 1 in each nonzero row of
+        R.  This never prints step-by-step solutions, and eliminates above and
+        below each pivot in a single pass.
+
+        If inplace is True, the rows of M are reduced in place and M itself is
+        returned as R, which saves copying large matrices.
+        """
+        if _is_array(M):
+            (R, pivots) = self.rref_with_pivots(M.tolist())
+            R = np.array(R, dtype=M.dtype).reshape(M.shape)
+            if inplace:
+                M[...] = R
+                R = M
+            return (R, pivots)
+        if _is_compact(M):
+            # Entries are already in the field and rows all the same length,
+            # and tolist() makes fresh rows, so there is nothing to check
+            (R, pivots) = self._rref_rows(M.tolist(), M.cols)
+            if inplace:
+                for (i, row) in enumerate(R):
+                    M[i] = row
+                return (M, pivots)
+            return (GFMatrix(self, R), pivots)
+        rows = len(M)
+        cols = len(M[0])
+        for row in M:
+            if len(row) != cols:
+                raise ValueError("Matrix not valid, check row lengths")
+        if self.size == 2:
+            (R, pivots) = self._rref_rows(M, cols)
+            if inplace:
+                for (row, r) in zip(M, R):
+                    row[:] = r
+                R = M
+            return (R, pivots)
+        if inplace:
+            for row in M:
+                row[:] = self.identity(row)
+        else:
+            M = [self.identity(list(row)) for row in M]
+        return self._rref_rows(M, cols)
+
+    def _rref_rows(self, M, cols):
+        """
+        Reduces M, a list of rows of length cols holding field elements, in
+        place.  Returns (M, pivots) as rref_with_pivots() does, except that
+        over GF(2) a new list of rows is returned instead.
+        """
+        rows = len(M)
+        if self.size == 2:
+            (packed, pivots) = gf2.rref(gf2.pack_rows(M), cols)
+            return (gf2.unpack_rows(packed, cols), pivots)
+        pivots = []
+        m = 0
+        for n in range(cols):
+            if m == rows:
+                break
+            for i in range(m, rows):
+                if M[i][n] != 0:
+                    break
+            else:
+                continue
+            (M[m], M[i]) = (M[i], M[m])
+            pivot_row = M[m]
+            if pivot_row[n] != 1:
+                scale = self.mult_inverse(pivot_row[n], False)
+                pivot_row[n:] = self.scale_vec(scale, pivot_row[n:])
+            for i in range(rows):
+                if i != m and M[i][n] != 0:
+                    self._add_scaled(M[i], self.negative(M[i][n]), pivot_row, n)
+            pivots.append(n)
+            m += 1
+        return (M, pivots)
+
+    def _add_scaled(self, dest, c, src, start=0):
+        """Adds c times src to dest in place, from index start onwards"""
+        if self._modular:
+            p = self.size
+            dest[start:] = [(x + c * y) % p for x, y in
+                            zip(dest[start:], src[start:])]
+        elif self._char == 2 and self._log is not None:
+            (exp, log) = (self._exp, self._log)
+            lc = log[c]
+            dest[start:] = [x ^ exp[lc + log[y]] if y else x for x, y in
+                            zip(dest[start:], src[start:])]
+        else:
+            (add, mult) = (self.add_scalar, self.mult_scalar)
+            dest[start:] = [add(x, mult(c, y)) for x, y in
+                            zip(dest[start:], src[start:])]
+
     def rank(self, M):
         """Returns the rank (dimension of rowspace) of matrix M"""
-        Mref = self.rref(M)
-        return len([v for v in Mref if any(v)])
+        if _is_compact(M):
+            if self.size == 2:
+                return gf2.rank(gf2.pack_rows(M.tolist()))
+            return len(self._rref_rows(M.tolist(), M.cols)[1])
+        if self.size == 2 and not _is_array(M):
+            cols = len(M[0])
+            for row in M:
+                if len(row) != cols:
+                    raise ValueError("Matrix not valid, check row lengths")
+            return gf2.rank(gf2.pack_rows(M))
+        return len(self.rref_with_pivots(M)[1])
+
+    def lu(self, M):
+        """
+        Returns the PLU factorization of matrix M (see the linalg module).
+        Factor a matrix once with lu() to solve many systems with it, or to
+        take its inverse, determinant and nullspace together.
+        """
+        return PLU(self, _as_rows(M))
+
+    def solve(self, A, b):
+        """
+        Returns a solution x of A x = b, with 0 for every free variable.
+        Raises ValueError if there is none.
+        """
+        x = self.lu(A).solve(b.tolist() if _is_array(b) else list(b))
+        if _is_array(b):
+            return np.array(x, dtype=b.dtype)
+        return GFVector(self, x) if _is_compact(b) else x
+
+    def inverse(self, M):
+        """
+        Returns the inverse of square matrix M.  Raises ValueError if M is
+        singular.
+        """
+        return self._like(self.lu(M).inverse(), M)
+
+    def det(self, M):
+        """Returns the determinant of square matrix M"""
+        return self.lu(M).det()
+
+    def nullspace(self, M):
+        """
+        Returns a basis of the nullspace of M, the vectors x with M x = 0, as
+        the rows of a matrix.  For a generator matrix G of a code, this is a
+        parity-check matrix, whether or not G has full rank or standard form.
+        """
+        M_rows = _as_rows(M)
+        cols = len(M_rows[0]) if M_rows else 0
+        return self._like(PLU(self, M_rows).nullspace(), M, cols)
+
+    def _like(self, R, M, cols=None):
+        """
+        Returns the list of rows R as the same kind of matrix as M: a
+        GFMatrix, a NumPy array, or a list.  cols gives the width if R may
+        have no rows.
+        """
+        if _is_compact(M):
+            return GFMatrix(self, R) if R else GFMatrix.zeros(self, 0, cols)
+        if _is_array(M):
+            return np.array(R, dtype=M.dtype).reshape(len(R), -1 if R
+                                                      else cols)
+        return R
+
+    def rank_many(self, matrices, workers=None, chunksize=None):
+        """
+        Returns an array('l') holding the rank of each matrix in matrices,
+        computed by a pool of worker processes.
+
+        Keyword arguments:
+        matrices -- an iterable of matrices
+        workers -- number of processes (default: one per CPU).  With 1, the
+                   matrices are handled in this process without a pool.
+        chunksize -- number of matrices sent to a worker at a time (default:
+                     enough for about four chunks per worker)
+        """
+        return array('l', self._map_many("rank", matrices, workers,
+                                         chunksize))
+
+    def is_lin_indep_many(self, sets, workers=None, chunksize=None):
+        """
+        Returns an array('B') holding 1 for each linearly independent set in
+        sets and 0 for the others.  See rank_many().
+        """
+        return array('B', self._map_many("is_lin_indep", sets, workers,
+                                         chunksize))
+
+    def _map_many(self, method, items, workers, chunksize):
+        """
+        Calls the named method on every item in a pool of worker processes.
+        Each worker builds its own copy of the field once, when it starts,
+        so only the items themselves are sent with each chunk.
+        """
+        workers = workers or os.cpu_count() or 1
+        if workers == 1:
+            return map(getattr(self, method), items)
+        if chunksize is None:
+            items = list(items)
+            chunksize = max(1, -(-len(items) // (workers * 4)))
+        args = (self.size, self.poly, self._exp is not None,
+                self.table_limit, self.cache)
+        results = []
+        with ProcessPoolExecutor(workers, initializer=_init_worker,
+                                 initargs=args) as pool:
+            tasks = ((method, chunk) for chunk in _chunks(items, chunksize))
+            for chunk in pool.map(_call_chunk, tasks):
+                results.extend(chunk)
+        return results
+
+    def matmul(self, A, B, cutoff=None):
+        """
+        Returns the matrix product A B.  The result is a NumPy array if A or B
+        is one, a GFMatrix if A or B is one, and a list of rows otherwise.
+
+        Lists are multiplied by the Method of Four Russians over GF(2^d) for
+        d <= 8, with rows packed into ints over prime fields, and entry by
+        entry otherwise, with the Strassen-Winograd recursion above a size
+        that depends on the field; cutoff overrides that size.  See the
+        matmul module.
+        """
+        if _is_array(A) or _is_array(B):
+            (A, B) = (self._np_array(A), self._np_array(B))
+            if A.ndim != 2 or B.ndim != 2 or A.shape[1] != B.shape[0]:
+                raise ValueError("Matrix dimensions do not match.")
+            return self._np_matmul(self._np_identity(A),
+                                   self._np_identity(B))
+        (A_rows, B_rows) = (_as_rows(A), _as_rows(B))
+        cols = len(B_rows[0]) if B_rows else 0
+        for row in A_rows:
+            if len(row) != len(B_rows):
+                raise ValueError("Matrix dimensions do not match.")
+        for row in B_rows:
+            if len(row) != cols:
+                raise ValueError("Matrix not valid, check row lengths.")
+        # The packed methods need every entry reduced into its lane
+        if not _is_compact(A):
+            A_rows = [self.identity(list(row)) for row in A_rows]
+        if not _is_compact(B):
+            B_rows = [self.identity(list(row)) for row in B_rows]
+        R = multiply(self, A_rows, B_rows, cutoff)
+        if _is_compact(A) or _is_compact(B):
+            return GFMatrix(self, R) if R else GFMatrix.zeros(self, 0, cols)
+        return R
 
     def encode(self, G, w):
         """
@@ -392,32 +868,161 @@ class GF:
         """
         if len(w) != len(G):
             raise ValueError("Input word is wrong length.")
-        G = copy.deepcopy(G)
-        for i in range(len(G)):
-            G[i] = self.scale_vec(w[i], G[i])
-        return reduce(self.add, G)
-
-    def _v_print(self, msg, verbose, end="\n"):
-        """Prints if verbose is on"""
-        verbose = self.verbose if verbose is None else verbose
-        if verbose:
-            print(msg, end=end)
+        if _is_array(G) or _is_array(w):
+            return self.matmul(self._np_array(w)[None, :], G)[0]
+        if _is_compact(G) or _is_compact(w):
+            return GFVector(self, self.matmul([list(w)], G)[0])
+        return self.matmul([w], G)[0]
 
-    def _v_printM(self, M, msg, verbose):
-        """Prints a formatted matrix if verbose is on"""
-        verbose = self.verbose if verbose is None else verbose
-        if verbose:
-            first = True
-            print("")
-            for row in M:
-                print("|", end=" ")
-                for el in row:
-                    print(str(el).rjust(self._digits), end=" ")
-                print("|", end="")
-                if first:
-                    print("   " + msg, end="")
-                    first = False
-                print("")
+    def encode_batch(self, G, W):
+        """
+        Encodes every column of W using generator matrix G with a single matrix
+        product, and returns the codewords as the columns of an n x N matrix.
+        G is not copied, so encoding many blocks with the same G is cheap.
+
+        If W is an iterable of message blocks rather than a single block,
+        returns a generator yielding the encoded blocks in turn.
+
+        Keyword arguments:
+        W -- a k x N matrix whose columns are words of length k
+        G -- a k x n matrix
+        """
+        if not isinstance(W, (list, GFMatrix)) and not _is_array(W):
+            return (self.encode_batch(G, block) for block in W)
+        if len(W) != len(G):
+            raise ValueError("Message block has wrong number of rows.")
+        if _is_compact(G) or _is_compact(W):
+            G = G.tolist() if _is_compact(G) else G
+            W = W.tolist() if _is_compact(W) else W
+            return GFMatrix(self, self.encode_batch(G, W))
+        if _is_array(G) or _is_array(W):
+            return self.matmul(self._np_array(G).T, W)
+        return self.matmul(_transpose(G), W)
+
+    def _combine(self, w, columns):
+        """
+        Returns the list of dot products of w with each of columns, which is
+        w times the matrix with those columns.
+        """
+        if self._modular:
+            p = self.size
+            mul = operator.mul
+            return [sum(map(mul, w, col)) % p for col in columns]
+        add = operator.xor if self._char == 2 else self.add_scalar
+        mult = self.mult_scalar
+        return [reduce(add, map(mult, w, col), 0) for col in columns]
+
+    # NumPy backend.  Arrays hold field elements in the same integer encoding as
+    # scalars; every operation works on whole arrays and broadcasts like NumPy.
+
+    def _np_array(self, x):
+        """Returns x as an integer array wide enough for products"""
+        dtype = np.int64 if self.size < 1 << 31 else object
+        return np.asarray(x, dtype=dtype)
+
+    def _np_tables(self):
+        """Returns the log/antilog tables as arrays, building them once"""
+        if self._np_exp is None:
+            self._np_exp = np.array(self._exp, dtype=np.int64)
+            self._np_log = np.array([0] + self._log[1:], dtype=np.int64)
+        return (self._np_exp, self._np_log)
+
+    def _np_identity(self, x):
+        if self._modular:
+            return np.mod(x, self.size)
+        if np.any((x < 0) | (x >= self.size)):
+            raise ValueError("Passed array has values not in GF(%d)."
+                             % self.size)
+        return x
+
+    def _np_add(self, x, y):
+        if self._modular:
+            return np.mod(x + y, self.size)
+        elif self._char == 2:
+            return np.bitwise_xor(x, y)
+        p = self._char
+        result = np.zeros(np.broadcast(x, y).shape, dtype=x.dtype)
+        place = 1
+        for _ in range(self._degree):
+            result += (x // place + y // place) % p * place
+            place *= p
+        return result
+
+    def _np_negative(self, x):
+        if self._modular:
+            return np.mod(-x, self.size)
+        elif self._char == 2:
+            return x.copy()
+        p = self._char
+        result = np.zeros_like(x)
+        place = 1
+        for _ in range(self._degree):
+            result += -(x // place) % p * place
+            place *= p
+        return result
+
+    def _np_mult(self, x, y):
+        if self._modular:
+            return np.mod(x * y, self.size)
+        elif self._log is not None:
+            (exp, log) = self._np_tables()
+            return np.where((x == 0) | (y == 0), 0, exp[log[x] + log[y]])
+        elif self._char == 2:
+            (x, y) = np.broadcast_arrays(x, y)
+            (x, y) = (x.copy(), y.copy())
+            result = np.zeros_like(x)
+            for _ in range(self._degree):
+                result ^= np.where(y & 1, x, 0)
+                y >>= 1
+                x <<= 1
+                x ^= np.where(x >> self._degree, self.poly, 0)
+            return result
+        return np.vectorize(self.mult_scalar, otypes=[x.dtype])(x, y)
+
+    def _np_matmul(self, A, B):
+        """Returns the matrix product of 2-D arrays A and B over the field"""
+        if self._modular:
+            # Split the inner dimension so that sums of products cannot
+            # overflow 64-bit integers
+            step = max(1, ((1 << 63) - 1) // max(1, (self.size - 1)**2))
+            if A.dtype == object or step >= A.shape[1]:
+                return np.mod(A.dot(B), self.size)
+            result = np.zeros((A.shape[0], B.shape[1]), dtype=A.dtype)
+            for i in range(0, A.shape[1], step):
+                result += np.mod(A[:, i:i + step].dot(B[i:i + step]),
+                                 self.size)
+                result %= self.size
+            return result
+        result = np.zeros((A.shape[0], B.shape[1]), dtype=A.dtype)
+        for i in range(A.shape[1]):
+            result = self._np_add(result, self._np_mult(A[:, i, None],
+                                                        B[None, i]))
+        return result
+
+    def _np_sum(self, x, axis):
+        """Sums x along axis in the field"""
+        if self._modular:
+            return np.mod(x.sum(axis=axis), self.size)
+        elif self._char == 2:
+            return np.bitwise_xor.reduce(x, axis=axis)
+        p = self._char
+        result = 0
+        place = 1
+        for _ in range(self._degree):
+            result = result + (x // place % p).sum(axis=axis) % p * place
+            place *= p
+        return np.asarray(result, dtype=x.dtype)
+
+    def _tracer(self, verbose):
+        """
+        Returns the tracer to report the steps of one call to, or None.  A
+        per-call verbose argument of True or False overrides the field.
+        """
+        if verbose is None:
+            return self.tracer if self.verbose else None
+        elif not verbose:
+            return None
+        return self.tracer if self.verbose else PrintTracer()
 
 
 # This function is only used for sizes of finite fields, which tend to be not
@@ -442,6 +1047,236 @@ def _is_prime(n):
     return True
 
 
+def _prime_power(n):
+    """Returns (p, m) such that n == p**m for a prime p, or None"""
+    if n < 2:
+        return None
+    p = 2
+    while n % p != 0:
+        p += 1
+    m = 0
+    while n % p == 0:
+        n //= p
+        m += 1
+    return (p, m) if n == 1 else None
+
+
+# Primitive polynomials for GF(2**m), so that the polynomial x generates the
+# multiplicative group.  These are the usual choices for Reed-Solomon codes.
+_BINARY_POLYS = {
+    1: 0x3, 2: 0x7, 3: 0xb, 4: 0x13, 5: 0x25, 6: 0x43, 7: 0x89, 8: 0x11d,
+    9: 0x211, 10: 0x409, 11: 0x805, 12: 0x1053, 13: 0x201b, 14: 0x4443,
+    15: 0x8003, 16: 0x1100b,
+}
+
+
+def _default_poly(p, m):
+    """
+    Returns a primitive polynomial of degree m over GF(p), encoded as an
+    integer in base p.  Searches monic polynomials in increasing order if there
+    is no standard choice, keeping the first one in which x has multiplicative
+    order p**m - 1.
+    """
+    if p == 2 and m in _BINARY_POLYS:
+        return _BINARY_POLYS[m]
+    size = p**m
+    factors = _prime_factors(size - 1)
+    for poly in range(size + 1, 2 * size):
+        if poly % p == 0 or not _is_irreducible(poly, p, m):
+            continue
+        field = GF(size, tables=False, poly=poly)
+        if (field.exp_scalar(p, size - 1) == 1 and
+                all(field.exp_scalar(p, (size - 1) // r) != 1
+                    for r in factors)):
+            return poly
+    raise ValueError("No primitive polynomial of degree %d over GF(%d)"
+                     % (m, p))
+
+
+def _prime_factors(n):
+    """Returns the distinct prime factors of n"""
+    factors = []
+    d = 2
+    while d * d <= n:
+        if n % d == 0:
+            factors.append(d)
+            while n % d == 0:
+                n //= d
+        d += 1
+    if n > 1:
+        factors.append(n)
+    return factors
+
+
+def _to_digits(x, p):
+    """Returns the base-p digits of x, least significant first"""
+    digits = []
+    while x:
+        digits.append(x % p)
+        x //= p
+    return digits
+
+
+def _from_digits(digits, p):
+    """Inverse of _to_digits()"""
+    x = 0
+    for d in reversed(digits):
+        x = x * p + d
+    return x
+
+
+def _add_digits(x, y, p):
+    """Adds the base-p digits of x and y modulo p, without carrying"""
+    result = 0
+    place = 1
+    while x or y:
+        result += (x + y) % p * place
+        x //= p
+        y //= p
+        place *= p
+    return result
+
+
+def _poly_mult(f, g, p):
+    """Multiplies polynomials f and g over GF(p), given as digit lists"""
+    if not f or not g:
+        return []
+    result = [0] * (len(f) + len(g) - 1)
+    for i, a in enumerate(f):
+        if a:
+            for j, b in enumerate(g):
+                result[i + j] = (result[i + j] + a * b) % p
+    return result
+
+
+def _poly_mod(f, g, p):
+    """
+    Returns the remainder of polynomial f divided by monic polynomial g over
+    GF(p), both given as digit lists.
+    """
+    f = list(f)
+    deg = len(g) - 1
+    for i in range(len(f) - 1, deg - 1, -1):
+        c = f[i]
+        if c:
+            for j in range(deg + 1):
+                f[i - deg + j] = (f[i - deg + j] - c * g[j]) % p
+    del f[deg:]
+    return f
+
+
+def _strip(f):
+    """Removes the leading zero coefficients of digit list f, in place"""
+    while f and not f[-1]:
+        f.pop()
+    return f
+
+
+def _poly_gcd(f, g, p):
+    """Returns the monic gcd of polynomials f and g over GF(p), as digits"""
+    (f, g) = (_strip(list(f)), _strip(list(g)))
+    while g:
+        inverse = pow(g[-1], p - 2, p)
+        g = [c * inverse % p for c in g]
+        (f, g) = (g, _strip(_poly_mod(f, g, p)))
+    return f
+
+
+def _is_irreducible(poly, p, m):
+    """
+    Returns True iff poly, monic of degree m over GF(p) and encoded in base
+    p, is irreducible, by Rabin's test: x^(p^m) = x modulo poly, and
+    x^(p^(m/r)) - x is coprime to poly for each prime r dividing m.
+    """
+    g = _to_digits(poly, p)
+    powers = [[0, 1]]       # x^(p^k) mod g for k = 0, 1, ..., m
+    for _ in range(m):
+        h = [1]
+        (base, e) = (powers[-1], p)
+        while e:
+            if e & 1:
+                h = _poly_mod(_poly_mult(h, base, p), g, p)
+            base = _poly_mod(_poly_mult(base, base, p), g, p)
+            e >>= 1
+        powers.append(_strip(h))
+    x = _strip(_poly_mod([0, 1], g, p))
+    if powers[m] != x:
+        return False
+    for r in _prime_factors(m):
+        h = powers[m // r] + [0] * (2 - len(powers[m // r]))
+        h[1] = (h[1] - 1) % p
+        if len(_poly_gcd(g, h, p)) > 1:
+            return False
+    return True
+
+
+def _clmul_mod(x, y, poly, m):
+    """
+    Carry-less product of x and y reduced modulo poly, i.e. multiplication in
+    GF(2**m) with elements as bit patterns.
+    """
+    result = 0
+    while y:
+        if y & 1:
+            result ^= x
+        y >>= 1
+        x <<= 1
+        if x >> m:
+            x ^= poly
+    return result
+
+
+# The field used by rank_many() and is_lin_indep_many() in worker processes
+_worker_field = None
+
+
+def _init_worker(size, poly, tables, table_limit, cache):
+    """Builds the field once in each worker process, just as it was built"""
+    global _worker_field
+    _worker_field = GF(size, tables=tables, table_limit=table_limit,
+                       poly=poly, cache=cache)
+
+
+def _call_chunk(task):
+    """Calls a field method on each item of a chunk in a worker process"""
+    (method, chunk) = task
+    method = getattr(_worker_field, method)
+    return [method(x) for x in chunk]
+
+
+def _chunks(iterable, size):
+    """Yields lists of up to size consecutive items from iterable"""
+    iterator = iter(iterable)
+    chunk = list(islice(iterator, size))
+    while chunk:
+        yield chunk
+        chunk = list(islice(iterator, size))
+
+
+def _as_rows(M):
+    """Returns matrix M as a list of rows"""
+    if _is_array(M) or _is_compact(M):
+        return M.tolist()
+    return M
+
+
+def _first_nonzero(M):
+    """Returns (i, j) for the first nonzero entry of M in row order, or None"""
+    if _is_array(M):
+        flat = np.flatnonzero(M)
+        return tuple(map(int, divmod(flat[0], M.shape[1]))) if flat.size \
+            else None
+    for (i, row) in enumerate(M):
+        if any(row):
+            return (i, next(j for (j, x) in enumerate(row) if x))
+    return None
+
+
+def _is_array(x):
+    """Returns True iff x is a NumPy array"""
+    return np is not None and isinstance(x, np.ndarray)
+
+
 def _transpose(M):
     """Returns transpose of matrix M"""
     return list(map(list, zip(*M)))
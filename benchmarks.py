@@ -0,0 +1,277 @@
+"""
+Benchmarks for the GaloisPy library.
+
+Run as a module to time field arithmetic, RREF, matrix products, encoding,
+streams, Reed-Solomon codes, cyclic codes and CRCs, and bounds, and write the
+results as JSON:
+
+    python -m benchmarks
+    python -m benchmarks --quick --output bench.json
+
+Every run uses the same random inputs, so results from different commits can
+be compared directly.
+"""
+from __future__ import print_function
+
+import argparse
+import io
+import json
+import platform
+import random
+import subprocess
+import sys
+import timeit
+
+import bounds
+import matmul
+import stream
+from Galois import GF, np
+from codes import LinearCode
+from cyclic import CRC, CyclicCode
+from reedsolomon import ReedSolomon
+
+__author__ = "Jerry Yin"
+
+# Fields to benchmark: binary, GF(4), byte-sized and 16-bit extension fields,
+# a small prime and the largest prime below 2**16
+FIELDS = [(2, None), (4, None), (7, None), (256, 0x11d), (65536, None),
+          (65521, None)]
+
+
+def _time(func, min_time):
+    """
+    Returns the best time of three runs per call of func, choosing the number
+    of calls so that each run takes at least min_time seconds.
+    """
+    timer = timeit.Timer(func)
+    number = 1
+    while timer.timeit(number) < min_time:
+        number *= 2
+    return min(timer.repeat(3, number)) / number
+
+
+def _random_matrix(field, rows, cols, rng):
+    return [[rng.randrange(field.size) for _ in range(cols)]
+            for _ in range(rows)]
+
+
+def bench_scalar(fields, min_time, rng):
+    """Returns operations per second for each scalar operation and field"""
+    results = []
+    for field in fields:
+        pairs = [(rng.randrange(1, field.size), rng.randrange(1, field.size))
+                 for _ in range(1000)]
+        ops = {
+            "add_scalar": lambda: [field.add_scalar(x, y) for x, y in pairs],
+            "mult_scalar": lambda: [field.mult_scalar(x, y) for x, y in pairs],
+            "mult_inverse": lambda: [field.mult_inverse(x) for x, _ in pairs],
+            "exp_scalar": lambda: [field.exp_scalar(x, y) for x, y in pairs],
+        }
+        for (name, func) in sorted(ops.items()):
+            seconds = _time(func, min_time)
+            results.append({"field": field.size, "op": name,
+                            "ops_per_sec": len(pairs) / seconds})
+    return results
+
+
+def bench_rref(fields, dims, min_time, rng):
+    """Returns the time to reduce a random d x 2d matrix, for each d"""
+    results = []
+    for field in fields:
+        for d in dims:
+            M = _random_matrix(field, d, 2 * d, rng)
+            for (name, func) in (("rref", lambda: field.rref(M)),
+                                 ("rank", lambda: field.rank(M))):
+                results.append({"field": field.size, "op": name, "rows": d,
+                                "cols": 2 * d,
+                                "seconds": _time(func, min_time)})
+    return results
+
+
+def bench_matmul(fields, dims, min_time, rng):
+    """
+    Returns the time to multiply two random d x d matrices, for each d, with
+    GF.matmul() and with the cubic method alone
+    """
+    results = []
+    for field in fields:
+        for d in dims:
+            (A, B) = (_random_matrix(field, d, d, rng),
+                      _random_matrix(field, d, d, rng))
+            for (name, func) in (("matmul", lambda: field.matmul(A, B)),
+                                 ("matmul[cubic]",
+                                  lambda: matmul.cubic(field, A, B))):
+                results.append({"field": field.size, "op": name, "rows": d,
+                                "seconds": _time(func, min_time)})
+    return results
+
+
+def bench_encode(fields, k, n, count, min_time, rng):
+    """Returns codewords per second for each way of encoding"""
+    results = []
+    for field in fields:
+        G = _random_matrix(field, k, n, rng)
+        W = _random_matrix(field, k, count, rng)
+        words = [list(w) for w in zip(*W)]
+        code = LinearCode(field, G)
+        cases = [
+            ("encode", lambda: [field.encode(G, w) for w in words]),
+            ("encode_batch", lambda: field.encode_batch(G, W)),
+            ("LinearCode.encode", lambda: [code.encode(w) for w in words]),
+        ]
+        if np is not None:
+            (G_array, W_array) = (np.array(G), np.array(W))
+            cases.append(("encode_batch[numpy]",
+                          lambda: field.encode_batch(G_array, W_array)))
+        for (name, func) in cases:
+            seconds = _time(func, min_time)
+            results.append({"field": field.size, "op": name, "k": k, "n": n,
+                            "codewords_per_sec": count / seconds})
+    return results
+
+
+def bench_stream(fields, k, n, size, rng):
+    """Returns the throughput of encoding and checking a stream of size bytes"""
+    results = []
+    data = bytes(rng.randrange(256) for _ in range(size))
+    for field in fields:
+        if field.size not in (2, 256, 65536):
+            continue
+        code = LinearCode(field, _random_matrix(field, k, n, rng))
+        out = io.BytesIO()
+        stats = stream.encode_stream(code, data, out)
+        results.append({"field": field.size, "op": "encode_stream", "k": k,
+                        "n": n, "mb_per_sec": stats.mb_per_sec})
+        stats = stream.check_stream(code, out.getvalue())
+        results.append({"field": field.size, "op": "check_stream", "k": k,
+                        "n": n, "mb_per_sec": stats.mb_per_sec})
+    return results
+
+
+def bench_reedsolomon(count, min_time, rng):
+    """
+    Returns the throughput of RS(255, 223) in megabytes of message data per
+    second, for batches of count codewords
+    """
+    RS = ReedSolomon(255, 223)
+    messages = [bytes(rng.randrange(256) for _ in range(RS.k))
+                for _ in range(count)]
+    codewords = RS.encode_batch(messages)
+    damaged = [bytes(c[:8]) + bytes(8) + c[16:] for c in codewords]
+    results = []
+    for (name, func) in (
+            ("encode_batch", lambda: RS.encode_batch(messages)),
+            ("decode_batch[clean]", lambda: RS.decode_batch(codewords)),
+            ("decode_batch[8 errors]", lambda: RS.decode_batch(damaged))):
+        seconds = _time(func, min_time)
+        results.append({"op": name, "n": RS.n, "k": RS.k,
+                        "mb_per_sec": count * RS.k / seconds / 1e6})
+    return results
+
+
+def bench_cyclic(size, count, min_time, rng):
+    """
+    Returns the throughput of CRCs over size bytes, and the time to encode a
+    word of the [255, 247] cyclic code over GF(2) by division and with its
+    generator matrix
+    """
+    data = bytes(rng.randrange(256) for _ in range(size))
+    crc32 = CRC(0x104C11DB7, init=0xFFFFFFFF, reflect=True, xorout=0xFFFFFFFF)
+    crc64 = CRC(0x142F0E1EBA9EA3693)
+    results = []
+    for (name, func) in (
+            ("crc32[zlib]", lambda: crc32.checksum(data)),
+            ("crc32[table]", lambda: crc32._table_update(0, data)),
+            ("crc64[table]", lambda: crc64.checksum(data))):
+        results.append({"op": name, "bytes": size,
+                        "mb_per_sec": size / _time(func, min_time) / 1e6})
+    C = CyclicCode(GF(2), 255, [1, 0, 1, 1, 1, 0, 0, 0, 1])
+    L = LinearCode(C.field, C.G)
+    words = [[rng.randrange(2) for _ in range(C.k)] for _ in range(count)]
+    for (name, code) in (("encode[cyclic]", C), ("encode[matrix]", L)):
+        seconds = _time(lambda: [code.encode(w) for w in words], min_time)
+        results.append({"op": name, "field": 2, "n": C.n, "k": C.k,
+                        "seconds": seconds / count})
+    return results
+
+
+def bench_bounds(ns, q, min_time):
+    """
+    Returns the time to compute each bound for d = n / 4, for each n, with
+    no ball volumes or Krawtchouk tables kept from earlier calls
+    """
+    results = []
+    for n in ns:
+        d = max(1, n // 4)
+        for name in ("singleton_bound", "hamming_bound", "lower_bound"):
+            bound = getattr(bounds, name)
+
+            def cold():
+                bounds._volumes.cache_clear()
+                bounds._krawtchouk.cache_clear()
+                return bound(n, d, q)
+            results.append({"op": name, "n": n, "d": d, "q": q,
+                            "seconds": _time(cold, min_time)})
+    return results
+
+
+def _commit():
+    """Returns the current git commit, or None outside a git checkout"""
+    try:
+        return subprocess.check_output(["git", "rev-parse", "HEAD"],
+                                       stderr=subprocess.DEVNULL,
+                                       universal_newlines=True).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run(quick=False, seed=0):
+    """Runs every benchmark and returns the results as a dict"""
+    rng = random.Random(seed)
+    min_time = 0.01 if quick else 0.2
+    fields = [GF(size, poly=poly) for (size, poly) in FIELDS]
+    dims = [4, 8] if quick else [8, 16, 32, 64, 128]
+    (k, n, count) = (4, 8, 16) if quick else (32, 64, 1000)
+    ns = [8, 16] if quick else [16, 32, 64, 128]
+    return {
+        "meta": {
+            "commit": _commit(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "numpy": np.__version__ if np is not None else None,
+            "quick": quick,
+            "seed": seed,
+        },
+        "scalar": bench_scalar(fields, min_time, rng),
+        "rref": bench_rref(fields, dims, min_time, rng),
+        "matmul": bench_matmul(fields, dims, min_time, rng),
+        "encode": bench_encode(fields, k, n, count, min_time, rng),
+        "stream": bench_stream(fields, k, n, 1 << (12 if quick else 20), rng),
+        "reedsolomon": bench_reedsolomon(16 if quick else 1000, min_time, rng),
+        "cyclic": bench_cyclic(1 << (12 if quick else 20), count, min_time,
+                               rng),
+        "bounds": bench_bounds(ns, 2, min_time),
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--quick", action="store_true",
+                        help="use small inputs and short timings")
+    parser.add_argument("--seed", type=int, default=0,
+                        help="seed for the random inputs")
+    parser.add_argument("--output", "-o",
+                        help="write JSON here instead of to stdout")
+    args = parser.parse_args(argv)
+
+    results = run(quick=args.quick, seed=args.seed)
+    text = json.dumps(results, indent=2, sort_keys=True)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(text + "\n")
+    else:
+        print(text)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,4 +1,8 @@
 from math import *
+from collections import namedtuple
+from fractions import Fraction
+from functools import lru_cache
+from threading import Lock
 
 """Calculate various bounds for the size of (n, M, d) codes."""
 
@@ -12,40 +16,244 @@ class bcolors:
   BOLD = '\033[1m'
   UNDERLINE = '\033[4m'
 
+# Bounds for one (n, d, q) point, as returned by bound_grid()
+Bounds = namedtuple("Bounds", "n d q singleton hamming lower")
+
+# Every bound for one (n, d, q) point, as returned by bound_table().  best is
+# the least of the upper bounds that hold for all codes; griesmer only holds
+# for linear codes, and lp is None when the LP bound was not computed.
+BoundTable = namedtuple("BoundTable", "n d q singleton hamming plotkin elias "
+                                      "lp griesmer lower best")
+
+# Largest number of (n, q) pairs whose ball volumes are kept
+VOLUME_CACHE_SIZE = 256
+
+# Held while extending a list of volumes, which threads may share
+_volumes_lock = Lock()
+
+@lru_cache(maxsize = VOLUME_CACHE_SIZE)
+def _volumes(n, q):
+  """
+  Returns the list whose entry r is the volume of the Hamming ball of radius
+  r in GF(q)^n.  ball_volume() extends it only as far as it has been asked
+  for, and it is kept for later calls with the same n and q.
+  """
+  return [1]
+
 def choose(n, k):
-  return (factorial(n) / (factorial(k) * factorial(n-k)))
+  """Returns the binomial coefficient n choose k, exactly."""
+  if k < 0 or k > n:
+    return 0
+  k = min(k, n - k)
+  result = 1
+  for i in range(k):
+    result = result * (n - i) // (i + 1)
+  return result
+
+def ball_volume(n, r, q = 2):
+  """
+  Returns the number of words of length n over an alphabet of size q within
+  Hamming distance r of a fixed word.
+  """
+  if r < 0:
+    return 0
+  r = min(r, n)
+  volumes = _volumes(n, q)
+  if len(volumes) <= r:
+    with _volumes_lock:
+      i = len(volumes) - 1
+      # term is choose(n, i) * (q - 1)**i, recovered from the last two volumes
+      term = volumes[i] - (volumes[i - 1] if i > 0 else 0)
+      while i < r:
+        term = term * (n - i) * (q - 1) // (i + 1)
+        volumes.append(volumes[-1] + term)
+        i += 1
+  return volumes[r]
 
 def hasDuplicates(list):
   return len(list) != len(set(list))
 
 def hamming_bound(n, d, q = 2):
-  try:
-    summation = 0
-    for i in range(0, floor((d - 1)/2) + 1):
-      summation += choose(n, i) * ((q - 1)**i)
-    return q**n / summation
-  except ZeroDivisionError:
+  volume = ball_volume(n, (d - 1) // 2, q)
+  if volume == 0:
     print(bcolors.WARNING + "Division by zero" + bcolors.ENDC)
     return -1
+  return q**n // volume
 
 def singleton_bound(n, d, q = 2):
   return q**(n - d + 1)
 
 def lower_bound(n, d, q = 2):
-  try:
-    summation = 0
-    for m in range(0, d - 1 + 1):
-      summation += choose(n, m) * ((q - 1)**m)
-    return ceil(q**n / summation)
-  except ZeroDivisionError:
+  volume = ball_volume(n, d - 1, q)
+  if volume == 0:
     return -1
+  return -(-q**n // volume)
+
+# Largest number of (n, q) pairs whose Krawtchouk tables are kept
+KRAWTCHOUK_CACHE_SIZE = 64
+
+# Held while looking up or building a Krawtchouk table, so that threads
+# asking for the same one build it once
+_krawtchouk_lock = Lock()
+
+def krawtchouk(n, q = 2):
+  """
+  Returns the table of Krawtchouk polynomials K_k(x) for length n and
+  alphabet size q, indexed [k][x] for 0 <= k, x <= n.  Built once per (n, q)
+  with the three-term recurrence, then cached.
+  """
+  with _krawtchouk_lock:
+    return _krawtchouk(n, q)
+
+@lru_cache(maxsize = KRAWTCHOUK_CACHE_SIZE)
+def _krawtchouk(n, q):
+  """krawtchouk() without the cache lock"""
+  K = [[1] * (n + 1), [(q - 1) * (n - x) - x for x in range(n + 1)]]
+  for k in range(1, n):
+    K.append([((k + (q - 1) * (n - k) - q * x) * K[k][x] -
+               (q - 1) * (n - k + 1) * K[k - 1][x]) // (k + 1)
+              for x in range(n + 1)])
+  return K[:n + 1]
+
+def plotkin_bound(n, d, q = 2):
+  """
+  Plotkin bound.  Applies directly when q d > (q - 1) n; otherwise the code is
+  shortened to the longest length n0 where it does.
+  """
+  if d < 1:
+    return q**n
+  n0 = min(n, (q * d - 1) // (q - 1))
+  return q**(n - n0) * (q * d // (q * d - (q - 1) * n0))
+
+def griesmer_bound(n, d, q = 2):
+  """
+  Griesmer bound on the size q**k of a linear [n, k, d] code, where k is the
+  largest dimension whose Griesmer length sum(ceil(d / q**i)) is at most n.
+  """
+  if d < 1:
+    return q**n
+  k = 0
+  length = 0
+  while True:
+    length += -(-d // q**k)
+    if length > n:
+      return q**k
+    k += 1
+
+def elias_bound(n, d, q = 2):
+  """
+  Elias-Bassalygo bound, minimised over every admissible radius r.  Returns -1
+  if no radius is admissible.
+  """
+  theta = Fraction(q - 1, q)
+  best = None
+  for r in range(0, int(theta * n) + 1):
+    denominator = r * r - 2 * theta * n * r + theta * n * d
+    if denominator <= 0:
+      continue
+    bound = theta * n * d / denominator * q**n / ball_volume(n, r, q)
+    if best is None or bound < best:
+      best = bound
+  return -1 if best is None else floor(best)
+
+def lp_bound(n, d, q = 2):
+  """
+  Delsarte linear programming bound: the maximum of 1 + A_d + ... + A_n over
+  distance distributions with A_i >= 0 and, for each k,
+  K_k(0) + sum(A_i K_k(i)) >= 0.  Solved exactly by the simplex method.
+  """
+  if d > n:
+    return 1
+  K = krawtchouk(n, q)
+  A = [[-K[k][i] for i in range(d, n + 1)] for k in range(1, n + 1)]
+  b = [K[k][0] for k in range(1, n + 1)]
+  c = [1] * (n - d + 1)
+  return floor(1 + _simplex(A, b, c))
+
+def _simplex(A, b, c):
+  """
+  Returns the maximum of c x subject to A x <= b and x >= 0, where b >= 0,
+  using exact fractions and Bland's rule so that it cannot cycle.
+  """
+  m = len(A)
+  cols = len(c) + m
+  T = [[Fraction(x) for x in row] + [Fraction(int(i == j)) for j in range(m)]
+       + [Fraction(b[i])] for (i, row) in enumerate(A)]
+  z = [Fraction(-x) for x in c] + [Fraction(0)] * (m + 1)
+  basis = [len(c) + i for i in range(m)]
+  while True:
+    col = next((j for j in range(cols) if z[j] < 0), None)
+    if col is None:
+      return z[-1]
+    row = None
+    for i in range(m):
+      if T[i][col] > 0:
+        ratio = T[i][-1] / T[i][col]
+        if (row is None or ratio < best or
+            (ratio == best and basis[i] < basis[row])):
+          (row, best) = (i, ratio)
+    if row is None:
+      raise ValueError("Linear program is unbounded.")
+    pivot = T[row][col]
+    T[row] = [x / pivot for x in T[row]]
+    for i in range(m):
+      if i != row and T[i][col] != 0:
+        factor = T[i][col]
+        T[i] = [x - factor * y for (x, y) in zip(T[i], T[row])]
+    factor = z[col]
+    z = [x - factor * y for (x, y) in zip(z, T[row])]
+    basis[row] = col
+
+def bound_grid(ns, ds, q = 2):
+  """
+  Returns a list of Bounds, holding the Singleton, Hamming and
+  Gilbert-Varshamov (lower) bounds for every n in ns and d in ds with
+  1 <= d <= n.  The ball volumes for each n are built once and shared by every
+  d, so a whole grid costs little more than its largest point.
+  """
+  results = []
+  ds = sorted(ds)
+  for n in ns:
+    size = q**n
+    for d in ds:
+      if not 1 <= d <= n:
+        continue
+      hamming = size // ball_volume(n, (d - 1) // 2, q)
+      lower = -(-size // ball_volume(n, d - 1, q))
+      results.append(Bounds(n, d, q, size // q**(d - 1), hamming, lower))
+  return results
+
+def bound_table(ns, ds, q = 2, lp = True):
+  """
+  Returns a list of BoundTable, holding every bound for each n in ns and d in
+  ds with 1 <= d <= n.  Ball volumes and Krawtchouk polynomials are computed
+  once per n and shared by every d.  The LP bound is by far the slowest; pass
+  lp=False to skip it.
+  """
+  results = []
+  for b in bound_grid(ns, ds, q):
+    (n, d) = (b.n, b.d)
+    plotkin = plotkin_bound(n, d, q)
+    elias = elias_bound(n, d, q)
+    lp_value = lp_bound(n, d, q) if lp else None
+    upper = [x for x in (b.singleton, b.hamming, plotkin, elias, lp_value)
+             if x is not None and x != -1]
+    results.append(BoundTable(n, d, q, b.singleton, b.hamming, plotkin,
+                              elias, lp_value, griesmer_bound(n, d, q),
+                              b.lower, min(upper)))
+  return results
 
 def bound_info(n, d, q = 2):
   print(u"Singleton bound: A_q ≤ %d" % singleton_bound(n, d, q))
   hamming = hamming_bound(n, d, q)
   if (hamming != -1):
     print(u"Hamming bound:   A_q ≤ %d" % hamming)
+  print(u"Plotkin bound:   A_q ≤ %d" % plotkin_bound(n, d, q))
+  elias = elias_bound(n, d, q)
+  if (elias != -1):
+    print(u"Elias bound:     A_q ≤ %d" % elias)
+  print(u"LP bound:        A_q ≤ %d" % lp_bound(n, d, q))
+  print(u"Griesmer bound:  B_q ≤ %d (linear codes)" % griesmer_bound(n, d, q))
   lower = lower_bound(n, d, q)
   if (lower != -1):
     print(u"Lower bound:     A_q ≥ %s" % lower)
-
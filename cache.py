@@ -0,0 +1,284 @@
+"""
+A persistent cache of field tables and code artifacts on disk.
+
+Building the log, antilog and inverse tables of a large field, or the RREF,
+parity-check matrix and coset leaders of a large code, takes far longer than
+reading them back.  A TableCache keeps them in a directory, one file per
+field or artifact, so that a new process maps them in with mmap instead of
+computing them again.  Fields created with cache=... look their tables up
+there, and codes over such a field do the same for their artifacts:
+
+    cache = TableCache("/var/cache/galois", max_bytes=1 << 30)
+    F = GF(65536, cache=cache)      # tables built once, then mapped
+    C = LinearCode(F, G)            # RREF, H and coset leaders likewise
+
+Files are keyed by the field (its size and polynomial) and, for codes, a
+SHA-256 hash of G.  Once the files in the directory take up more than
+max_bytes, the least recently used are deleted.  Any number of processes may
+share a directory: files are written to a temporary name and renamed into
+place, so a reader sees either the whole file or none of it.
+
+File format, all header fields little-endian:
+
+    header      magic b"GFPYTBL\\0", format version (uint16), byte order of
+                the arrays (uint8: 0 little, 1 big), a pad byte, number of
+                arrays (uint32), length of the key (uint32) and CRC-32 of
+                everything after the header (uint32)
+    key         the key, in UTF-8
+    directory   per array: name (16 bytes, NUL padded), array typecode
+                (1 byte), 7 pad bytes, offset and length (uint64 each)
+    arrays      each starting at a multiple of 8 bytes from the file start
+
+A file whose magic, version, byte order, key or checksum does not match is
+a miss, and is replaced by the next store().
+"""
+import hashlib
+import mmap
+import os
+import struct
+import sys
+import tempfile
+import zlib
+from array import array
+
+__author__ = "Jerry Yin"
+
+# Bump whenever the file format, or what is stored for a key, changes
+VERSION = 1
+
+# Total size of the cache directory above which files are evicted by default
+MAX_BYTES = 1 << 28
+
+MAGIC = b"GFPYTBL\0"
+SUFFIX = ".gft"
+
+_HEADER = struct.Struct("<8sHBxIII")
+_ENTRY = struct.Struct("<16sc7xQQ")
+_BYTE_ORDER = 0 if sys.byteorder == "little" else 1
+
+# Fixed-size array typecodes, smallest first
+_TYPECODES = [(code, array(code).itemsize) for code in "bBhHiIqQ"
+              if array(code).itemsize in (1, 2, 4, 8)]
+
+
+def _typecode(values):
+    """Returns the smallest typecode holding every int in values"""
+    low = min(values) if values else 0
+    high = max(values) if values else 0
+    for (code, size) in _TYPECODES:
+        bits = 8 * size
+        if code.islower():
+            fits = -(1 << (bits - 1)) <= low and high < 1 << (bits - 1)
+        else:
+            fits = 0 <= low and high < 1 << bits
+        if fits:
+            return code
+    raise OverflowError("Values do not fit in 64 bits.")
+
+
+def field_key(field):
+    """Returns the key naming the tables of field"""
+    if field.poly is None:
+        return "GF(%d)" % field.size
+    return "GF(%d, poly=%#x)" % (field.size, field.poly)
+
+
+def matrix_hash(M):
+    """Returns a SHA-256 hex digest of the shape and entries of matrix M"""
+    rows = len(M)
+    cols = len(M[0]) if rows else 0
+    digest = hashlib.sha256(("%d %d " % (rows, cols)).encode("ascii"))
+    for row in M:
+        digest.update(",".join(map(str, row)).encode("ascii"))
+        digest.update(b";")
+    return digest.hexdigest()
+
+
+class TableCache(object):
+    """
+    A directory of cached arrays, each file holding the named arrays stored
+    under one key.  The directory is created if it does not exist.  Once the
+    files in it take up more than max_bytes, the least recently used are
+    deleted until they fit.
+
+    Usage:
+
+        cache = TableCache("cache")
+        cache.store("key", {"powers": [1, 2, 4, 8]})
+        cache.load("key")["powers"].tolist()    # [1, 2, 4, 8]
+    """
+
+    def __init__(self, directory, max_bytes=MAX_BYTES):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        os.makedirs(directory, exist_ok=True)
+
+    def __repr__(self):
+        return "TableCache(%r, max_bytes=%d)" % (self.directory,
+                                                  self.max_bytes)
+
+    def __getstate__(self):
+        # Counters are per process; worker processes start their own
+        return {"directory": self.directory, "max_bytes": self.max_bytes}
+
+    def __setstate__(self, state):
+        self.__init__(state["directory"], state["max_bytes"])
+
+    def path(self, key):
+        """Returns the file that holds key"""
+        name = hashlib.sha256(key.encode("utf-8")).hexdigest()[:32]
+        return os.path.join(self.directory, name + SUFFIX)
+
+    def _files(self):
+        """Returns (last use, size, path) for every file in the cache"""
+        files = []
+        for entry in os.scandir(self.directory):
+            if entry.name.endswith(SUFFIX):
+                try:
+                    stat = entry.stat()
+                except OSError:
+                    continue
+                files.append((stat.st_mtime, stat.st_size, entry.path))
+        return files
+
+    def __len__(self):
+        return len(self._files())
+
+    @property
+    def size(self):
+        """Total size in bytes of the files in the cache"""
+        return sum(size for (_, size, _) in self._files())
+
+    def load(self, key):
+        """
+        Returns the arrays stored under key as a dict mapping each name to a
+        read-only memoryview into the mapped file, or None if key is missing
+        or its file fails the checks.
+        """
+        path = self.path(key)
+        try:
+            with open(path, "rb") as f:
+                mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        except (OSError, ValueError):
+            self.misses += 1
+            return None
+        view = memoryview(mapped)
+        arrays = _parse(view, key)
+        if arrays is None:
+            # Nothing refers to the mapping, so unmap it now
+            view.release()
+            mapped.close()
+            self.misses += 1
+            return None
+        try:
+            os.utime(path)      # Mark as recently used
+        except OSError:
+            pass
+        self.hits += 1
+        return arrays
+
+    def store(self, key, arrays):
+        """
+        Stores arrays, a dict mapping names of at most 16 ASCII characters to
+        sequences of ints, under key, replacing anything stored there, and
+        evicts files if the cache is then too big.  Returns False if the file
+        could not be written, or an array holds a value that does not fit in
+        64 bits.
+        """
+        try:
+            data = _serialize(key, arrays)
+        except OverflowError:
+            return False
+        try:
+            (fd, temp) = tempfile.mkstemp(suffix=".tmp", dir=self.directory)
+        except OSError:
+            return False
+        try:
+            with os.fdopen(fd, "wb") as f:
+                f.write(data)
+            os.replace(temp, self.path(key))
+        except OSError:
+            try:
+                os.remove(temp)
+            except OSError:
+                pass
+            return False
+        self.evict()
+        return True
+
+    def evict(self):
+        """Deletes the least recently used files until the cache fits"""
+        files = sorted(self._files())
+        total = sum(size for (_, size, _) in files)
+        for (_, size, path) in files:
+            if total <= self.max_bytes:
+                break
+            try:
+                os.remove(path)
+            except OSError:
+                continue
+            total -= size
+
+    def clear(self):
+        """Deletes every file in the cache"""
+        for (_, _, path) in self._files():
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+
+
+def _serialize(key, arrays):
+    """Returns the contents of the file holding arrays under key"""
+    key = key.encode("utf-8")
+    entries = []
+    payloads = []
+    offset = _HEADER.size + len(key) + _ENTRY.size * len(arrays)
+    for (name, values) in sorted(arrays.items()):
+        if len(name) > 16:
+            raise ValueError("Array name %r is too long." % name)
+        values = array(_typecode(values), values) \
+            if not isinstance(values, array) else values
+        offset += -offset % 8
+        entries.append(_ENTRY.pack(name.encode("ascii"),
+                                   values.typecode.encode("ascii"), offset,
+                                   len(values)))
+        payloads.append((offset, values.tobytes()))
+        offset += len(payloads[-1][1])
+    body = bytearray(key + b"".join(entries))
+    for (offset, payload) in payloads:
+        body += bytes(offset - _HEADER.size - len(body))
+        body += payload
+    header = _HEADER.pack(MAGIC, VERSION, _BYTE_ORDER, len(arrays), len(key),
+                          zlib.crc32(body))
+    return header + bytes(body)
+
+
+def _parse(view, key):
+    """
+    Returns the arrays in view, the contents of a cache file, or None unless
+    it is a file of this version and byte order, for key, with a good CRC.
+    """
+    if len(view) < _HEADER.size:
+        return None
+    (magic, version, order, count, key_length, crc) = \
+        _HEADER.unpack_from(view)
+    if (magic, version, order) != (MAGIC, VERSION, _BYTE_ORDER):
+        return None
+    body = view[_HEADER.size:]
+    if zlib.crc32(body) != crc:
+        return None
+    if bytes(body[:key_length]) != key.encode("utf-8"):
+        return None
+    arrays = {}
+    start = _HEADER.size + key_length
+    for i in range(count):
+        (name, code, offset, length) = _ENTRY.unpack_from(
+            view, start + i * _ENTRY.size)
+        code = code.decode("ascii")
+        stop = offset + length * array(code).itemsize
+        arrays[name.rstrip(b"\0").decode("ascii")] = \
+            view[offset:stop].cast(code)
+    return arrays
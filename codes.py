@@ -0,0 +1,719 @@
+"""
+Linear codes over finite fields.
+"""
+import functools
+import threading
+from collections import OrderedDict
+from itertools import combinations, product
+
+import gf2
+from cache import field_key, matrix_hash
+from Galois import GF, _is_array, np, _transpose
+
+__author__ = "Jerry Yin"
+
+# Most coset leaders a SyndromeDecoder keeps in memory by default
+DECODER_LIMIT = 1 << 20
+
+# Most erasure patterns whose recovery matrices a LinearCode keeps by default
+RECOVERY_CACHE_SIZE = 256
+
+# Codes with at most this many codewords have their minimum distance found by
+# enumerating every codeword; larger ones use information sets
+ENUMERATION_LIMIT = 1 << 16
+
+
+def _cached(method):
+    """
+    Turns method into a read-only property whose value is computed on first
+    access and then kept for the lifetime of the instance.
+    """
+    name = method.__name__
+
+    @functools.wraps(method)
+    def getter(self):
+        try:
+            return self._cache[name]
+        except KeyError:
+            value = self._cache[name] = method(self)
+            return value
+    return property(getter)
+
+
+def _flatten(M):
+    """Returns the entries of matrix M row by row, as one list"""
+    return [x for row in M for x in row]
+
+
+def _unflatten(flat, cols):
+    """Returns the rows of cols entries each in flat.  Inverse of _flatten()"""
+    return [list(flat[i:i + cols]) for i in range(0, len(flat), cols)]
+
+
+class LRUCache(object):
+    """
+    A thread-safe mapping of at most max_entries keys to values, forgetting
+    the least recently used key when it is full.  hits, misses and
+    evictions count what get() has done since the cache was created.
+    """
+
+    def __init__(self, max_entries):
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __getstate__(self):
+        # Locks cannot be pickled; a copy in another process starts empty
+        return {"max_entries": self.max_entries}
+
+    def __setstate__(self, state):
+        self.__init__(state["max_entries"])
+
+    def __len__(self):
+        return len(self._entries)
+
+    def __contains__(self, key):
+        return key in self._entries
+
+    def get(self, key, compute):
+        """
+        Returns the value for key, calling compute() to make it if key is
+        not in the cache.  compute() runs without the lock held, so a slow
+        one does not hold up lookups of other keys.
+        """
+        with self._lock:
+            try:
+                value = self._entries[key]
+            except KeyError:
+                self.misses += 1
+            else:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return value
+        value = compute()
+        with self._lock:
+            # Another thread may have made the same value meanwhile; keep one
+            value = self._entries.setdefault(key, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+        return value
+
+    def clear(self):
+        """Forgets every entry, keeping the counters"""
+        with self._lock:
+            self._entries.clear()
+
+
+class LinearCode:
+    """
+    A linear code over a finite field, given by a generator matrix G.
+
+    The RREF of G, its pivot columns, the rank, the standard form and the
+    parity-check matrix are each computed the first time they are needed and
+    then reused, so a LinearCode can encode and check any number of words
+    without repeating the Gaussian elimination.
+
+    Usage:
+
+        GF2 = GF(2)
+        C = LinearCode(GF2, [[1, 0, 1, 1], [0, 1, 0, 1]])
+        c = C.encode([1, 1])
+        C.syndrome(c)   # [0, 0]
+        c in C          # True
+    """
+
+    def __init__(self, field, G, recovery_cache_size=RECOVERY_CACHE_SIZE):
+        if not isinstance(field, GF):
+            raise TypeError("field must be a GF instance.")
+        if _is_array(G):
+            G = G.tolist()
+        cols = len(G[0])
+        for row in G:
+            if len(row) != cols:
+                raise ValueError("Matrix not valid, check row lengths.")
+        self.field = field
+        self.G = field.identity(G)
+        self._cache = {}
+        self.recoveries = LRUCache(recovery_cache_size)
+
+    def __repr__(self):
+        return "LinearCode(%r, [%d, %d])" % (self.field, self.n, self.k)
+
+    @property
+    def n(self):
+        """Length of each codeword"""
+        return len(self.G[0])
+
+    @property
+    def k(self):
+        """Dimension of the code"""
+        return self.rank
+
+    def _cache_key(self, name):
+        """Returns the key of artifact name of this code in a TableCache"""
+        return "LinearCode %s %s %s" % (field_key(self.field),
+                                        matrix_hash(self.G), name)
+
+    def _stored(self, name, compute):
+        """
+        Returns the dict of arrays that compute() returns for artifact name,
+        from the field's cache if it has one and the artifact is there, and
+        otherwise from compute(), storing the result in the cache.
+        """
+        cache = self.field.cache
+        if cache is None:
+            return compute()
+        key = self._cache_key(name)
+        arrays = cache.load(key)
+        if arrays is None:
+            arrays = compute()
+            cache.store(key, arrays)
+        return arrays
+
+    @_cached
+    def _reduced(self):
+        def compute():
+            (R, pivots) = self.field.rref_with_pivots(self.G)
+            return {"rref": _flatten(R), "pivots": pivots}
+        arrays = self._stored("rref", compute)
+        return (_unflatten(arrays["rref"], self.n), list(arrays["pivots"]))
+
+    @property
+    def rref(self):
+        """The reduced row echelon form of G"""
+        return self._reduced[0]
+
+    @property
+    def pivots(self):
+        """The pivot column of each nonzero row of the RREF of G"""
+        return self._reduced[1]
+
+    @_cached
+    def rank(self):
+        """The rank of G, which is the dimension of the code"""
+        return len(self.pivots)
+
+    @_cached
+    def standard_form(self):
+        """
+        The generator matrix of the code in standard form, or None if the code
+        has none without permuting its coordinates.
+        """
+        if self.pivots != list(range(self.rank)):
+            return None
+        return self.rref[:self.rank]
+
+    @_cached
+    def H(self):
+        """
+        A parity-check matrix for the code, with the identity in the non-pivot
+        columns.  When G has a standard form this is the same matrix that
+        GF.create_pc_matrix() builds.
+        """
+        arrays = self._stored("H", lambda: {"H": _flatten(self._pc_matrix())})
+        return _unflatten(arrays["H"], self.n)
+
+    def _pc_matrix(self):
+        """Builds H from the RREF of G"""
+        F = self.field
+        pivots = self.pivots
+        pivot_set = set(pivots)
+        H = []
+        for j in range(self.n):
+            if j in pivot_set:
+                continue
+            h = [0] * self.n
+            h[j] = 1
+            for row, p in zip(self.rref, pivots):
+                h[p] = F.identity(F.negative(row[j]))
+            H.append(h)
+        return H
+
+    @_cached
+    def H_T(self):
+        """The transpose of H"""
+        return _transpose(self.H) if self.H else [[] for _ in range(self.n)]
+
+    @_cached
+    def _G_packed(self):
+        return gf2.pack_rows(self.G)
+
+    @_cached
+    def _H_packed(self):
+        return gf2.pack_rows(self.H)
+
+    def _G_array(self):
+        if "G_array" not in self._cache:
+            self._cache["G_array"] = self.field._np_array(self.G)
+        return self._cache["G_array"]
+
+    def _H_T_array(self):
+        if "H_T_array" not in self._cache:
+            self._cache["H_T_array"] = self.field._np_array(self.H_T)
+        return self._cache["H_T_array"]
+
+    @_cached
+    def _recovery(self):
+        """
+        Returns (I, R), where I is an information set of G (the pivot columns
+        of its RREF) and R is the inverse of G restricted to the columns I, so
+        that the word encoded as c is c[I] times R.
+        """
+        if not self.is_generator_matrix():
+            raise ValueError("G does not have linearly independent rows.")
+        info = self.pivots
+        return (info, self.field.inverse([[row[j] for j in info]
+                                          for row in self.G]))
+
+    def extract(self, c):
+        """Returns the word that encodes to codeword c"""
+        (info, R) = self._recovery
+        return self.field.encode(R, [c[j] for j in info])
+
+    def extract_batch(self, C):
+        """
+        Returns the words encoding to every column of the n x N matrix C, as
+        the columns of a k x N matrix.
+        """
+        (info, R) = self._recovery
+        if _is_array(C):
+            return self.field.encode_batch(self.field._np_array(R), C[info])
+        return self.field.encode_batch(R, [C[j] for j in info])
+
+    def recovery_matrix(self, erasures):
+        """
+        Returns (I, R) for recovering words from codewords with the symbols at
+        the positions in erasures lost: I is an information set avoiding
+        them and R is the inverse of G restricted to the columns I.  Results
+        are kept in the LRU cache recoveries, keyed by the erasure set, so a
+        repeated pattern costs one lookup.  Raises ValueError if too many
+        symbols are lost to recover the word.
+        """
+        erased = tuple(sorted(set(erasures)))
+        return self.recoveries.get(erased,
+                                   lambda: self._make_recovery(erased))
+
+    def _make_recovery(self, erased):
+        if erased and not 0 <= erased[0] <= erased[-1] < self.n:
+            raise ValueError("Erasure positions must be in range(%d)."
+                             % self.n)
+        F = self.field
+        lost = set(erased)
+        survivors = [j for j in range(self.n) if j not in lost]
+        k = len(self.G)
+        plu = F.lu([[row[j] for j in survivors] for row in self.G])
+        if plu.rank < k:
+            raise ValueError("Too many erasures to recover the word.")
+        # The pivot columns of the survivors hold the inverse: solving with
+        # the identity sets the other (free) variables to 0
+        X = plu.solve_batch([[int(i == j) for j in range(k)]
+                             for i in range(k)])
+        return ([survivors[p] for p in plu.pivots],
+                [X[p] for p in plu.pivots])
+
+    def recover(self, r, erasures):
+        """
+        Returns the word encoded as r, ignoring the symbols of r at the
+        positions in erasures.  encode() gives back the whole codeword.
+        """
+        (info, R) = self.recovery_matrix(erasures)
+        return self.field.encode(R, [r[j] for j in info])
+
+    def recover_batch(self, C, erasures):
+        """
+        Returns the words encoded as the columns of the n x N matrix C, every
+        one of which has lost the symbols at the positions in erasures, as
+        the columns of a k x N matrix.
+        """
+        (info, R) = self.recovery_matrix(erasures)
+        if _is_array(C):
+            return self.field.encode_batch(self.field._np_array(R), C[info])
+        return self.field.encode_batch(R, [C[j] for j in info])
+
+    def is_generator_matrix(self):
+        """Returns True iff G has linearly independent rows"""
+        return self.rank == len(self.G)
+
+    def is_standard_form(self):
+        """Returns True iff G itself is in standard form"""
+        return self.field.is_standard_form(self.G, 'g')
+
+    def encode(self, w):
+        """Encodes word w of length len(G) and returns the codeword."""
+        if self.field.size == 2 and not _is_array(w):
+            if len(w) != len(self.G):
+                raise ValueError("Input word is wrong length.")
+            return gf2.unpack_vec(gf2.encode(self._G_packed, w), self.n)
+        G = self._G_array() if _is_array(w) else self.G
+        return self.field.encode(G, w)
+
+    def encode_batch(self, W):
+        """Encodes every column of W.  See GF.encode_batch()"""
+        G = self._G_array() if _is_array(W) else self.G
+        return self.field.encode_batch(G, W)
+
+    def syndrome(self, r):
+        """Returns the syndrome H r^T of received word r"""
+        if len(r) != self.n:
+            raise ValueError("Received word is wrong length.")
+        if _is_array(r):
+            return self.field.encode(self._H_T_array(), r)
+        if self.field.size == 2:
+            r = gf2.pack_vec(r)
+            return [gf2.dot(h, r) for h in self._H_packed]
+        return self.field.matmul([r], self.H_T)[0]
+
+    def syndrome_batch(self, R):
+        """
+        Returns the syndromes of every column of the n x N matrix R, as the
+        columns of an (n - k) x N matrix.
+        """
+        H_T = self._H_T_array() if _is_array(R) else self.H_T
+        return self.field.encode_batch(H_T, R)
+
+    def contains(self, r):
+        """Returns True iff r is a codeword"""
+        return not any(self.syndrome(r))
+
+    __contains__ = contains
+
+    def _codeword_weights(self):
+        """
+        Yields the weight of every codeword, visiting the messages in Gray code
+        order so that each codeword differs from the last by a multiple of one
+        row of the basis.  At step s, message symbol j advances to the next
+        field element, where j is the number of times q divides s.
+        """
+        F = self.field
+        basis = self.rref[:self.rank]
+        (q, k, n) = (F.size, len(basis), self.n)
+        yield 0
+        if q == 2:
+            rows = gf2.pack_rows(basis)
+            c = 0
+            for s in range(1, 2**k):
+                c ^= rows[(s & -s).bit_length() - 1]
+                yield gf2.popcount(c)
+            return
+        order = F.elements
+        deltas = [F.add(order[(t + 1) % q], F.negative(order[t]))
+                  for t in range(q)]
+        steps = [[F.scale_vec(delta, row) for delta in deltas] for row in basis]
+        state = [0] * k
+        c = [0] * n
+        for s in range(1, q**k):
+            j = 0
+            while s % q == 0:
+                s //= q
+                j += 1
+            c = F.add_vec(c, steps[j][state[j]])
+            state[j] = (state[j] + 1) % q
+            yield n - c.count(0)
+
+    @_cached
+    def weight_distribution(self):
+        """
+        The list A where A[i] is the number of codewords of weight i, found by
+        enumerating all q**k codewords.
+        """
+        A = [0] * (self.n + 1)
+        for w in self._codeword_weights():
+            A[w] += 1
+        return A
+
+    def minimum_distance(self, target=None):
+        """
+        Returns the minimum distance of the code.
+
+        Small codes have every codeword enumerated in Gray code order.  Codes
+        with more than ENUMERATION_LIMIT codewords use the Brouwer-Zimmermann
+        algorithm, which only enumerates low-weight messages over several
+        disjoint information sets until the lower bound meets the lightest
+        codeword found.  If target is given, returns min(d, target), which
+        lets the search stop as soon as d >= target is proved.
+        """
+        if self.rank == 0:
+            raise ValueError("The zero code has no minimum distance.")
+        if "weight_distribution" in self._cache or \
+                self.field.size**self.rank <= ENUMERATION_LIMIT:
+            d = next(i for i, a in enumerate(self.weight_distribution)
+                     if i > 0 and a > 0)
+            return d if target is None else min(d, target)
+        return self._brouwer_zimmermann(target)
+
+    def _information_sets(self):
+        """
+        Returns generator matrices of the code that are systematic on disjoint
+        information sets, as many as the columns of G allow.
+        """
+        F = self.field
+        k = self.rank
+        basis = self.rref[:k]
+        remaining = list(range(self.n))
+        matrices = []
+        while len(remaining) >= k:
+            columns = [[row[j] for j in remaining] for row in basis]
+            pivots = F.rref_with_pivots(columns)[1]
+            if len(pivots) < k:
+                break
+            info = [remaining[p] for p in pivots]
+            perm = info + [j for j in range(self.n) if j not in info]
+            R = F.rref_with_pivots([[row[j] for j in perm] for row in basis])[0]
+            systematic = [[0] * self.n for _ in range(k)]
+            for (i, row) in enumerate(R):
+                for (j, x) in zip(perm, row):
+                    systematic[i][j] = x
+            matrices.append(systematic)
+            remaining = [j for j in remaining if j not in info]
+        return matrices
+
+    def _brouwer_zimmermann(self, target):
+        F = self.field
+        k = self.rank
+        matrices = self._information_sets()
+        m = len(matrices)
+        upper = self.n + 1
+        for w in range(1, k + 1):
+            for Gamma in matrices:
+                upper = min(upper, self._lightest(Gamma, w))
+            # Any codeword not yet seen has weight at least w + 1 on each of
+            # the m disjoint information sets
+            lower = m * (w + 1)
+            if lower >= upper:
+                break
+            if target is not None and lower >= target:
+                return target
+        return upper if target is None else min(upper, target)
+
+    def _lightest(self, Gamma, w):
+        """
+        Returns the least weight of a codeword from a message of weight w
+        under generator matrix Gamma.  Messages are taken up to a scalar
+        multiple, so the first nonzero symbol is always 1.
+        """
+        F = self.field
+        best = self.n + 1
+        if F.size == 2:
+            rows = gf2.pack_rows(Gamma)
+            for support in combinations(rows, w):
+                c = 0
+                for row in support:
+                    c ^= row
+                best = min(best, gf2.popcount(c))
+            return best
+        for support in combinations(range(len(Gamma)), w):
+            for values in product(F.elements[1:], repeat=w - 1):
+                c = Gamma[support[0]]
+                for (i, v) in zip(support[1:], values):
+                    c = F.add_vec(c, F.scale_vec(v, Gamma[i]))
+                best = min(best, self.n - c.count(0))
+        return best
+
+    @_cached
+    def decoder(self):
+        """A SyndromeDecoder for the code, with the default table size"""
+        return SyndromeDecoder(self)
+
+    def decode(self, r):
+        """Returns the codeword nearest to received word r"""
+        return self.decoder.decode(r)
+
+    def decode_batch(self, R):
+        """Decodes every column of R.  See SyndromeDecoder.decode_batch()"""
+        return self.decoder.decode_batch(R)
+
+
+class SyndromeDecoder:
+    """
+    Decodes received words of a LinearCode to a nearest codeword, using a table
+    that maps each syndrome to a coset leader (an error pattern of least
+    weight with that syndrome).
+
+    The table is filled by enumerating error patterns in order of weight when
+    the decoder is created, until every coset has a leader or the table holds
+    max_entries leaders.  A syndrome missing from the table is found on
+    demand by continuing the enumeration, and kept if there is room.  With
+    lazy=True nothing is enumerated up front, which suits codes with many
+    cosets where only a few syndromes ever occur.
+
+    Usage:
+
+        C = LinearCode(GF(2), G)
+        D = SyndromeDecoder(C)
+        D.decode(r)
+        D.decode_batch(R)
+    """
+
+    def __init__(self, code, max_entries=DECODER_LIMIT, lazy=False):
+        self.code = code
+        self.max_entries = max_entries
+        F = code.field
+        self._cosets = F.size**len(code.H)
+        # Leaders are stored sparsely, as the (position, value) pairs to add
+        # to a received word to correct it
+        self._leaders = {}
+        # Every error pattern lighter than this has already been enumerated
+        self._weight = 0
+        if F.size == 2:
+            self._column_keys = gf2.pack_rows(code.H_T)
+        else:
+            self._scaled = [[F.scale_vec(v, col) for v in F.elements]
+                            for col in code.H_T]
+        if not lazy and not self._load():
+            self._fill()
+            self._store()
+
+    def __len__(self):
+        return len(self._leaders)
+
+    @property
+    def complete(self):
+        """True iff every coset has its leader in the table"""
+        return len(self._leaders) == self._cosets
+
+    def _key(self, s):
+        """Packs syndrome s into an int, s[0] being the lowest base-q digit"""
+        if self.code.field.size == 2:
+            return gf2.pack_vec(s)
+        key = 0
+        for x in reversed(s):
+            key = key * self.code.field.size + x
+        return key
+
+    def _keys(self, S):
+        """Packs each column of syndrome array S into an int"""
+        q = self.code.field.size
+        if q**len(S) < 1 << 63:
+            powers = q**np.arange(len(S), dtype=np.int64)
+        else:
+            powers = np.array([q**i for i in range(len(S))], dtype=object)
+        return S.T.dot(powers).tolist()
+
+    def _patterns(self, weight):
+        """Yields (correction, syndrome key) for each error of this weight"""
+        F = self.code.field
+        positions = range(self.code.n)
+        if F.size == 2:
+            keys = self._column_keys
+            for support in combinations(positions, weight):
+                key = 0
+                for j in support:
+                    key ^= keys[j]
+                yield (tuple((j, 1) for j in support), key)
+            return
+        zero = [0] * len(self.code.H)
+        for support in combinations(positions, weight):
+            for values in product(F.elements[1:], repeat=weight):
+                s = zero
+                for j, v in zip(support, values):
+                    s = F.add_vec(s, self._scaled[j][v])
+                correction = tuple((j, F.identity(F.negative(v)))
+                                   for j, v in zip(support, values))
+                yield (correction, self._key(s))
+
+    def _store(self):
+        """Stores the table in the cache of the code's field, if it has one"""
+        cache = self.code.field.cache
+        if cache is None:
+            return
+        leaders = self._leaders
+        arrays = {"keys": list(leaders),
+                  "lengths": [len(c) for c in leaders.values()],
+                  "positions": [j for c in leaders.values() for (j, _) in c],
+                  "values": [v for c in leaders.values() for (_, v) in c],
+                  "weight": [self._weight]}
+        cache.store(self.code._cache_key("leaders %d" % self.max_entries),
+                    arrays)
+
+    def _load(self):
+        """
+        Fills the table from the cache of the code's field and returns True,
+        or returns False if it is not there.
+        """
+        cache = self.code.field.cache
+        if cache is None:
+            return False
+        arrays = cache.load(self.code._cache_key("leaders %d"
+                                                 % self.max_entries))
+        if arrays is None:
+            return False
+        (positions, values) = (arrays["positions"].tolist(),
+                               arrays["values"].tolist())
+        start = 0
+        for (key, length) in zip(arrays["keys"].tolist(),
+                                 arrays["lengths"].tolist()):
+            stop = start + length
+            self._leaders[key] = tuple(zip(positions[start:stop],
+                                           values[start:stop]))
+            start = stop
+        self._weight = arrays["weight"][0]
+        return True
+
+    def _fill(self):
+        """Enumerates errors by weight until the table is complete or full"""
+        leaders = self._leaders
+        while (not self.complete and len(leaders) < self.max_entries and
+               self._weight <= self.code.n):
+            for (correction, key) in self._patterns(self._weight):
+                if key not in leaders:
+                    leaders[key] = correction
+                    if len(leaders) >= self.max_entries:
+                        return
+            self._weight += 1
+
+    def _correction(self, key):
+        """Returns the correction for the syndrome with packed key"""
+        try:
+            return self._leaders[key]
+        except KeyError:
+            pass
+        for weight in range(self._weight, self.code.n + 1):
+            for (correction, k) in self._patterns(weight):
+                if k == key:
+                    if len(self._leaders) < self.max_entries:
+                        self._leaders[key] = correction
+                    return correction
+        raise ValueError("Syndrome does not belong to this code.")
+
+    def coset_leader(self, s):
+        """Returns a least-weight error pattern with syndrome s"""
+        e = [0] * self.code.n
+        F = self.code.field
+        for (j, v) in self._correction(self._key(list(s))):
+            e[j] = F.identity(F.negative(v))
+        return e
+
+    def decode(self, r):
+        """Returns the codeword nearest to received word r"""
+        s = self.code.syndrome(r)
+        if _is_array(s):
+            s = s.tolist()
+        r = r.copy() if _is_array(r) else list(r)
+        add = self.code.field.add_scalar
+        for (j, v) in self._correction(self._key(s)):
+            r[j] = add(r[j], v)
+        return r
+
+    def decode_batch(self, R):
+        """
+        Decodes every column of the n x N matrix R with one syndrome product
+        and one table lookup per column, and returns the corrected codewords
+        as the columns of an n x N matrix.
+        """
+        S = self.code.syndrome_batch(R)
+        if _is_array(R):
+            keys = self._keys(S)
+            R = R.copy()
+        else:
+            keys = [self._key(s) for s in zip(*S)] if S else [0] * len(R[0])
+            R = [list(row) for row in R]
+        add = self.code.field.add_scalar
+        for (i, key) in enumerate(keys):
+            for (j, v) in self._correction(key):
+                R[j][i] = add(R[j][i], v)
+        return R
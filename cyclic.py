@@ -0,0 +1,303 @@
+"""
+Cyclic codes and CRCs.
+
+A CyclicCode is the linear code of length n whose codewords are the multiples
+of a generator polynomial g(x) dividing x^n - 1.  Words are encoded
+systematically by polynomial division, the way a linear feedback shift
+register would: the parity is m(x) x^(n - k) mod g(x), built one message
+symbol at a time with deg g multiplications per symbol, instead of one dot
+product with each column of a k x n generator matrix.  The syndrome of a
+received word r is r(x) mod g(x), computed by the same register.
+
+Over GF(2) the register is run a byte at a time instead: a table holds
+v(x) x^(deg g) mod g(x) for each of the 256 bytes v, so 8 bits cost one
+lookup, a shift and an XOR.  The same tables make up CRC, which checksums
+byte streams with the usual CRC parameters (initial value, reflection, final
+XOR).  The CRC-32 of zlib and the CRC-16 of binascii.crc_hqx() are handed to
+those C implementations.
+
+Usage:
+
+    C = CyclicCode(GF(2), 7, [1, 1, 0, 1])  # the [7, 4] Hamming code
+    c = C.encode([1, 0, 1, 1])              # message first, then parity
+    C.syndrome(c)                           # [0, 0, 0], c(x) mod g(x)
+    C.decode(c)                             # as for any LinearCode
+
+    CRC32 = CRC(0x104C11DB7, init=0xFFFFFFFF, reflect=True,
+                xorout=0xFFFFFFFF)
+    CRC32.checksum(b"123456789")            # 0xCBF43926
+    with open("data", "rb") as src:
+        CRC32.checksum_stream(src)
+"""
+import binascii
+import operator
+import zlib
+
+from codes import LinearCode, _cached
+from Galois import GF, _is_array
+from polynomials import GFPoly, _neg
+from stream import _chunks
+
+__author__ = "Jerry Yin"
+
+# Bytes read per chunk by CRC.checksum_stream()
+CHUNK_SIZE = 1 << 16
+
+# CRCs computed by the standard library instead: (poly, reflect) mapped to a
+# function of (register, data) returning the new register
+_BUILTIN = {
+    (0x104C11DB7, True):
+        lambda crc, data: zlib.crc32(data, crc ^ 0xFFFFFFFF) ^ 0xFFFFFFFF,
+    (0x11021, False):
+        lambda crc, data: binascii.crc_hqx(data, crc),
+}
+
+
+def _reflect(x, bits):
+    """Returns the lowest bits bits of x in reverse order"""
+    result = 0
+    for _ in range(bits):
+        result = (result << 1) | (x & 1)
+        x >>= 1
+    return result
+
+
+class CRC(object):
+    """
+    A cyclic redundancy check with generator polynomial poly over GF(2),
+    given as a GFPoly or as an int whose bit i is the coefficient of x^i
+    (including the leading term, as with GF(poly=...)).  The width of the CRC
+    is the degree of poly.
+
+    init is the register value before the first byte, xorout is XORed into
+    the register to give the checksum, and reflect=True processes the bits of
+    each byte least significant first and gives the register reflected, as
+    most CRCs on serial links do.  The defaults give the remainder of
+    data(x) x^width on division by poly.
+    """
+
+    def __init__(self, poly, init=0, reflect=False, xorout=0):
+        if isinstance(poly, GFPoly):
+            if poly.field.size != 2:
+                raise ValueError("CRC polynomials must be over GF(2).")
+            poly = sum(c << i for (i, c) in enumerate(poly.coeffs))
+        width = poly.bit_length() - 1
+        if width < 1:
+            raise ValueError("CRC polynomial must have degree at least 1.")
+        mask = (1 << width) - 1
+        if not 0 <= init <= mask or not 0 <= xorout <= mask:
+            raise ValueError("init and xorout must fit in %d bits." % width)
+        self.poly = poly
+        self.width = width
+        self.init = init
+        self.reflect = reflect
+        self.xorout = xorout
+
+        # table[v] is v(x) x^width mod poly, the register after shifting in
+        # byte v from zero
+        table = []
+        for v in range(256):
+            r = v << width
+            for bit in range(width + 7, width - 1, -1):
+                if r >> bit & 1:
+                    r ^= poly << (bit - width)
+            table.append(r)
+        if reflect:
+            table = [_reflect(table[_reflect(v, 8)], width)
+                     for v in range(256)]
+        self.table = table
+        self._update = _BUILTIN.get((poly, reflect), self._table_update)
+
+    def __repr__(self):
+        return "CRC(%#x, init=%#x, reflect=%r, xorout=%#x)" % (
+            self.poly, self.init, self.reflect, self.xorout)
+
+    def _table_update(self, crc, data):
+        """Returns register crc after shifting in the bytes of data"""
+        table = self.table
+        if self.reflect:
+            for b in data:
+                crc = table[(crc ^ b) & 0xFF] ^ (crc >> 8)
+        elif self.width >= 8:
+            (shift, mask) = (self.width - 8, (1 << self.width) - 1)
+            for b in data:
+                crc = table[(crc >> shift) ^ b] ^ ((crc << 8) & mask)
+        else:
+            shift = 8 - self.width
+            for b in data:
+                crc = table[(crc << shift) ^ b]
+        return crc
+
+    def checksum(self, data, crc=None):
+        """
+        Returns the CRC of data, any bytes-like object.  Pass the CRC of
+        earlier data as crc to continue from it, so that the CRC of a + b is
+        checksum(b, checksum(a)).
+        """
+        register = self.init if crc is None else crc ^ self.xorout
+        return self._update(register, memoryview(data).cast("B")) ^ self.xorout
+
+    def checksum_stream(self, src, chunk_size=CHUNK_SIZE):
+        """
+        Returns the CRC of everything in src, a file-like object opened for
+        binary reading or a bytes-like object such as an mmap, reading it in
+        chunks of chunk_size bytes.
+        """
+        register = self.init
+        for view in _chunks(src, chunk_size):
+            register = self._update(register, view)
+        return register ^ self.xorout
+
+
+class CyclicCode(LinearCode):
+    """
+    The cyclic code of length n over field generated by g, a GFPoly or a
+    sequence of coefficients (lowest degree first) of a polynomial dividing
+    x^n - 1.  Raises ValueError if it does not, or if 0 < deg g < n fails.
+
+    Codewords are systematic: the k = n - deg g message symbols come first,
+    then the deg g parity symbols, and symbol i is the coefficient of
+    x^(n - 1 - i).  Syndromes are the coefficients of r(x) mod g(x), lowest
+    degree first, and H is the parity-check matrix that gives them, so the
+    decoders of LinearCode work unchanged.
+    """
+
+    def __init__(self, field, n, g):
+        if not isinstance(field, GF):
+            raise TypeError("field must be a GF instance.")
+        if not isinstance(g, GFPoly):
+            g = GFPoly(field, g)
+        if not 0 < g.degree < n:
+            raise ValueError("Need 0 < deg g < n.")
+        g = g.monic()
+        (h, remainder) = divmod(GFPoly.monomial(field, n) - 1, g)
+        if remainder:
+            raise ValueError("g(x) does not divide x^%d - 1." % n)
+        self.field = field
+        self.generator = g
+        self.parity_polynomial = h
+        r = g.degree
+        k = n - r
+
+        # _feedback[f] is -f g(x) without its leading term, which the
+        # register adds when f is shifted out of its top
+        self._neg_g = [_neg(field, c) for c in g.coeffs[:r]]
+        self._feedback = {}
+        self._add = operator.xor if field._char == 2 else field.add_scalar
+        self._crc = CRC(g) if field.size == 2 else None
+
+        # x^d mod g(x) for every degree d of a codeword position
+        remainders = []
+        x_d = [1] + [0] * (r - 1)
+        for _ in range(n):
+            remainders.append(x_d)
+            x_d = self._shift(x_d, 0)
+        self._remainders = remainders[::-1]
+
+        G = [[int(i == j) for j in range(k)] +
+             [_neg(field, c) for c in reversed(self._remainders[i])]
+             for i in range(k)]
+        LinearCode.__init__(self, field, G)
+        # G is already in standard form
+        self._cache["_reduced"] = ([row[:] for row in self.G], list(range(k)))
+
+    def __repr__(self):
+        return "CyclicCode(%r, [%d, %d])" % (self.field, self.n, self.k)
+
+    @_cached
+    def H(self):
+        """
+        The (n - k) x n parity-check matrix whose column i holds the
+        coefficients of x^(n - 1 - i) mod g(x), lowest degree first.
+        """
+        return [[rem[j] for rem in self._remainders]
+                for j in range(self.generator.degree)]
+
+    def _shift(self, reg, s):
+        """
+        Returns (reg(x) x + s) mod g(x) for register reg, the coefficients
+        of a polynomial of degree less than deg g, lowest degree first.
+        """
+        top = reg[-1]
+        reg = [s] + reg[:-1]
+        if not top:
+            return reg
+        try:
+            row = self._feedback[top]
+        except KeyError:
+            mult = self.field.mult_scalar
+            row = self._feedback[top] = [mult(top, c) for c in self._neg_g]
+        return list(map(self._add, reg, row))
+
+    def _divide(self, symbols, reg):
+        """Shifts each symbol into register reg, highest degree first"""
+        for s in symbols:
+            reg = self._shift(reg, s)
+        return reg
+
+    def encode(self, w):
+        """
+        Returns the codeword for word w of length k: w followed by the
+        negated coefficients of w(x) x^(n - k) mod g(x).
+        """
+        if _is_array(w):
+            return LinearCode.encode(self, w)
+        if len(w) != self.k:
+            raise ValueError("Input word is wrong length.")
+        r = self.generator.degree
+        if self._crc is not None:
+            # Reduce like identity() does for GF(2), before packing
+            w = [x & 1 for x in w]
+            parity = self._crc._update(0, _bits_to_bytes(w))
+            return w + [int(b) for b in format(parity, "0%db" % r)]
+        F = self.field
+        w = F.identity(list(w))
+        return w + [_neg(F, c) for c in reversed(self._parity(w))]
+
+    def _parity(self, w):
+        """
+        Returns w(x) x^(n - k) mod g(x), lowest degree first.  Each symbol is
+        added into the top of the register before the shift, which multiplies
+        it by x^(n - k) without shifting in n - k zeros at the end.
+        """
+        reg = [0] * self.generator.degree
+        for s in w:
+            top = self._add(reg[-1], s)
+            reg = self._shift(reg[:-1] + [top], 0)
+        return reg
+
+    def syndrome(self, r):
+        """Returns the syndrome r(x) mod g(x), lowest degree first"""
+        if _is_array(r):
+            return LinearCode.syndrome(self, r)
+        if len(r) != self.n:
+            raise ValueError("Received word is wrong length.")
+        deg = self.generator.degree
+        if self._crc is not None:
+            # r(x) = a(x) x^deg + b(x), so r(x) mod g(x) is the CRC of a
+            # plus b
+            r = [x & 1 for x in r]
+            a = self._crc._update(0, _bits_to_bytes(r[:self.k]))
+            s = a ^ int("".join(map(str, r[self.k:])), 2)
+            return [int(b) for b in reversed(format(s, "0%db" % deg))]
+        return self._divide(self.field.identity(list(r)), [0] * deg)
+
+    def extract(self, c):
+        """Returns the word that encodes to codeword c, its first k symbols"""
+        return list(c[:self.k])
+
+    def extract_batch(self, C):
+        """
+        Returns the words encoding to every column of the n x N matrix C, as
+        the columns of a k x N matrix.
+        """
+        return C[:self.k] if _is_array(C) else [list(row) for row in C[:self.k]]
+
+
+def _bits_to_bytes(bits):
+    """
+    Packs a sequence of bits into bytes, most significant first, with zeros
+    in front to fill the first byte.  Each bit must be 0 or 1.
+    """
+    value = int("".join(map(str, bits)) or "0", 2)
+    return value.to_bytes((len(bits) + 7) // 8, "big")
@@ -0,0 +1,103 @@
+"""
+Bit-packed linear algebra over GF(2).
+
+A vector over GF(2) is packed into a single Python int, with entry j stored in
+bit j.  Adding two vectors is then one XOR and a dot product is the parity of
+one AND, each handling a whole row at a time instead of one entry at a time.
+A matrix is packed as a list of ints, one per row.
+"""
+
+__author__ = "Jerry Yin"
+
+try:
+    popcount = int.bit_count
+except AttributeError:
+    def popcount(x):
+        """Returns the number of set bits in nonnegative int x."""
+        return bin(x).count("1")
+
+
+def pack_vec(v):
+    """Packs vector v into an int, entry j going to bit j."""
+    return int("".join(["1" if x & 1 else "0" for x in reversed(v)]) or "0", 2)
+
+
+def unpack_vec(x, n):
+    """Unpacks the low n bits of int x into a vector of length n."""
+    return [int(c) for c in reversed(format(x, "0%db" % n))] if n else []
+
+
+def pack_rows(M):
+    """Packs each row of matrix M into an int."""
+    return [pack_vec(row) for row in M]
+
+
+def unpack_rows(rows, n):
+    """Unpacks a list of ints into a matrix with n columns."""
+    return [unpack_vec(row, n) for row in rows]
+
+
+def parity(x):
+    """Returns the number of set bits in x, modulo 2."""
+    return popcount(x) & 1
+
+
+def dot(u, v):
+    """Returns the dot product of packed vectors u and v."""
+    return parity(u & v)
+
+
+def rref(rows, cols):
+    """
+    Reduces the packed matrix rows, which has cols columns, to reduced row
+    echelon form in place.  Returns (rows, pivots) where pivots lists the
+    pivot column of each nonzero row.
+    """
+    pivots = []
+    m = 0
+    for n in range(cols):
+        if m == len(rows):
+            break
+        bit = 1 << n
+        for i in range(m, len(rows)):
+            if rows[i] & bit:
+                break
+        else:
+            continue
+        (rows[m], rows[i]) = (rows[i], rows[m])
+        pivot_row = rows[m]
+        for i in range(len(rows)):
+            if i != m and rows[i] & bit:
+                rows[i] ^= pivot_row
+        pivots.append(n)
+        m += 1
+    return (rows, pivots)
+
+
+def rank(rows):
+    """
+    Returns the rank of the packed matrix rows.  Each row is reduced against a
+    basis keyed by lowest set bit, so no row is ever modified.
+    """
+    basis = {}
+    for r in rows:
+        while r:
+            low = r & -r
+            if low in basis:
+                r ^= basis[low]
+            else:
+                basis[low] = r
+                break
+    return len(basis)
+
+
+def encode(rows, w):
+    """
+    Returns the packed codeword for word w (a list of elements in GF(2)) with
+    the packed generator matrix rows.
+    """
+    codeword = 0
+    for row, x in zip(rows, w):
+        if x & 1:
+            codeword ^= row
+    return codeword
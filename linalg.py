@@ -0,0 +1,292 @@
+"""
+PLU factorization over a finite field.
+
+GF.lu(A) factors an m x n matrix A once as P A = L U, where P permutes the
+rows, L is m x m unit lower triangular and U is in row echelon form.  Solving
+A x = b then costs two triangular solves, O(m rank) operations per right-hand
+side, instead of a fresh elimination each time; solve_batch() does many
+right-hand sides with whole-row operations.  The inverse, determinant and
+nullspace all come from the same factorization.
+
+Over GF(2) the rows of U, the rows of L and the right-hand sides are packed
+into ints as in the gf2 module, so each row operation is a single XOR.
+
+Usage:
+
+    GF7 = GF(7)
+    F = GF7.lu([[1, 2], [3, 4]])
+    F.solve([1, 0])             # x with A x = b
+    F.solve_batch(B)            # each column of B
+    F.det(), F.inverse()
+    GF7.nullspace([[1, 2, 3]])  # basis of the x with A x = 0, one per row
+"""
+import gf2
+
+__author__ = "Jerry Yin"
+
+
+class PLU(object):
+    """
+    The factorization P A = L U of an m x n matrix A over field, given as a
+    list of rows holding field elements.  Row i of P A is row perm[i] of A,
+    and row t of U (for t < rank) has its first nonzero entry, the pivot, in
+    column pivots[t].  The rows of U below the rank are zero and not kept.
+    """
+
+    def __init__(self, field, A):
+        self.field = field
+        self.m = len(A)
+        self.n = len(A[0]) if A else 0
+        for row in A:
+            if len(row) != self.n:
+                raise ValueError("Matrix not valid, check row lengths.")
+        self._binary = field.size == 2
+        self.perm = list(range(self.m))
+        self.pivots = []
+        self._swaps = 0
+        if self._binary:
+            self._factor_packed(gf2.pack_rows(A))
+        else:
+            self._factor([field.identity(list(row)) for row in A])
+
+    def _factor(self, rows):
+        """
+        Eliminates below each pivot in rows, keeping the multipliers in
+        _L[i], the row of L below the diagonal
+        """
+        F = self.field
+        (m, perm) = (self.m, self.perm)
+        L = [[] for _ in range(m)]
+        inverses = []
+        r = 0
+        for col in range(self.n):
+            if r == m:
+                break
+            for i in range(r, m):
+                if rows[i][col] != 0:
+                    break
+            else:
+                continue
+            if i != r:
+                (rows[r], rows[i]) = (rows[i], rows[r])
+                (perm[r], perm[i]) = (perm[i], perm[r])
+                (L[r], L[i]) = (L[i], L[r])
+                self._swaps += 1
+            inverse = F.mult_inverse(rows[r][col], False)
+            for i in range(r + 1, m):
+                c = rows[i][col]
+                if c != 0:
+                    c = F.mult_scalar(c, inverse)
+                    F._add_scaled(rows[i], F.negative(c), rows[r], col)
+                L[i].append(c)
+            inverses.append(inverse)
+            self.pivots.append(col)
+            r += 1
+        self._L = L
+        self._U = rows[:r]
+        self._inverses = inverses
+
+    def _factor_packed(self, rows):
+        """_factor() over GF(2), with rows of U and L packed into ints"""
+        (m, perm) = (self.m, self.perm)
+        L = [0] * m
+        r = 0
+        for col in range(self.n):
+            if r == m:
+                break
+            bit = 1 << col
+            for i in range(r, m):
+                if rows[i] & bit:
+                    break
+            else:
+                continue
+            if i != r:
+                (rows[r], rows[i]) = (rows[i], rows[r])
+                (perm[r], perm[i]) = (perm[i], perm[r])
+                (L[r], L[i]) = (L[i], L[r])
+                self._swaps += 1
+            pivot_row = rows[r]
+            for i in range(r + 1, m):
+                if rows[i] & bit:
+                    rows[i] ^= pivot_row
+                    L[i] |= 1 << r
+            self.pivots.append(col)
+            r += 1
+        self._L = L
+        self._U = rows[:r]
+
+    @property
+    def rank(self):
+        """The rank of A"""
+        return len(self.pivots)
+
+    @property
+    def L(self):
+        """The m x m unit lower triangular factor, as lists"""
+        L = []
+        for i in range(self.m):
+            if self._binary:
+                row = gf2.unpack_vec(self._L[i], min(i, self.rank))
+            else:
+                row = list(self._L[i])
+            row += [int(i == j) for j in range(len(row), self.m)]
+            L.append(row)
+        return L
+
+    @property
+    def U(self):
+        """The m x n row echelon factor, as lists"""
+        if self._binary:
+            U = gf2.unpack_rows(self._U, self.n)
+        else:
+            U = [list(row) for row in self._U]
+        return U + [[0] * self.n for _ in range(self.m - self.rank)]
+
+    def _dot(self, u, v):
+        """Returns the dot product of u and v, over the shorter length"""
+        return self.field._combine(u, (v,))[0]
+
+    def solve(self, b):
+        """
+        Returns a solution x of A x = b, with 0 for every free (non-pivot)
+        variable.  Raises ValueError if there is none.
+        """
+        if len(b) != self.m:
+            raise ValueError("Right-hand side is wrong length.")
+        F = self.field
+        r = self.rank
+        if self._binary:
+            y = 0
+            for (i, L_i) in enumerate(self._L):
+                bit = (b[self.perm[i]] & 1) ^ gf2.parity(L_i & y)
+                if i < r:
+                    y |= bit << i
+                elif bit:
+                    raise ValueError("System has no solution.")
+            return gf2.unpack_vec(self._back_packed([y >> t & 1
+                                                     for t in range(r)]),
+                                  self.n)
+        y = []
+        for (i, L_i) in enumerate(self._L):
+            c = F.add_scalar(F.identity(b[self.perm[i]]),
+                             F.negative(self._dot(L_i, y)))
+            if i < r:
+                y.append(c)
+            elif c != 0:
+                raise ValueError("System has no solution.")
+        return self._back(y, [0] * self.n)
+
+    def _back(self, y, x):
+        """
+        Back substitution: sets each pivot variable of x, from the last, so
+        that U x = y, and returns x
+        """
+        F = self.field
+        for t in range(self.rank - 1, -1, -1):
+            (p, U_t) = (self.pivots[t], self._U[t])
+            c = F.add_scalar(y[t], F.negative(self._dot(U_t[p + 1:],
+                                                        x[p + 1:])))
+            x[p] = F.mult_scalar(c, self._inverses[t])
+        return x
+
+    def _back_packed(self, y, x=0):
+        """_back() over GF(2), with x packed into an int"""
+        for t in range(self.rank - 1, -1, -1):
+            if y[t] ^ gf2.parity(self._U[t] & x):
+                x |= 1 << self.pivots[t]
+        return x
+
+    def solve_batch(self, B):
+        """
+        Solves A X = B for the m x N matrix B, returning the n x N matrix X
+        whose columns solve A x = b for the columns b of B.  Raises
+        ValueError if any column has no solution.
+        """
+        if len(B) != self.m:
+            raise ValueError("Right-hand side has wrong number of rows.")
+        N = len(B[0]) if self.m else 0
+        r = self.rank
+        if self._binary:
+            Y = [gf2.pack_vec(B[i]) for i in self.perm]
+            for (i, L_i) in enumerate(self._L):
+                while L_i:
+                    low = L_i & -L_i
+                    Y[i] ^= Y[low.bit_length() - 1]
+                    L_i ^= low
+            if any(Y[r:]):
+                raise ValueError("System has no solution.")
+            X = [0] * self.n
+            for t in range(r - 1, -1, -1):
+                (p, U_t) = (self.pivots[t], self._U[t])
+                row = Y[t]
+                for s in range(t + 1, r):
+                    if U_t >> self.pivots[s] & 1:
+                        row ^= X[self.pivots[s]]
+                X[p] = row
+            return gf2.unpack_rows(X, N)
+        F = self.field
+        Y = [F.identity(list(B[i])) for i in self.perm]
+        for (i, L_i) in enumerate(self._L):
+            for (j, c) in enumerate(L_i):
+                if c != 0:
+                    F._add_scaled(Y[i], F.negative(c), Y[j])
+        if any(any(row) for row in Y[r:]):
+            raise ValueError("System has no solution.")
+        X = [[0] * N for _ in range(self.n)]
+        for t in range(r - 1, -1, -1):
+            (p, U_t) = (self.pivots[t], self._U[t])
+            row = Y[t]
+            for s in range(t + 1, r):
+                c = U_t[self.pivots[s]]
+                if c != 0:
+                    F._add_scaled(row, F.negative(c), X[self.pivots[s]])
+            X[p] = F.scale_vec(self._inverses[t], row)
+        return X
+
+    def _require_square(self):
+        if self.m != self.n:
+            raise ValueError("Matrix must be square.")
+
+    def det(self):
+        """Returns the determinant of A, which must be square"""
+        self._require_square()
+        F = self.field
+        if self.rank < self.n:
+            return 0
+        if self._binary:
+            return 1
+        d = 1
+        for (t, row) in enumerate(self._U):
+            d = F.mult_scalar(d, row[t])
+        return F.identity(F.negative(d)) if self._swaps % 2 else d
+
+    def inverse(self):
+        """
+        Returns the inverse of A, which must be square.  Raises ValueError if
+        A is singular.
+        """
+        self._require_square()
+        if self.rank < self.n:
+            raise ValueError("Matrix is singular.")
+        return self.solve_batch([[int(i == j) for j in range(self.n)]
+                                 for i in range(self.n)])
+
+    def nullspace(self):
+        """
+        Returns a basis of the nullspace of A, the vectors x with A x = 0, as
+        the rows of an (n - rank) x n matrix.  There is one row for each free
+        column f of U, with a 1 in column f and 0 in every other free column.
+        """
+        pivot_set = set(self.pivots)
+        free = [f for f in range(self.n) if f not in pivot_set]
+        zeros = [0] * self.rank
+        if self._binary:
+            return [gf2.unpack_vec(self._back_packed(zeros, 1 << f), self.n)
+                    for f in free]
+        basis = []
+        for f in free:
+            x = [0] * self.n
+            x[f] = 1
+            basis.append(self._back(zeros, x))
+        return basis
+
@@ -0,0 +1,241 @@
+"""
+Matrix multiplication over finite fields.
+
+multiply(F, A, B) returns the product of two matrices given as lists of rows,
+choosing a method by the field and the sizes:
+
+    GF(2^d), d <= 8     Method of Four Russians.  Rows are packed into ints
+                        with d bits per entry, and for each group of rows of
+                        B spanning 8 bits of a row of A, a table of all 256
+                        combinations is built with one XOR each.  A row of the
+                        product then costs one lookup and one XOR per group.
+    GF(p)               Rows of B are packed into ints with lanes wide enough
+                        that sums of products cannot carry, so a row of the
+                        product is one multiply-add of ints per entry of A,
+                        reduced lane by lane at the end.
+    anything else       The cubic method, one dot product per entry.
+
+Products with fewer than PACK_MIN_ROWS rows use the cubic method, as packing
+would cost more than it saves.  Products whose every dimension is above the
+cutoff are first split by the Strassen-Winograd recursion, which trades one
+block product in eight for fifteen block additions.  The additions are done
+entry by entry, so the recursion only pays off over the cubic method, from
+STRASSEN_CUTOFF on; the packed methods stay faster up to PACKED_CUTOFF.
+"""
+import sys
+from array import array
+
+import gf2
+
+__author__ = "Jerry Yin"
+
+# Products with every dimension larger than these are split into 7 half-size
+# products by Strassen-Winograd, over fields using the cubic method and the
+# packed methods respectively
+STRASSEN_CUTOFF = 64
+PACKED_CUTOFF = 1 << 14
+
+# Products of matrices with fewer rows than this use the cubic method
+PACK_MIN_ROWS = 4
+
+# Array typecodes of unsigned ints of 1, 2, 4 and 8 bytes
+_UNSIGNED = {array(code).itemsize: code for code in "BHILQ"}
+
+
+def multiply(F, A, B, cutoff=None):
+    """
+    Returns the product of matrices A and B over field F, as a list of rows.
+    Both hold field elements and have consistent dimensions.  Products with
+    every dimension above cutoff use the Strassen-Winograd recursion; by
+    default, cutoff depends on the field as described above.
+    """
+    if cutoff is None:
+        cutoff = PACKED_CUTOFF if _packs(F) else STRASSEN_CUTOFF
+    if not A or not B or not B[0]:
+        return [[0] * (len(B[0]) if B else 0) for _ in A]
+    if min(len(A), len(B), len(B[0])) > cutoff:
+        return _strassen_winograd(F, A, B, cutoff)
+    return _base(F, A, B)
+
+
+def _packs(F):
+    """Returns whether products over F use one of the packed methods"""
+    return F._modular or (F._char == 2 and F._degree <= 8)
+
+
+def _base(F, A, B):
+    """Returns A B by the best method for the field, without recursion"""
+    if len(A) >= PACK_MIN_ROWS and _packs(F):
+        if F._char == 2:
+            return four_russians(F, A, B)
+        return packed_lanes(F, A, B)
+    return cubic(F, A, B)
+
+
+def cubic(F, A, B):
+    """Returns A B with one dot product per entry"""
+    columns = list(zip(*B))
+    return [F._combine(row, columns) for row in A]
+
+
+def _pack(row, d):
+    """Packs row into an int with d bits per entry, entry 0 lowest"""
+    if d == 1:
+        return gf2.pack_vec(row)
+    if d == 8:
+        return int.from_bytes(bytes(row), "little")
+    shift = 0
+    x = 0
+    for value in row:
+        x |= value << shift
+        shift += d
+    return x
+
+
+def _unpack(x, d, n):
+    """Unpacks n entries of d bits each from x.  Inverse of _pack()"""
+    if d == 1:
+        return gf2.unpack_vec(x, n)
+    if d == 8:
+        return list(x.to_bytes(n, "little"))
+    mask = (1 << d) - 1
+    return [(x >> (d * j)) & mask for j in range(n)]
+
+
+def four_russians(F, A, B):
+    """
+    Returns A B over GF(2^d), d <= 8, by the Method of Four Russians.  Each
+    group of t = 8 // d rows of B gets a table of the 2^(d t) combinations
+    of its rows, indexed by the packed entries of A that multiply them.
+    """
+    d = F._degree
+    t = max(1, 8 // d)
+    mask = (1 << (d * t)) - 1
+    A_packed = [_pack(row, d) for row in A]
+    result = [0] * len(A)
+    for g in range(0, len(B), t):
+        # The rows 2^b times B[i], for each bit b of an entry of A, span the
+        # table: bit d i + b of an index selects 2^b B[i]
+        table = [0]
+        for row in B[g:g + t]:
+            for b in range(d):
+                scaled = _pack(F.scale_vec(1 << b, row), d) if b else \
+                    _pack(row, d)
+                table += [x ^ scaled for x in table]
+        shift = d * g
+        for (i, a) in enumerate(A_packed):
+            index = (a >> shift) & mask
+            if index:
+                result[i] ^= table[index]
+    n = len(B[0])
+    return [_unpack(x, d, n) for x in result]
+
+
+def packed_lanes(F, A, B):
+    """
+    Returns A B over GF(p), with each row of B packed into an int whose
+    lanes are wide enough to hold a sum of len(B) products without carries.
+    """
+    p = F.size
+    n = len(B[0])
+    bits = (len(B) * (p - 1)**2).bit_length()
+    size = next((s for s in (1, 2, 4, 8) if 8 * s >= bits), None)
+    if size is None:
+        return cubic(F, A, B)
+    code = _UNSIGNED[size]
+    swap = sys.byteorder != "little"
+
+    def pack(row):
+        lanes = array(code, row)
+        if swap:
+            lanes.byteswap()
+        return int.from_bytes(lanes.tobytes(), "little")
+
+    B_packed = [pack(row) for row in B]
+    result = []
+    for row in A:
+        x = 0
+        for (a, b) in zip(row, B_packed):
+            if a:
+                x += a * b
+        lanes = array(code)
+        lanes.frombytes(x.to_bytes(n * size, "little"))
+        if swap:
+            lanes.byteswap()
+        result.append([v % p for v in lanes])
+    return result
+
+
+def _add(F, X, Y):
+    """Returns the sum of matrices X and Y"""
+    if F._modular:
+        p = F.size
+        return [[(x + y) % p for (x, y) in zip(u, v)] for (u, v) in zip(X, Y)]
+    if F._char == 2:
+        return [[x ^ y for (x, y) in zip(u, v)] for (u, v) in zip(X, Y)]
+    add = F.add_scalar
+    return [[add(x, y) for (x, y) in zip(u, v)] for (u, v) in zip(X, Y)]
+
+
+def _sub(F, X, Y):
+    """Returns the difference of matrices X and Y"""
+    if F._modular:
+        p = F.size
+        return [[(x - y) % p for (x, y) in zip(u, v)] for (u, v) in zip(X, Y)]
+    if F._char == 2:
+        return _add(F, X, Y)
+    (add, neg) = (F.add_scalar, F.add_inverse)
+    return [[add(x, neg(y)) for (x, y) in zip(u, v)] for (u, v) in zip(X, Y)]
+
+
+def _blocks(M, rows, cols):
+    """
+    Splits M into four blocks of rows x cols, padding the last row and
+    column of blocks with zeros
+    """
+    padded = [list(row) + [0] * (2 * cols - len(row)) for row in M]
+    padded += [[0] * (2 * cols) for _ in range(2 * rows - len(M))]
+    top = padded[:rows]
+    bottom = padded[rows:]
+    return ([row[:cols] for row in top], [row[cols:] for row in top],
+            [row[:cols] for row in bottom], [row[cols:] for row in bottom])
+
+
+def _strassen_winograd(F, A, B, cutoff):
+    """
+    Returns A B by one level of the Strassen-Winograd recursion: 7 products
+    of half-size blocks, each computed by multiply(), and 15 additions
+    """
+    (m, l, n) = (len(A), len(B), len(B[0]))
+    (h_m, h_l, h_n) = ((m + 1) // 2, (l + 1) // 2, (n + 1) // 2)
+    (A11, A12, A21, A22) = _blocks(A, h_m, h_l)
+    (B11, B12, B21, B22) = _blocks(B, h_l, h_n)
+
+    S1 = _add(F, A21, A22)
+    S2 = _sub(F, S1, A11)
+    S3 = _sub(F, A11, A21)
+    S4 = _sub(F, A12, S2)
+    T1 = _sub(F, B12, B11)
+    T2 = _sub(F, B22, T1)
+    T3 = _sub(F, B22, B12)
+    T4 = _sub(F, T2, B21)
+
+    P1 = multiply(F, A11, B11, cutoff)
+    P2 = multiply(F, A12, B21, cutoff)
+    P3 = multiply(F, S4, B22, cutoff)
+    P4 = multiply(F, A22, T4, cutoff)
+    P5 = multiply(F, S1, T1, cutoff)
+    P6 = multiply(F, S2, T2, cutoff)
+    P7 = multiply(F, S3, T3, cutoff)
+
+    U2 = _add(F, P1, P6)
+    U3 = _add(F, U2, P7)
+    U4 = _add(F, U2, P5)
+    C11 = _add(F, P1, P2)
+    C12 = _add(F, U4, P3)
+    C21 = _sub(F, U3, P4)
+    C22 = _add(F, U3, P5)
+
+    top = [u + v for (u, v) in zip(C11, C12)]
+    bottom = [u + v for (u, v) in zip(C21, C22)]
+    return [row[:n] for row in (top + bottom)[:m]]
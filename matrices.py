@@ -0,0 +1,345 @@
+"""
+Compact vectors and matrices over a finite field.
+
+A GFMatrix stores its entries in one flat array, using the smallest unsigned
+type that holds every element of its field (1, 2, 4 or 8 bytes), with its
+shape and strides alongside.  Rows are views into the same array, and the
+transpose swaps the strides instead of copying, so neither costs more than a
+small object.  Every entry is reduced into the field when it is stored, and a
+matrix is always rectangular, so GF methods can skip checking either.
+
+Usage:
+
+    GF7 = GF(7)
+    M = GFMatrix(GF7, [[1, 2, 3], [4, 5, 6]])
+    M[0]            # row view, a GFVector
+    M[1, 2]         # 6
+    M.T             # transpose view, 3 x 2
+    GF7.rref(M)     # a GFMatrix
+    numpy.asarray(M)    # shares memory with M
+
+The GF methods that take vectors or matrices accept GFVector and GFMatrix
+alongside lists, and return them where they would otherwise return lists.
+"""
+from array import array
+from itertools import islice
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+__author__ = "Jerry Yin"
+
+
+def _typecode(size):
+    """Returns the smallest array typecode holding 0 to size - 1"""
+    for code in ("B", "H", "I", "L", "Q"):
+        if size - 1 < 1 << (8 * array(code).itemsize):
+            return code
+    raise ValueError("Elements of GF(%d) do not fit in 64 bits." % size)
+
+
+class GFVector(object):
+    """
+    A vector over field, stored as every stride-th entry of the flat array
+    data from offset on.  Build one from any sequence of elements with
+    GFVector(field, v); rows of a GFMatrix are GFVectors sharing its storage.
+    """
+    __slots__ = ("field", "_data", "_offset", "_length", "_stride")
+
+    def __init__(self, field, v=(), _view=None):
+        self.field = field
+        if _view is not None:
+            (self._data, self._offset, self._length, self._stride) = _view
+            return
+        self._data = array(_typecode(field.size), field.identity(list(v)))
+        (self._offset, self._length, self._stride) = (0, len(self._data), 1)
+
+    def __len__(self):
+        return self._length
+
+    def _index(self, i):
+        if i < 0:
+            i += self._length
+        if not 0 <= i < self._length:
+            raise IndexError("vector index out of range")
+        return self._offset + i * self._stride
+
+    def __getitem__(self, i):
+        if isinstance(i, slice):
+            (start, stop, step) = i.indices(self._length)
+            length = len(range(start, stop, step))
+            return GFVector(self.field, _view=(
+                self._data, self._offset + start * self._stride, length,
+                self._stride * step))
+        return self._data[self._index(i)]
+
+    def __setitem__(self, i, x):
+        if isinstance(i, slice):
+            view = self[i]
+            values = self.field.identity(list(x))
+            if len(values) != len(view):
+                raise ValueError("Cannot resize a vector.")
+            for (j, value) in enumerate(values):
+                view._data[view._offset + j * view._stride] = value
+        else:
+            self._data[self._index(i)] = self.field.identity(x)
+
+    def __iter__(self):
+        return iter(self.tolist())
+
+    def __eq__(self, other):
+        if isinstance(other, (GFVector, list, tuple)):
+            return self.tolist() == list(other)
+        return NotImplemented
+
+    def __ne__(self, other):
+        result = self.__eq__(other)
+        return result if result is NotImplemented else not result
+
+    __hash__ = None
+
+    def __repr__(self):
+        return "GFVector(%r, %r)" % (self.field, self.tolist())
+
+    def tolist(self):
+        """Returns the entries as a new list"""
+        if not self._length:
+            return []
+        stop = self._offset + (self._length - 1) * self._stride
+        if self._stride > 0:
+            return self._data[self._offset:stop + 1:self._stride].tolist()
+        return list(islice(self._data[self._offset::self._stride], 0,
+                           self._length))
+
+    def copy(self):
+        """Returns a copy with its own contiguous storage"""
+        return GFVector(self.field, _view=(
+            array(self._data.typecode, self.tolist()), 0, self._length, 1))
+
+    @property
+    def data(self):
+        """
+        A memoryview of the entries, without copying.  Raises BufferError if
+        the entries are not contiguous (see copy()).
+        """
+        if self._stride != 1 and self._length > 1:
+            raise BufferError("Vector is not contiguous; copy() it first.")
+        return memoryview(self._data)[self._offset:
+                                      self._offset + self._length]
+
+    def __buffer__(self, flags):
+        return self.data
+
+    def __array__(self, dtype=None, copy=None):
+        return _as_array(self._data, self._offset, (self._length,),
+                         (self._stride,), dtype, copy)
+
+
+class GFMatrix(object):
+    """
+    A rows x cols matrix over field.  Build one from a list of rows (or any
+    matrix GF accepts) with GFMatrix(field, M), or an all-zero one with
+    GFMatrix.zeros().  Raises ValueError if the rows have different lengths.
+    """
+    __slots__ = ("field", "rows", "cols", "_data", "_offset", "_strides")
+
+    def __init__(self, field, M=(), _view=None):
+        self.field = field
+        if _view is not None:
+            (self._data, self._offset, (self.rows, self.cols),
+             self._strides) = _view
+            return
+        if isinstance(M, GFMatrix):
+            M = M.tolist()
+        elif np is not None and isinstance(M, np.ndarray):
+            M = M.tolist()
+        M = list(M)
+        self.rows = len(M)
+        self.cols = len(M[0]) if M else 0
+        self._data = array(_typecode(field.size))
+        for row in M:
+            row = field.identity(list(row))
+            if len(row) != self.cols:
+                raise ValueError("Matrix not valid, check row lengths.")
+            self._data.extend(row)
+        self._offset = 0
+        self._strides = (self.cols, 1)
+
+    @classmethod
+    def zeros(cls, field, rows, cols):
+        """Returns the rows x cols zero matrix over field"""
+        data = array(_typecode(field.size))
+        data.frombytes(bytes(rows * cols * data.itemsize))
+        return cls(field, _view=(data, 0, (rows, cols), (cols, 1)))
+
+    @classmethod
+    def identity(cls, field, n):
+        """Returns the n x n identity matrix over field"""
+        M = cls.zeros(field, n, n)
+        M._data[::n + 1] = array(M._data.typecode, [1]) * n
+        return M
+
+    @property
+    def shape(self):
+        return (self.rows, self.cols)
+
+    def __len__(self):
+        return self.rows
+
+    def _row(self, i):
+        if i < 0:
+            i += self.rows
+        if not 0 <= i < self.rows:
+            raise IndexError("matrix index out of range")
+        return GFVector(self.field, _view=(
+            self._data, self._offset + i * self._strides[0], self.cols,
+            self._strides[1]))
+
+    def __getitem__(self, index):
+        """
+        M[i] is a view of row i, and M[i, j] is the entry in row i, col j.
+        With slices, M[i, a:b] and M[a:b, j] are views of part of a row or a
+        column, and M[a:b, c:d] is a view of a block, as is M[a:b].
+        """
+        if isinstance(index, tuple):
+            (i, j) = index
+            if isinstance(i, slice):
+                if isinstance(j, slice):
+                    return self._block(i, j)
+                return self.column(j)[i]
+            return self._row(i)[j]
+        if isinstance(index, slice):
+            return self._block(index, slice(None))
+        return self._row(index)
+
+    def _block(self, rows, cols):
+        """Returns a view of the block of rows and cols, both slices"""
+        (r_start, _, r_step) = rows.indices(self.rows)
+        (c_start, _, c_step) = cols.indices(self.cols)
+        shape = (len(range(*rows.indices(self.rows))),
+                 len(range(*cols.indices(self.cols))))
+        (s_r, s_c) = self._strides
+        offset = self._offset
+        if shape[0] and shape[1]:
+            offset += r_start * s_r + c_start * s_c
+        return GFMatrix(self.field, _view=(self._data, offset, shape,
+                                           (s_r * r_step, s_c * c_step)))
+
+    def __setitem__(self, index, x):
+        if isinstance(index, slice):
+            index = (index, slice(None))
+        if isinstance(index, tuple):
+            (i, j) = index
+            if isinstance(i, slice):
+                view = self[index]
+                if isinstance(view, GFVector):
+                    view[:] = x
+                    return
+                rows = [list(row) for row in x]
+                if len(rows) != len(view):
+                    raise ValueError("Cannot resize a matrix.")
+                for (row, values) in zip(view, rows):
+                    row[:] = values
+            else:
+                self._row(i)[j] = x
+        else:
+            self._row(index)[:] = x
+
+    def __iter__(self):
+        return (self._row(i) for i in range(self.rows))
+
+    def __eq__(self, other):
+        if isinstance(other, (GFMatrix, list)):
+            return self.tolist() == [list(row) for row in other]
+        return NotImplemented
+
+    def __ne__(self, other):
+        result = self.__eq__(other)
+        return result if result is NotImplemented else not result
+
+    __hash__ = None
+
+    def __repr__(self):
+        return "GFMatrix(%r, %r)" % (self.field, self.tolist())
+
+    def column(self, j):
+        """Returns a view of column j"""
+        return self.T._row(j)
+
+    @property
+    def T(self):
+        """The transpose, as a view sharing this matrix's storage"""
+        return GFMatrix(self.field, _view=(
+            self._data, self._offset, (self.cols, self.rows),
+            self._strides[::-1]))
+
+    def is_contiguous(self):
+        """True iff the entries are stored row after row with no gaps"""
+        return self._strides == (self.cols, 1) or self.rows * self.cols <= 1
+
+    def tolist(self):
+        """Returns the entries as a new list of rows"""
+        if self.is_contiguous():
+            flat = self._data[self._offset:
+                              self._offset + self.rows * self.cols].tolist()
+            return [flat[i:i + self.cols]
+                    for i in range(0, self.rows * self.cols, self.cols)]
+        return [row.tolist() for row in self]
+
+    def copy(self):
+        """Returns a copy with its own contiguous storage"""
+        data = array(self._data.typecode)
+        for row in self.tolist():
+            data.extend(row)
+        return GFMatrix(self.field, _view=(data, 0, self.shape,
+                                           (self.cols, 1)))
+
+    @property
+    def data(self):
+        """
+        A memoryview of the entries with shape (rows, cols), without copying.
+        Raises BufferError if the matrix is not contiguous, such as a
+        transpose view (see copy()).
+        """
+        if not self.is_contiguous():
+            raise BufferError("Matrix is not contiguous; copy() it first.")
+        view = memoryview(self._data)[self._offset:
+                                      self._offset + self.rows * self.cols]
+        if not self.rows * self.cols:
+            return view
+        return view.cast("B").cast(self._data.typecode, self.shape)
+
+    def __buffer__(self, flags):
+        return self.data
+
+    def __array__(self, dtype=None, copy=None):
+        return _as_array(self._data, self._offset, self.shape, self._strides,
+                         dtype, copy)
+
+
+def _as_array(data, offset, shape, strides, dtype, copy=None):
+    """
+    Returns a NumPy array viewing the entries of data given by offset, shape
+    and strides (counted in entries), converted to dtype if it is given.  As
+    for NumPy's __array__(), copy=True always copies, and copy=False raises
+    ValueError if converting to dtype needs a copy.
+    """
+    base = np.frombuffer(data, dtype=data.typecode)
+    if not base.size:
+        result = base.reshape(shape)
+    else:
+        size = base.itemsize
+        result = np.lib.stride_tricks.as_strided(
+            base[offset:], shape, tuple(s * size for s in strides))
+    if dtype is not None and result.dtype != np.dtype(dtype):
+        if copy is False:
+            raise ValueError("Converting to %s needs a copy." % dtype)
+        return result.astype(dtype)
+    return result.copy() if copy else result
+
+
+def _is_compact(x):
+    """Returns True iff x is a GFVector or GFMatrix"""
+    return isinstance(x, (GFVector, GFMatrix))
@@ -0,0 +1,429 @@
+"""
+Polynomials over a finite field.
+
+A GFPoly holds its coefficients as a tuple, lowest degree first, with no
+trailing zeros, so the zero polynomial has no coefficients and degree -1.
+Coefficients are field elements in the same integer encoding as scalars.
+
+Usage:
+
+    GF7 = GF(7)
+    f = GFPoly(GF7, [1, 0, 2])          # 2x^2 + 1
+    g = GFPoly.from_roots(GF7, [1, 2])  # (x - 1)(x - 2)
+    f * g, f + g, divmod(f, g), f % g
+    f(3)                                # evaluate at 3
+    f.evaluate_many(GF7.elements)       # evaluate at every element
+    gcd(f, g), xgcd(f, g)
+    interpolate(GF7, [0, 1, 2], [5, 3, 1])
+"""
+import operator
+
+from Galois import np
+
+__author__ = "Jerry Yin"
+
+# Products where either factor has at most this many coefficients are
+# computed directly; larger ones are split in half by Karatsuba's method
+KARATSUBA_THRESHOLD = 32
+
+
+class GFPoly(object):
+    """
+    A polynomial over field with coefficients coeffs, lowest degree first.
+    Raises ValueError if a coefficient is not in the field.
+    """
+    __slots__ = ("field", "coeffs")
+
+    def __init__(self, field, coeffs=()):
+        self.field = field
+        self.coeffs = tuple(_trim(field.identity(list(coeffs))))
+
+    @classmethod
+    def _make(cls, field, coeffs):
+        """Builds a polynomial from coefficients known to be in the field"""
+        f = cls.__new__(cls)
+        f.field = field
+        f.coeffs = tuple(_trim(coeffs))
+        return f
+
+    @classmethod
+    def x(cls, field):
+        """Returns the polynomial x"""
+        return cls._make(field, [0, 1])
+
+    @classmethod
+    def monomial(cls, field, degree, c=1):
+        """Returns c x^degree"""
+        return cls._make(field, [0] * degree + [field.identity(c)])
+
+    @classmethod
+    def from_roots(cls, field, roots):
+        """Returns the product of (x - r) for each r in roots"""
+        return _product(field, [[_neg(field, r), 1] for r in roots])
+
+    @property
+    def degree(self):
+        """The degree, or -1 for the zero polynomial"""
+        return len(self.coeffs) - 1
+
+    @property
+    def lead(self):
+        """The leading coefficient (0 for the zero polynomial)"""
+        return self.coeffs[-1] if self.coeffs else 0
+
+    def __len__(self):
+        return len(self.coeffs)
+
+    def __getitem__(self, i):
+        """Returns the coefficient of x^i"""
+        return self.coeffs[i] if 0 <= i < len(self.coeffs) else 0
+
+    def __iter__(self):
+        return iter(self.coeffs)
+
+    def __bool__(self):
+        return bool(self.coeffs)
+
+    __nonzero__ = __bool__
+
+    def __eq__(self, other):
+        if isinstance(other, GFPoly):
+            return (_same_field(self.field, other.field) and
+                    self.coeffs == other.coeffs)
+        return NotImplemented
+
+    def __ne__(self, other):
+        result = self.__eq__(other)
+        return result if result is NotImplemented else not result
+
+    def __hash__(self):
+        return hash(self.coeffs)
+
+    def __repr__(self):
+        return "GFPoly(%r, %r)" % (self.field, list(self.coeffs))
+
+    def __str__(self):
+        terms = []
+        for (i, c) in reversed(list(enumerate(self.coeffs))):
+            if c:
+                power = "" if i == 0 else "x" if i == 1 else "x^%d" % i
+                terms.append(power if c == 1 and i else "%d%s" % (c, power))
+        return " + ".join(terms) or "0"
+
+    def _coerce(self, other):
+        """Returns other as a polynomial over the same field"""
+        if isinstance(other, GFPoly):
+            if not _same_field(self.field, other.field):
+                raise ValueError("Polynomials are over different fields.")
+            return other
+        return GFPoly(self.field, [other])
+
+    def __add__(self, other):
+        other = self._coerce(other)
+        return GFPoly._make(self.field, _add(self.field, self.coeffs,
+                                             other.coeffs))
+
+    __radd__ = __add__
+
+    def __neg__(self):
+        return GFPoly._make(self.field, [_neg(self.field, c)
+                                         for c in self.coeffs])
+
+    def __sub__(self, other):
+        return self + -self._coerce(other)
+
+    def __rsub__(self, other):
+        return self._coerce(other) - self
+
+    def __mul__(self, other):
+        F = self.field
+        if not isinstance(other, GFPoly):
+            c = F.identity(other)
+            return GFPoly._make(F, [F.mult_scalar(c, a) for a in self.coeffs])
+        other = self._coerce(other)
+        return GFPoly._make(F, _mul(F, self.coeffs, other.coeffs))
+
+    __rmul__ = __mul__
+
+    def __pow__(self, n):
+        if n < 0:
+            raise ValueError("Polynomials have no negative powers.")
+        result = GFPoly._make(self.field, [1])
+        base = self
+        while n:
+            if n & 1:
+                result *= base
+            base *= base
+            n >>= 1
+        return result
+
+    def __divmod__(self, other):
+        other = self._coerce(other)
+        (q, r) = _divmod(self.field, self.coeffs, other.coeffs)
+        return (GFPoly._make(self.field, q), GFPoly._make(self.field, r))
+
+    def __floordiv__(self, other):
+        return divmod(self, other)[0]
+
+    def __mod__(self, other):
+        return divmod(self, other)[1]
+
+    def __call__(self, x):
+        """Evaluates the polynomial at x, by Horner's rule"""
+        F = self.field
+        (add, mult) = (F.add_scalar, F.mult_scalar)
+        result = 0
+        for c in reversed(self.coeffs):
+            result = add(mult(result, x), c)
+        return result
+
+    def evaluate_many(self, points):
+        """
+        Returns the list of values at each of points.  Horner's rule is run
+        on every point at once, one coefficient at a time: on whole NumPy
+        arrays when NumPy is available, and otherwise with the field's log
+        tables when it has them.
+        """
+        F = self.field
+        points = list(points)
+        if not self.coeffs:
+            return [0] * len(points)
+        if np is not None and F.size < 1 << 31:
+            xs = F._np_array(points)
+            result = np.zeros_like(xs)
+            for c in reversed(self.coeffs):
+                result = F._np_add(F._np_mult(result, xs), F._np_array(c))
+            return result.tolist()
+        if F._log is not None and not F._modular:
+            # Multiplying by x is adding log(x), so keep each log(x) handy
+            (exp, log, add) = (F._exp, F._log, F.add_scalar)
+            logs = [log[x] if x else None for x in points]
+            result = [0] * len(points)
+            for c in reversed(self.coeffs):
+                result = [add(exp[log[r] + l], c) if r and l is not None
+                          else c for (r, l) in zip(result, logs)]
+            return result
+        if F._modular:
+            p = F.size
+            result = [0] * len(points)
+            for c in reversed(self.coeffs):
+                result = [(r * x + c) % p for (r, x) in zip(result, points)]
+            return result
+        return [self(x) for x in points]
+
+    def derivative(self):
+        """Returns the formal derivative"""
+        F = self.field
+        return GFPoly._make(F, [_times(F, c, i) for (i, c) in
+                                enumerate(self.coeffs)][1:])
+
+    def monic(self):
+        """Returns the polynomial divided by its leading coefficient"""
+        if not self.coeffs or self.lead == 1:
+            return self
+        return self * self.field.mult_inverse(self.lead, False)
+
+
+def _same_field(F, G):
+    """Returns True iff fields F and G have the same elements and arithmetic"""
+    return F is G or (F.size, F.poly) == (G.size, G.poly)
+
+
+def _trim(coeffs):
+    """Removes trailing zeros from list coeffs in place and returns it"""
+    while coeffs and not coeffs[-1]:
+        coeffs.pop()
+    return coeffs
+
+
+def _neg(F, x):
+    """Returns -x in field F, reduced"""
+    if F._modular:
+        return -x % F.size
+    return x if F._char == 2 else F.add_inverse(x)
+
+
+def _times(F, c, n):
+    """Returns c added to itself n times"""
+    n %= F._char
+    result = 0
+    for _ in range(n):
+        result = F.add_scalar(result, c)
+    return result
+
+
+def _add(F, f, g):
+    """Adds coefficient sequences f and g"""
+    if len(f) < len(g):
+        (f, g) = (g, f)
+    add = operator.xor if F._char == 2 else F.add_scalar
+    return [add(a, b) for (a, b) in zip(f, g)] + list(f[len(g):])
+
+
+def _schoolbook(F, f, g):
+    """Multiplies coefficient lists f and g term by term"""
+    result = [0] * (len(f) + len(g) - 1)
+    if F._modular:
+        for (i, a) in enumerate(f):
+            if a:
+                for (j, b) in enumerate(g):
+                    result[i + j] += a * b
+        return result
+    if F._char == 2 and F._log is not None:
+        (exp, log) = (F._exp, F._log)
+        g_logs = [(j, log[b]) for (j, b) in enumerate(g) if b]
+        for (i, a) in enumerate(f):
+            if a:
+                la = log[a]
+                for (j, lb) in g_logs:
+                    result[i + j] ^= exp[la + lb]
+        return result
+    (add, mult) = (F.add_scalar, F.mult_scalar)
+    for (i, a) in enumerate(f):
+        if a:
+            for (j, b) in enumerate(g):
+                result[i + j] = add(result[i + j], mult(a, b))
+    return result
+
+
+def _karatsuba(F, f, g, add, sub):
+    """
+    Multiplies coefficient lists f and g, splitting both in half while they
+    are longer than KARATSUBA_THRESHOLD.  add and sub combine coefficients.
+    """
+    if min(len(f), len(g)) <= KARATSUBA_THRESHOLD:
+        return _schoolbook(F, f, g)
+    h = max(len(f), len(g)) // 2
+    (f0, f1, g0, g1) = (f[:h], f[h:], g[:h], g[h:])
+    z0 = _karatsuba(F, f0, g0, add, sub)
+    z2 = _karatsuba(F, f1, g1, add, sub) if f1 and g1 else []
+    fs = [add(a, b) for (a, b) in zip(f0, f1)] + f0[len(f1):] + f1[len(f0):]
+    gs = [add(a, b) for (a, b) in zip(g0, g1)] + g0[len(g1):] + g1[len(g0):]
+    z1 = _karatsuba(F, fs, gs, add, sub)
+    for (i, c) in enumerate(z0):
+        z1[i] = sub(z1[i], c)
+    for (i, c) in enumerate(z2):
+        z1[i] = sub(z1[i], c)
+    result = [0] * (len(f) + len(g) - 1)
+    result[:len(z0)] = z0
+    for (i, c) in enumerate(z2):
+        result[2 * h + i] = add(result[2 * h + i], c)
+    for (i, c) in enumerate(z1):
+        if i + h < len(result):
+            result[i + h] = add(result[i + h], c)
+    return result
+
+
+def _mul(F, f, g):
+    """Multiplies coefficient sequences f and g"""
+    if not f or not g:
+        return []
+    (f, g) = (list(f), list(g))
+    if F._modular:
+        # Work over the integers and reduce once at the end
+        product = _karatsuba(F, f, g, operator.add, operator.sub)
+        return [c % F.size for c in product]
+    if F._char == 2:
+        return _karatsuba(F, f, g, operator.xor, operator.xor)
+    return _karatsuba(F, f, g, F.add_scalar,
+                      lambda a, b: F.add_scalar(a, F.add_inverse(b)))
+
+
+def _divmod(F, f, g):
+    """Returns (quotient, remainder) of coefficient sequences f and g"""
+    if not g:
+        raise ZeroDivisionError("Polynomial division by zero.")
+    r = list(f)
+    d = len(g) - 1
+    if len(r) <= d:
+        return ([], r)
+    inverse = F.mult_inverse(g[-1], False)
+    q = [0] * (len(r) - d)
+    if F._modular:
+        p = F.size
+        for i in range(len(r) - 1, d - 1, -1):
+            c = r[i] * inverse % p
+            if c:
+                q[i - d] = c
+                for j in range(d):
+                    r[i - d + j] = (r[i - d + j] - c * g[j]) % p
+        return (q, r[:d])
+    (add, mult) = (F.add_scalar, F.mult_scalar)
+    neg_g = [_neg(F, b) for b in g]
+    for i in range(len(r) - 1, d - 1, -1):
+        c = mult(r[i], inverse)
+        if c:
+            q[i - d] = c
+            for j in range(d):
+                r[i - d + j] = add(r[i - d + j], mult(c, neg_g[j]))
+    return (q, r[:d])
+
+
+def _product(F, factors):
+    """Multiplies coefficient lists pairwise, like a subproduct tree"""
+    if not factors:
+        return GFPoly._make(F, [1])
+    factors = [list(f) for f in factors]
+    while len(factors) > 1:
+        paired = [_mul(F, a, b) for (a, b) in zip(factors[::2], factors[1::2])]
+        if len(factors) % 2:
+            paired.append(factors[-1])
+        factors = paired
+    return GFPoly._make(F, factors[0])
+
+
+def gcd(f, g):
+    """Returns the monic greatest common divisor of polynomials f and g"""
+    while g:
+        (f, g) = (g, f % g)
+    return f.monic()
+
+
+def xgcd(f, g):
+    """
+    Returns (d, s, t) where d is the monic greatest common divisor of f and g
+    and s f + t g = d.  This is the extended Euclidean algorithm of
+    gcd.inverse(), on polynomials.
+    """
+    F = f.field
+    (s, news) = (GFPoly._make(F, [1]), GFPoly._make(F, []))
+    (t, newt) = (GFPoly._make(F, []), GFPoly._make(F, [1]))
+    (r, newr) = (f, g)
+    while newr:
+        (quotient, remainder) = divmod(r, newr)
+        (s, news) = (news, s - quotient * news)
+        (t, newt) = (newt, t - quotient * newt)
+        (r, newr) = (newr, remainder)
+    if not r:
+        return (r, s, t)
+    scale = F.mult_inverse(r.lead, False)
+    return (r * scale, s * scale, t * scale)
+
+
+def interpolate(field, xs, ys):
+    """
+    Returns the polynomial of least degree taking value ys[i] at xs[i] for
+    each i, by Lagrange interpolation.  The xs must be distinct.
+    """
+    (xs, ys) = (field.identity(list(xs)), list(ys))
+    if len(xs) != len(ys):
+        raise ValueError("Need one value for each interpolation point.")
+    # Reduced first, as points such as 0 and 7 in GF(7) are the same
+    if len(set(xs)) != len(xs):
+        raise ValueError("Interpolation points must be distinct.")
+    F = field
+    M = GFPoly.from_roots(F, xs)
+    # M / (x - xs[i]) evaluated at xs[i] is M'(xs[i])
+    weights = M.derivative().evaluate_many(xs)
+    result = [0] * len(xs)
+    (add, mult) = (F.add_scalar, F.mult_scalar)
+    for (x, y, w) in zip(xs, ys, weights):
+        c = mult(F.identity(y), F.mult_inverse(w, False))
+        if not c:
+            continue
+        # Synthetic division of M by (x - xs[i]), scaled by c as it goes
+        quotient = 0
+        for j in range(len(M.coeffs) - 1, 0, -1):
+            quotient = add(mult(quotient, x), M.coeffs[j])
+            result[j - 1] = add(result[j - 1], mult(c, quotient))
+    return GFPoly._make(F, result)
@@ -0,0 +1,228 @@
+"""
+An asyncio facade over a code that batches concurrent requests.
+
+Encoding one word per call wastes the batch methods of a code and, done on
+the event loop, blocks it.  A BatchingService queues the words that coroutines
+ask to encode or decode, and sends them to the code's encode_batch() or
+decode_batch() together, in an executor, once max_batch words are waiting or
+the oldest has waited max_latency seconds, whichever comes first.  Each
+caller then gets its own result, or its own exception, back.
+
+Usage:
+
+    C = LinearCode(GF(256, poly=0x11d), G)
+    async with BatchingService(C, max_batch=256, max_latency=0.002) as service:
+        c = await service.encode(w)
+        r = await service.decode(c)
+        service.stats()         # queue depth, batches run so far, ...
+
+The code may be a LinearCode (or CyclicCode), whose decode() returns the
+nearest codeword, or a ReedSolomon code, whose decode() returns the message
+and raises ValueError when there are too many errors to correct.  Encoding
+and decoding are queued separately, so a batch holds one kind of request.
+"""
+import asyncio
+from collections import namedtuple
+
+from reedsolomon import ReedSolomon, _is_bytes
+
+__author__ = "Jerry Yin"
+
+# Largest number of words sent to the code at once by default
+MAX_BATCH = 256
+
+# Longest time in seconds a word waits for its batch to fill, by default
+MAX_LATENCY = 0.002
+
+_KINDS = ("encode", "decode")
+
+
+class ServiceStats(namedtuple("ServiceStats", "requests batches queued "
+                                              "running peak_queued")):
+    """
+    Counts for a BatchingService: requests and batches handled so far, words
+    waiting for a batch (queued) and in batches being run (running) now, and
+    the most words ever waiting at once.
+    """
+    __slots__ = ()
+
+    @property
+    def mean_batch(self):
+        """Mean number of words per batch"""
+        return self.requests / self.batches if self.batches else 0.0
+
+
+class BatchingService(object):
+    """
+    Encodes and decodes words with code in batches of at most max_batch
+    words, waiting at most max_latency seconds after the first word of a
+    batch arrives before running it.  Batches run in executor (the event
+    loop's default thread pool if None); a process pool works too, as long
+    as code can be pickled.
+
+    Use it from coroutines on a single event loop.  close(), or leaving an
+    "async with" block, runs whatever is still queued and waits for it.
+    """
+
+    def __init__(self, code, max_batch=MAX_BATCH, max_latency=MAX_LATENCY,
+                 executor=None):
+        if max_batch < 1:
+            raise ValueError("max_batch must be at least 1.")
+        if max_latency < 0:
+            raise ValueError("max_latency must not be negative.")
+        self.code = code
+        self.max_batch = max_batch
+        self.max_latency = max_latency
+        self.executor = executor
+        self.closed = False
+        self._queues = {kind: [] for kind in _KINDS}
+        self._timers = {}
+        self._running = set()
+        (self._requests, self._batches, self._running_words,
+         self._peak) = (0, 0, 0, 0)
+        if isinstance(code, ReedSolomon):
+            self._lengths = {"encode": code.k, "decode": code.n}
+        else:
+            self._lengths = {"encode": len(code.G), "decode": code.n}
+
+    def __repr__(self):
+        return "BatchingService(%r, max_batch=%d, max_latency=%r)" % (
+            self.code, self.max_batch, self.max_latency)
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc_info):
+        await self.close()
+
+    @property
+    def queue_depth(self):
+        """Number of words waiting for a batch"""
+        return sum(map(len, self._queues.values()))
+
+    def stats(self):
+        """Returns the current ServiceStats"""
+        return ServiceStats(self._requests, self._batches, self.queue_depth,
+                            self._running_words, self._peak)
+
+    async def encode(self, word):
+        """Returns the codeword for word, like code.encode()"""
+        return await self._submit("encode", word)
+
+    async def decode(self, word):
+        """Returns what code.decode() returns for received word"""
+        return await self._submit("decode", word)
+
+    def _submit(self, kind, word):
+        """
+        Queues word and returns a future for its result, running the queue
+        at once if it is full, or starting its deadline if it was empty
+        """
+        if self.closed:
+            raise RuntimeError("Service is closed.")
+        if len(word) != self._lengths[kind]:
+            raise ValueError("Word must be %d symbols long."
+                             % self._lengths[kind])
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        queue = self._queues[kind]
+        queue.append((word, future))
+        self._peak = max(self._peak, self.queue_depth)
+        if len(queue) >= self.max_batch:
+            self._flush(kind)
+        elif len(queue) == 1:
+            self._timers[kind] = loop.call_later(self.max_latency,
+                                                 self._flush, kind)
+        return future
+
+    def _flush(self, kind):
+        """Takes up to max_batch queued words of kind and runs them"""
+        timer = self._timers.pop(kind, None)
+        if timer is not None:
+            timer.cancel()
+        queue = self._queues[kind]
+        batch = queue[:self.max_batch]
+        del queue[:self.max_batch]
+        if batch:
+            self._requests += len(batch)
+            self._batches += 1
+            self._running_words += len(batch)
+            task = asyncio.ensure_future(self._run(kind, batch))
+            self._running.add(task)
+            task.add_done_callback(self._running.discard)
+
+    async def _run(self, kind, batch):
+        """Runs batch in the executor and resolves the future of each word"""
+        loop = asyncio.get_running_loop()
+        words = [word for (word, _) in batch]
+        try:
+            results = await loop.run_in_executor(self.executor, _run_batch,
+                                                 self.code, kind, words)
+        except Exception as e:
+            results = [e] * len(batch)
+        finally:
+            self._running_words -= len(batch)
+        for ((_, future), result) in zip(batch, results):
+            if future.done():       # Cancelled by its caller
+                continue
+            if isinstance(result, Exception):
+                future.set_exception(result)
+            else:
+                future.set_result(result)
+
+    async def flush(self):
+        """Runs every queued word now and waits until all batches are done"""
+        for kind in _KINDS:
+            while self._queues[kind]:
+                self._flush(kind)
+        if self._running:
+            await asyncio.gather(*self._running)
+
+    async def close(self):
+        """Stops accepting words, then runs what is queued.  See flush()"""
+        self.closed = True
+        await self.flush()
+
+
+def _transpose(M):
+    return [list(row) for row in zip(*M)]
+
+
+def _run_batch(code, kind, words):
+    """
+    Returns the result of encoding or decoding each of words with code, or
+    the exception raised for it.  If the batch as a whole raises, which one
+    bad word is enough for, each word is run again on its own, so that only
+    the bad ones get an exception.
+    """
+    try:
+        return _batch(code, kind, words)
+    except Exception:
+        if len(words) == 1:
+            raise
+    results = []
+    for word in words:
+        try:
+            results.append(_batch(code, kind, [word])[0])
+        except Exception as e:
+            results.append(e)
+    return results
+
+
+def _batch(code, kind, words):
+    """_run_batch() without the fallback for words that raise"""
+    if isinstance(code, ReedSolomon):
+        if kind == "encode":
+            return [_like(c, w) for (c, w) in zip(code.encode_batch(words),
+                                                   words)]
+        (messages, errors) = code.decode_batch(words)
+        return [_like(m, w) if e >= 0 else
+                ValueError("Too many errors to correct.")
+                for (m, w, e) in zip(messages, words, errors)]
+    batch = code.encode_batch if kind == "encode" else code.decode_batch
+    return _transpose(batch(_transpose(words)))
+
+
+def _like(values, word):
+    """Returns values as bytes if word is bytes-like, else as a list"""
+    return bytes(values) if _is_bytes(word) else list(values)
@@ -0,0 +1,262 @@
+"""
+Streaming encoding and decoding of byte streams with a LinearCode.
+
+The input is read in chunks of whole blocks into one reused buffer, so memory
+stays constant however long the stream is.  Each chunk is viewed through a
+memoryview, split into blocks of symbols and handed to the batch methods of
+the code as one matrix.
+
+Symbols are packed into bytes as follows, depending on the field:
+
+    GF(2)       8 symbols per byte, most significant bit first
+    GF(2^8)     1 symbol per byte
+    GF(2^16)    1 symbol per 2 bytes, big-endian
+
+Usage:
+
+    C = LinearCode(GF(256, poly=0x11d), G)
+    with open("data", "rb") as src, open("data.enc", "wb") as dst:
+        stats = encode_stream(C, src, dst)
+    print(stats.mb_per_sec)
+"""
+import sys
+import time
+from array import array
+from collections import namedtuple
+
+from Galois import np
+
+__author__ = "Jerry Yin"
+
+# Number of blocks encoded or decoded per batch by default
+BATCH_SIZE = 4096
+
+# _BITS[x] is the byte x as a tuple of 8 bits, most significant first
+_BITS = [tuple((x >> (7 - i)) & 1 for i in range(8)) for x in range(256)]
+
+
+class StreamStats(namedtuple("StreamStats", "blocks bytes_in bytes_out "
+                                            "errors seconds")):
+    """
+    Counts for one pass over a stream.  errors is the number of blocks that
+    were corrected (decode_stream) or that are not codewords (check_stream),
+    and is 0 for encode_stream.
+    """
+    __slots__ = ()
+
+    @property
+    def mb_per_sec(self):
+        """Input throughput in megabytes (10**6 bytes) per second"""
+        return self.bytes_in / self.seconds / 1e6 if self.seconds else 0.0
+
+
+def _symbol_bits(field):
+    """Returns the number of bits per symbol, for fields that fit in bytes"""
+    bits = field._degree
+    if field._char != 2 or bits not in (1, 8, 16):
+        raise ValueError("Streams are only supported over GF(2), GF(2^8) "
+                         "and GF(2^16).")
+    return bits
+
+
+def _chunk_size(bits, length, batch):
+    """
+    Returns the number of bytes read per batch of blocks of length symbols.
+    Over GF(2), batch is rounded up to a multiple of 8 so that both the words
+    and the codewords of a batch fill a whole number of bytes.
+    """
+    if bits == 1:
+        batch = -(-batch // 8) * 8
+    return batch * length * bits // 8
+
+
+def _to_symbols(view, bits):
+    """Returns the symbols packed in the bytes of view, in order"""
+    if np is not None:
+        if bits == 1:
+            return np.unpackbits(np.frombuffer(view, dtype=np.uint8))
+        return np.frombuffer(view, dtype=np.uint8 if bits == 8 else ">u2")
+    if bits == 1:
+        return [b for x in view for b in _BITS[x]]
+    if bits == 8:
+        return view.tolist()
+    symbols = array("H")
+    symbols.frombytes(view)
+    if sys.byteorder == "little":
+        symbols.byteswap()
+    return symbols.tolist()
+
+
+def _to_bytes(symbols, bits):
+    """Packs a sequence of symbols into bytes.  Inverse of _to_symbols()"""
+    if np is not None:
+        symbols = np.asarray(symbols)
+        if bits == 1:
+            return np.packbits(symbols.astype(np.uint8)).tobytes()
+        return symbols.astype(np.uint8 if bits == 8 else ">u2").tobytes()
+    if bits == 1:
+        symbols = list(symbols) + [0] * (-len(symbols) % 8)
+        out = bytearray(len(symbols) // 8)
+        for i in range(len(out)):
+            x = 0
+            for b in symbols[8 * i:8 * i + 8]:
+                x = (x << 1) | b
+            out[i] = x
+        return bytes(out)
+    if bits == 8:
+        return bytes(symbols)
+    symbols = array("H", symbols)
+    if sys.byteorder == "little":
+        symbols.byteswap()
+    return symbols.tobytes()
+
+
+def _blocks(symbols, length, count):
+    """
+    Returns the length x count matrix whose columns are the first count
+    blocks of length symbols in symbols, padded with zeros if it is short.
+    """
+    size = length * count
+    if np is not None:
+        symbols = symbols[:size].astype(np.int64)
+        if len(symbols) < size:
+            symbols = np.concatenate([symbols,
+                                      np.zeros(size - len(symbols), np.int64)])
+        return symbols.reshape(count, length).T
+    symbols = symbols[:size]
+    symbols += [0] * (size - len(symbols))
+    return [symbols[j::length] for j in range(length)]
+
+
+def _unblocks(M, bits):
+    """Packs the columns of matrix M into bytes.  Inverse of _blocks()"""
+    if np is not None:
+        return _to_bytes(np.asarray(M).T.ravel(), bits)
+    return _to_bytes([x for column in zip(*M) for x in column], bits)
+
+
+def _chunks(src, size):
+    """
+    Yields memoryviews of successive chunks of src, each size bytes except
+    perhaps the last.  src is either a file-like object, which is read into
+    one reused buffer, or an object supporting the buffer protocol (bytes,
+    mmap, ...), which is sliced without copying.
+    """
+    if hasattr(src, "readinto"):
+        buf = bytearray(size)
+        view = memoryview(buf)
+        while True:
+            count = src.readinto(buf)
+            if not count:
+                return
+            # readinto may stop short on pipes and sockets; fill the chunk
+            while count < size:
+                more = src.readinto(view[count:])
+                if not more:
+                    break
+                count += more
+            yield view[:count]
+            if count < size:
+                return
+    else:
+        view = memoryview(src).cast("B")
+        for start in range(0, len(view), size):
+            yield view[start:start + size]
+
+
+def encode_stream(code, src, dst, batch=BATCH_SIZE):
+    """
+    Encodes src block by block with code and writes the codewords to dst.
+    src is a file-like object opened for binary reading, or a bytes-like
+    object such as an mmap; dst needs only a write() method.  The final block
+    (and its final byte or symbol) is padded with zeros, so pass the length
+    of src to decode_stream() to drop the padding again.  Returns a StreamStats.
+    """
+    bits = _symbol_bits(code.field)
+    (blocks, bytes_in, bytes_out) = (0, 0, 0)
+    start = time.perf_counter()
+    for view in _chunks(src, _chunk_size(bits, code.k, batch)):
+        bytes_in += len(view)
+        if bits == 16 and len(view) % 2:
+            view = memoryview(bytes(view) + b"\0")
+        count = -(-len(view) * 8 // (bits * code.k))
+        W = _blocks(_to_symbols(view, bits), code.k, count)
+        out = _unblocks(code.encode_batch(W), bits)
+        dst.write(out)
+        blocks += count
+        bytes_out += len(out)
+    return StreamStats(blocks, bytes_in, bytes_out, 0,
+                       time.perf_counter() - start)
+
+
+def decode_stream(code, src, dst, length=None, correct=True,
+                  batch=BATCH_SIZE):
+    """
+    Decodes the codewords in src with code and writes the recovered words to
+    dst, stopping after length bytes of output if length is given.  Unless
+    correct is False, every block is first corrected to a nearest codeword
+    with the syndrome decoder of the code; errors counts the blocks that
+    needed correcting.  Returns a StreamStats.
+    """
+    bits = _symbol_bits(code.field)
+    (blocks, bytes_in, bytes_out, errors) = (0, 0, 0, 0)
+    start = time.perf_counter()
+    for view in _chunks(src, _chunk_size(bits, code.n, batch)):
+        bytes_in += len(view)
+        count = _whole_blocks(view, bits, code.n)
+        R = _blocks(_to_symbols(view, bits), code.n, count)
+        if correct:
+            C = code.decode_batch(R)
+            errors += _count_changed(R, C)
+            R = C
+        out = _unblocks(code.extract_batch(R), bits)
+        if length is not None:
+            out = out[:max(0, length - bytes_out)]
+        dst.write(out)
+        blocks += count
+        bytes_out += len(out)
+    return StreamStats(blocks, bytes_in, bytes_out, errors,
+                       time.perf_counter() - start)
+
+
+def check_stream(code, src, batch=BATCH_SIZE):
+    """
+    Checks the syndrome of every codeword in src without decoding, and
+    returns a StreamStats whose errors counts the blocks that are not
+    codewords of code.
+    """
+    bits = _symbol_bits(code.field)
+    (blocks, bytes_in, errors) = (0, 0, 0)
+    start = time.perf_counter()
+    for view in _chunks(src, _chunk_size(bits, code.n, batch)):
+        bytes_in += len(view)
+        count = _whole_blocks(view, bits, code.n)
+        S = code.syndrome_batch(_blocks(_to_symbols(view, bits), code.n,
+                                        count))
+        if np is not None:
+            errors += int(np.count_nonzero(np.asarray(S).any(axis=0))) \
+                if len(S) else 0
+        else:
+            errors += sum(1 for s in zip(*S) if any(s)) if S else 0
+        blocks += count
+    return StreamStats(blocks, bytes_in, 0, errors,
+                       time.perf_counter() - start)
+
+
+def _whole_blocks(view, bits, length):
+    """
+    Returns the number of blocks of length symbols in view, allowing only the
+    padding to a whole byte after the last one.
+    """
+    symbols = len(view) * 8 // bits
+    if (symbols % length) * bits >= 8 or len(view) * 8 % bits:
+        raise ValueError("Stream ends inside a codeword.")
+    return symbols // length
+
+
+def _count_changed(A, B):
+    """Returns the number of columns in which matrices A and B differ"""
+    if np is not None:
+        return int(np.count_nonzero((np.asarray(A) != np.asarray(B))
+                                    .any(axis=0)))
+    return sum(1 for (a, b) in zip(zip(*A), zip(*B)) if a != b)
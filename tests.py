@@ -1,8 +1,35 @@
 """Testing for the GaloisPy library"""
 
 import unittest
+import asyncio
 import copy
+import io
+from itertools import combinations
+import os
+import random
+import time
+import logging
 from Galois import GF
+from codes import LinearCode, SyndromeDecoder
+from matrices import GFMatrix, GFVector
+from polynomials import GFPoly, gcd, xgcd, interpolate
+import polynomials
+from reedsolomon import ReedSolomon
+from cyclic import CyclicCode, CRC
+import reedsolomon
+import gf2
+import bounds
+import stream
+import cache
+from cache import TableCache
+import tracing
+import matmul
+from service import BatchingService
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
 
 GF2 = GF(2)
 GF3 = GF(3)
@@ -10,8 +37,18 @@ GF4 = GF(4)
 GF5 = GF(5)
 GF7 = GF(7)
 GF11 = GF(11)
-a = "a"
-b = "b"
+a = 2
+b = 3
+
+
+def random_matrix(F, m, n, rng, density=1.0):
+    """
+    Returns a random m x n matrix over F, each entry drawn from the whole
+    field with probability density and 0 otherwise
+    """
+    return [[rng.randrange(F.size) if rng.random() < density else 0
+             for _ in range(n)] for _ in range(m)]
+
 
 class TestArithMethods(unittest.TestCase):
     def setUp(self):
@@ -166,6 +203,198 @@ class TestRREF(unittest.TestCase):
                                 [0, 0, 0, 0],
                                 [0, 0, 0, 0]])
 
+    def test_pivots(self):
+        M = [[0, 0, b, 0],
+             [0, 0, 0, 0],
+             [a, 0, b, 1],
+             [1, 0, a, b]]
+        (R, pivots) = GF4.rref_with_pivots(M)
+        self.assertEqual(R, GF4.rref(M))
+        self.assertEqual(pivots, [0, 2])
+        self.assertEqual(M[0], [0, 0, b, 0])
+        self.assertEqual(GF3.rref_with_pivots([[0, 0], [0, 0]]),
+                         ([[0, 0], [0, 0]], []))
+
+    def test_inplace(self):
+        M = [[9, -2], [0, 11]]
+        rows = list(M)
+        (R, pivots) = GF7.rref_with_pivots(M, inplace=True)
+        self.assertIs(R, M)
+        self.assertEqual(M, [[1, 0], [0, 1]])
+        self.assertEqual(pivots, [0, 1])
+        self.assertTrue(all(any(row is r for r in rows) for row in M))
+
+class TestLinearAlgebra(unittest.TestCase):
+    def product(self, F, A, B):
+        return [F._combine(row, list(zip(*B))) for row in A]
+
+    def test_factorization(self):
+        rng = random.Random(4)
+        for F in (GF2, GF3, GF4, GF7, GF(9), GF(256, poly=0x11d)):
+            for _ in range(30):
+                (m, n) = (rng.randrange(1, 6), rng.randrange(1, 6))
+                A = random_matrix(F, m, n, rng, 0.7)
+                P = F.lu(A)
+                self.assertEqual(self.product(F, P.L, P.U),
+                                 [A[i] for i in P.perm])
+                self.assertEqual(P.rank, F.rank(A))
+                self.assertEqual(P.pivots, F.rref_with_pivots(A)[1])
+
+    def test_solve(self):
+        rng = random.Random(4)
+        for F in (GF2, GF5, GF(8), GF(27)):
+            for _ in range(30):
+                (m, n) = (rng.randrange(1, 6), rng.randrange(1, 6))
+                A = random_matrix(F, m, n, rng, 0.7)
+                X = random_matrix(F, n, 3, rng, 0.7)
+                B = self.product(F, A, X)
+                P = F.lu(A)
+                self.assertEqual(self.product(F, A, P.solve_batch(B)), B)
+                b = [row[0] for row in B]
+                x = F.solve(A, b)
+                self.assertEqual(self.product(F, A, [[c] for c in x]),
+                                 [[c] for c in b])
+        A = [[1, 2], [2, 4]]
+        self.assertEqual(GF5.solve(A, [3, 1]), [3, 0])
+        self.assertRaises(ValueError, GF5.solve, A, [1, 1])
+        self.assertRaises(ValueError, GF5.lu(A).solve_batch, [[1], [1]])
+        self.assertRaises(ValueError, GF5.solve, A, [1])
+
+    def test_det_inverse(self):
+        rng = random.Random(4)
+        self.assertEqual(GF7.det([[1, 2], [3, 4]]), 5)
+        self.assertEqual(GF7.det([[0, 1], [1, 0]]), 6)
+        self.assertEqual(GF7.det([[1, 2], [2, 4]]), 0)
+        self.assertEqual(GF7.inverse([[1, 2], [3, 4]]), [[5, 1], [5, 3]])
+        self.assertRaises(ValueError, GF7.inverse, [[1, 2], [2, 4]])
+        self.assertRaises(ValueError, GF7.det, [[1, 2, 3]])
+        for F in (GF2, GF3, GF4, GF11, GF(16)):
+            for _ in range(30):
+                n = rng.randrange(1, 6)
+                (A, B) = (random_matrix(F, n, n, rng, 0.7),
+                          random_matrix(F, n, n, rng, 0.7))
+                self.assertEqual(F.det(self.product(F, A, B)),
+                                 F.mult_scalar(F.det(A), F.det(B)))
+                if F.det(A):
+                    I = [[int(i == j) for j in range(n)] for i in range(n)]
+                    self.assertEqual(self.product(F, A, F.inverse(A)), I)
+
+    def test_nullspace(self):
+        rng = random.Random(4)
+        self.assertEqual(GF7.nullspace([[1, 2, 3]]), [[5, 1, 0], [4, 0, 1]])
+        self.assertEqual(GF7.nullspace([[1, 0], [0, 1]]), [])
+        for F in (GF2, GF3, GF4, GF7):
+            for _ in range(30):
+                (m, n) = (rng.randrange(1, 6), rng.randrange(1, 7))
+                A = random_matrix(F, m, n, rng, 0.7)
+                N = F.nullspace(A)
+                self.assertEqual(len(N), n - F.rank(A))
+                if N:
+                    self.assertTrue(F.is_pc_matrix(A, N))
+                    self.assertEqual(F.rank(N), len(N))
+        # Unlike create_pc_matrix(), any generator matrix will do
+        G = [[0, 1, 1, 0], [1, 1, 0, 1], [1, 0, 1, 1]]
+        self.assertTrue(GF2.is_pc_matrix(G, GF2.nullspace(G)))
+
+    def test_types(self):
+        M = GFMatrix(GF7, [[1, 2], [3, 4]])
+        self.assertEqual(GF7.inverse(M), GFMatrix(GF7, [[5, 1], [5, 3]]))
+        self.assertIsInstance(GF7.nullspace(M), GFMatrix)
+        self.assertEqual(GF7.nullspace(M).shape, (0, 2))
+        self.assertEqual(GF7.solve(M, GFVector(GF7, [1, 0])),
+                         GFVector(GF7, [5, 5]))
+        if np is not None:
+            A = np.array([[1, 2, 3]])
+            self.assertEqual(GF7.nullspace(A).tolist(), [[5, 1, 0], [4, 0, 1]])
+            self.assertEqual(GF7.solve(np.array([[1, 2], [3, 4]]),
+                                       np.array([1, 0])).tolist(), [5, 5])
+
+
+class TestMatmul(unittest.TestCase):
+    def naive(self, F, A, B):
+        return [[F.dot_vec(row, list(col)) for col in zip(*B)] for row in A]
+
+    def test_methods(self):
+        # Four Russians, packed lanes and the cubic method, each with and
+        # without the Strassen-Winograd recursion
+        rng = random.Random(5)
+        for F in (GF2, GF4, GF(8), GF(32), GF(256, poly=0x11d), GF3, GF7,
+                  GF(65521), GF(9), GF(65536)):
+            for _ in range(10):
+                (m, l, n) = [rng.randrange(1, 14) for _ in range(3)]
+                A = random_matrix(F, m, l, rng)
+                B = random_matrix(F, l, n, rng)
+                C = self.naive(F, A, B)
+                self.assertEqual(F.matmul(A, B), C)
+                self.assertEqual(F.matmul(A, B, cutoff=2), C)
+                self.assertEqual(matmul.cubic(F, A, B), C)
+
+    def test_strassen_winograd(self):
+        rng = random.Random(5)
+        for F in (GF2, GF5, GF(27)):
+            A = random_matrix(F, 37, 50, rng)
+            B = random_matrix(F, 50, 29, rng)
+            self.assertEqual(F.matmul(A, B, cutoff=8), self.naive(F, A, B))
+
+    def test_types(self):
+        (A, B) = ([[1, 2], [3, 4], [5, 6]], [[1, 0, 2], [3, 4, 5]])
+        C = self.naive(GF7, A, B)
+        self.assertEqual(GF7.matmul(A, B), C)
+        self.assertEqual(GF7.matmul(GFMatrix(GF7, A), B), GFMatrix(GF7, C))
+        self.assertEqual(GF7.matmul(A, [[]] * 2), [[], [], []])
+        self.assertEqual(GF7.matmul([], B), [])
+        self.assertRaises(ValueError, GF7.matmul, A, A)
+        self.assertRaises(ValueError, GF7.matmul, A, [[1], [2, 3]])
+        if np is not None:
+            self.assertEqual(GF7.matmul(np.array(A), B).tolist(), C)
+            self.assertRaises(ValueError, GF7.matmul, np.array(A), A)
+
+    def test_unreduced_entries(self):
+        # Entries equal to p, above p and negative are reduced first
+        for F in (GF7, GF(65521)):
+            p = F.size
+            A = [[p - 1] * 7] * 4
+            B = [[p, 1], [-1, 3 * p + 2], [200, -p]] * 2 + [[p + 1, 0]]
+            reduced = [[x % p for x in row] for row in B]
+            self.assertEqual(F.matmul(A, B), self.naive(F, A, reduced))
+            self.assertEqual(F.matmul(A, B, cutoff=1),
+                             self.naive(F, A, reduced))
+        self.assertEqual(GF7.matmul([[6] * 7] * 4, [[7, 1]] * 7),
+                         [[0, 0]] * 4)
+        self.assertTrue(GF7.is_pc_matrix([[6] * 7] * 4, [[7] * 7]))
+        G = [[1, 0, 3], [0, 1, 5]]
+        self.assertEqual(GF7.encode_batch(G, [[200, 0, -1], [7, 3, 8]]),
+                         GF7.encode_batch(G, [[4, 0, 6], [0, 3, 1]]))
+        C = LinearCode(GF7, G)
+        self.assertEqual(C.encode_batch([[-1], [1]]),
+                         [[x] for x in C.encode([-1, 1])])
+        # Entries outside GF(2^d) cannot be reduced
+        for F in (GF4, GF(16)):
+            with self.assertRaises(ValueError):
+                F.matmul([[1, F.size]] * 4, [[1], [1]])
+            with self.assertRaises(ValueError):
+                F.matmul([[1, 1]] * 4, [[-1], [1]])
+        if np is not None:
+            self.assertEqual(GF7.matmul(np.array([[6] * 7]), [[7, 1]] * 7)
+                             .tolist(), [[0, 0]])
+
+    def test_routing(self):
+        # Encoding and syndromes are matrix products
+        rng = random.Random(5)
+        F = GF(16)
+        G = random_matrix(F, 4, 9, rng)
+        W = random_matrix(F, 4, 6, rng)
+        self.assertEqual(F.encode_batch(G, W),
+                         self.naive(F, [list(c) for c in zip(*G)], W))
+        self.assertEqual(F.encode(G, [row[0] for row in W]),
+                         [row[0] for row in F.encode_batch(G, W)])
+        C = LinearCode(GF3, [[1, 0, 1, 2], [0, 1, 2, 2]])
+        self.assertTrue(GF3.is_pc_matrix(C.G, C.H))
+        self.assertFalse(GF3.is_pc_matrix(C.G, [[1, 0, 0, 0]]))
+        self.assertEqual(C.syndrome([1, 1, 1, 1]),
+                         self.naive(GF3, [[1, 1, 1, 1]], C.H_T)[0])
+
+
 class TestCodingMethods(unittest.TestCase):
     def setUp(self):
         GF2 = GF(2)
@@ -189,6 +418,29 @@ class TestCodingMethods(unittest.TestCase):
                                    [1, 1, 2, 0, 2],
                                    [2, 2, 1, 2, 1]]), 3)
         
+    def test_rank_many(self):
+        matrices = [[[1, 0], [0, 1]],
+                    [[0, 0, 0], [0, 3, 0]],
+                    [[0]],
+                    [[1, 1, 2, 1, 2],
+                     [1, 0, 1, 1, 0],
+                     [1, 2, 0, 1, 1],
+                     [1, 1, 2, 0, 2],
+                     [2, 2, 1, 2, 1]]]
+        expected = [GF3.rank(M) for M in matrices]
+        self.assertEqual(list(GF3.rank_many(matrices, workers=1)), expected)
+        self.assertEqual(list(GF3.rank_many(iter(matrices), workers=2,
+                                            chunksize=3)), expected)
+        self.assertEqual(list(GF3.is_lin_indep_many(matrices, workers=2)),
+                         [1, 0, 0, 0])
+        self.assertEqual(list(GF(256, poly=0x11b).rank_many(
+            [[[1, 2], [2, 4]], [[1, 2], [3, 4]]], workers=2)), [1, 2])
+        # Workers build the field with the same table_limit
+        F = GF(256, poly=0x11b, table_limit=16)
+        self.assertEqual(F._map_many("__getattribute__",
+                                     ["table_limit", "_exp"], 2, None),
+                         [16, None])
+
     def test_lin_dep(self):
         self.assertTrue(GF2.is_lin_indep([[1, 0], [0, 1]]))
         self.assertTrue(GF3.is_lin_indep([[-1, 0], [0, 1]]))
@@ -214,6 +466,26 @@ class TestCodingMethods(unittest.TestCase):
                                      [a, 1, 0, a]], [a, 0, 1]),
                          [1, a, a, b])
         
+    def test_encode_batch(self):
+        G = [[a, a, 1, b],
+             [0, b, a, 1],
+             [a, 1, 0, a]]
+        W = [[a, a, 0],
+             [1, 0, 0],
+             [b, 1, 0]]
+        self.assertEqual(GF4.encode_batch(G, W), [[a, 1, 0],
+                                                  [b, a, 0],
+                                                  [0, a, 0],
+                                                  [1, b, 0]])
+        self.assertEqual(GF7.encode_batch([[1, 0, 3], [0, 1, 4]],
+                                          [[1, 6], [2, 1]]),
+                         [[1, 6], [2, 1], [4, 1]])
+        blocks = GF7.encode_batch([[1, 0, 3], [0, 1, 4]],
+                                  iter([[[1], [2]], [[6], [1]]]))
+        self.assertEqual(list(blocks), [[[1], [2], [4]], [[6], [1], [1]]])
+        with self.assertRaises(ValueError):
+            GF7.encode_batch([[1, 0, 3], [0, 1, 4]], [[1, 6]])
+
     def test_dot(self):
         self.assertEqual(GF2.dot_vec([0], [0]), 0)
         self.assertEqual(GF2.dot_vec([0], [1]), 0)
@@ -256,6 +528,29 @@ class TestCodingMethods(unittest.TestCase):
             GF11.create_pc_matrix([[10, 3, 7, 5],
                                    [1,  2, 3, 0]])
             ))
+
+    def test_pc_blocks(self):
+        import random
+        rng = random.Random(6)
+        for q in (2, 7, 256):
+            tracer = tracing.ListTracer()
+            F = GF(q, tracer=tracer)
+            G = [[int(i == j) for j in range(12)] +
+                 [rng.randrange(q) for _ in range(18)] for i in range(12)]
+            H = F.create_pc_matrix(G)
+            for block in (None, 1, 5, 100):
+                self.assertTrue(F.is_pc_matrix(G, H, block=block))
+            H[9][3] = F.add_scalar(H[9][3], 1)
+            # Row 3 of G is the first with a nonzero product with row 9 of H
+            for block in (None, 1, 5, 100):
+                tracer.clear()
+                self.assertFalse(F.is_pc_matrix(G, H, block=block))
+                data = tracer.events[0].data
+                self.assertEqual((data["i"], data["j"]), (3, 9))
+                self.assertEqual((data["u"], data["v"]), (G[3], H[9]))
+            if np is not None:
+                self.assertFalse(F.is_pc_matrix(np.array(G), np.array(H),
+                                                block=5, verbose=False))
     
     def test_standard_form(self):
         self.assertTrue(GF2.is_standard_form([[1]]), 'g')
@@ -307,6 +602,1087 @@ class TestCodingMethods(unittest.TestCase):
                                                [0, 1],
                                                [0, 0]], 'p'))
 
+class TestTables(unittest.TestCase):
+    def test_matches_direct(self):
+        for size in (2, 3, 4, 5, 7, 11, 13):
+            F = GF(size)
+            G = GF(size, tables=False)
+            self.assertIsNotNone(F._log)
+            self.assertIsNone(G._log)
+            for x in F.elements:
+                for y in F.elements:
+                    self.assertEqual(F.mult_scalar(x, y), G.mult_scalar(x, y))
+                if x != 0:
+                    self.assertEqual(F.mult_inverse(x), G.mult_inverse(x))
+                for n in range(-3, 6):
+                    if x == 0 and n < 0:
+                        self.assertRaises(ZeroDivisionError, F.exp_scalar,
+                                          x, n)
+                        self.assertRaises(ZeroDivisionError, G.exp_scalar,
+                                          x, n)
+                        continue
+                    self.assertEqual(F.exp_scalar(x, n), G.exp_scalar(x, n))
+
+    def test_table_limit(self):
+        self.assertIsNone(GF(11, table_limit=7)._log)
+        self.assertIsNotNone(GF(7, table_limit=7)._log)
+        self.assertEqual(GF(11, table_limit=7).mult_inverse(9), 5)
+
+    def test_unreduced_input(self):
+        self.assertEqual(GF11.mult_inverse(20), 5)
+        self.assertEqual(GF7.exp_scalar(-1, 3), 6)
+        self.assertRaises(ZeroDivisionError, GF7.exp_scalar, 7, -1)
+        self.assertRaises(ZeroDivisionError, GF(16, tables=False).exp_scalar,
+                          0, -2)
+        self.assertEqual(GF7.exp_scalar(3, -1), 5)
+        with self.assertRaises(ZeroDivisionError):
+            GF7.mult_inverse(14)
+
+class TestExtensionFields(unittest.TestCase):
+    def test_field_axioms(self):
+        for size in (8, 9, 16, 25, 27):
+            F = GF(size)
+            for x in F.elements:
+                self.assertEqual(F.add(x, F.add_inverse(x)), 0)
+                if x != 0:
+                    self.assertEqual(F.mult_scalar(x, F.mult_inverse(x)), 1)
+                for y in F.elements:
+                    self.assertEqual(F.mult_scalar(x, F.add(x, y)),
+                                     F.add(F.mult_scalar(x, x),
+                                           F.mult_scalar(x, y)))
+
+    def test_matches_direct(self):
+        for size in (9, 16, 27):
+            F = GF(size)
+            G = GF(size, tables=False)
+            for x in F.elements:
+                for y in F.elements:
+                    self.assertEqual(F.add(x, y), G.add(x, y))
+                    self.assertEqual(F.mult_scalar(x, y), G.mult_scalar(x, y))
+                self.assertEqual(F.exp_scalar(x, 5), G.exp_scalar(x, 5))
+
+    def test_binary_polys(self):
+        GF256 = GF(256)
+        self.assertEqual(GF256.poly, 0x11d)
+        self.assertEqual(GF256.mult_scalar(2, 128), 0x1d)
+        self.assertEqual(GF256.mult_scalar(0x53, GF256.mult_inverse(0x53)), 1)
+        AES = GF(256, poly=0x11b)
+        self.assertEqual(AES.mult_scalar(0x53, 0xca), 1)
+        self.assertEqual(AES.mult_inverse(0x53), 0xca)
+        self.assertEqual(GF(256, tables=False, poly=0x11b).mult_inverse(0x53),
+                         0xca)
+        for m in range(2, 17):
+            # The default polynomial makes x a primitive element
+            self.assertEqual(GF(2**m)._exp[1], 2)
+
+    def test_invalid(self):
+        with self.assertRaises(ValueError):
+            GF(6)
+        with self.assertRaises(ValueError):
+            GF(16, poly=0b10101)
+        with self.assertRaises(ValueError):
+            GF(16, poly=0b111)
+        with self.assertRaises(ValueError):
+            GF4.identity(4)
+        with self.assertRaises(ValueError):
+            GF(256).mult_scalar(3, 256)
+        # Without tables too, and for odd characteristic
+        for kwargs in ({"tables": False}, {"table_limit": 8}):
+            with self.assertRaises(ValueError):
+                GF(16, poly=0b10101, **kwargs)
+        with self.assertRaises(ValueError):
+            GF(9, poly=9 + 2, tables=False)     # x^2 + 2 = (x + 1)(x + 2)
+        self.assertEqual(GF(9, poly=9 + 1, tables=False).mult_scalar(3, 3), 2)
+
+    def test_out_of_range(self):
+        # Negative values must not wrap around the tables
+        for F in (GF4, GF(4, tables=False), GF(9), GF(9, tables=False)):
+            for (method, args) in ((F.mult_scalar, (2, -1)),
+                                   (F.mult_scalar, (0, 9)),
+                                   (F.add_scalar, (-1, 1)),
+                                   (F.add, (2, 10)),
+                                   (F.exp_scalar, (-1, 2))):
+                with self.assertRaises(ValueError):
+                    method(*args)
+            with self.assertRaises((ValueError, TypeError)):
+                F.mult_inverse(-1)
+        with self.assertRaises(ValueError):
+            LinearCode(GF4, [[1, 0, 1], [0, 1, 1]]).encode([-1, 1])
+
+class TestGF2Packed(unittest.TestCase):
+    def test_pack(self):
+        self.assertEqual(gf2.pack_vec([1, 0, 1, 1]), 0b1101)
+        self.assertEqual(gf2.pack_vec([]), 0)
+        self.assertEqual(gf2.unpack_vec(0b1101, 5), [1, 0, 1, 1, 0])
+        self.assertEqual(gf2.unpack_rows(gf2.pack_rows([[1, 0], [-1, 2]]), 2),
+                         [[1, 0], [1, 0]])
+        self.assertEqual(gf2.dot(0b1101, 0b0111), 0)
+        self.assertEqual(gf2.dot(0b1101, 0b0101), 0)
+        self.assertEqual(gf2.dot(0b1101, 0b0001), 1)
+
+    def test_matches_generic(self):
+        M = [[1, 1, 0, 0, 1, 0],
+             [1, 0, 1, 0, 0, 1],
+             [0, 1, 1, 0, 1, 1],
+             [1, 0, 0, 1, 1, 1]]
+        (rows, pivots) = gf2.rref(gf2.pack_rows(M), 6)
+        self.assertEqual(gf2.unpack_rows(rows, 6), [[1, 0, 0, 1, 1, 1],
+                                                    [0, 1, 0, 1, 0, 1],
+                                                    [0, 0, 1, 1, 1, 0],
+                                                    [0, 0, 0, 0, 0, 0]])
+        self.assertEqual(pivots, [0, 1, 2])
+        self.assertEqual(gf2.rank(gf2.pack_rows(M)), 3)
+        self.assertEqual(GF2.rank(M), 3)
+        self.assertEqual(GF2.rref(M), GF2.rref(M, verbose=False))
+
+    def test_linear_code(self):
+        C = LinearCode(GF2, [[1, 0, 0, 0, 1, 1, 0],
+                             [0, 1, 0, 0, 1, 0, 1],
+                             [0, 0, 1, 0, 0, 1, 1],
+                             [0, 0, 0, 1, 1, 1, 1]])
+        c = C.encode([1, 0, 1, 1])
+        self.assertEqual(c, GF2.encode(C.G, [1, 0, 1, 1]))
+        self.assertEqual(C.syndrome(c), [0, 0, 0])
+        c[2] ^= 1
+        self.assertEqual(C.syndrome(c), [0, 1, 1])
+
+class TestLinearCode(unittest.TestCase):
+    def test_artifacts(self):
+        C = LinearCode(GF3, [[1, 1, 2, 1, 2],
+                             [1, 0, 1, 1, 0],
+                             [1, 2, 0, 1, 1],
+                             [1, 1, 2, 0, 2]])
+        self.assertEqual(C.rank, 3)
+        self.assertEqual(C.k, 3)
+        self.assertEqual(C.n, 5)
+        self.assertEqual(C.pivots, [0, 1, 3])
+        self.assertIsNone(C.standard_form)
+        self.assertFalse(C.is_generator_matrix())
+        self.assertEqual(len(C.H), 2)
+        self.assertTrue(GF3.is_pc_matrix(C.G, C.H))
+        self.assertEqual(C.H_T, [list(col) for col in zip(*C.H)])
+        self.assertIs(C.rref, C.rref)
+
+    def test_matches_create_pc_matrix(self):
+        for F, G in ((GF4, [[b, 0, 0, 0], [0, a, 0, 1], [0, 0, 1, 0]]),
+                     (GF11, [[10, 3, 7, 5], [1, 2, 3, 0]]),
+                     (GF7, [[1, 0, 6, 6], [0, 1, 3, 2]])):
+            C = LinearCode(F, G)
+            self.assertEqual(C.H, F.identity(F.create_pc_matrix(G)))
+            self.assertEqual(C.standard_form, F.rref(G))
+
+    def test_encode_and_check(self):
+        C = LinearCode(GF2, [[1, 0, 1, 1], [0, 1, 0, 1]])
+        c = C.encode([1, 1])
+        self.assertEqual(c, [1, 1, 1, 0])
+        self.assertEqual(C.syndrome(c), [0, 0])
+        self.assertEqual(C.syndrome([1, 1, 1, 1]), [0, 1])
+        self.assertIn(c, C)
+        self.assertNotIn([1, 1, 1, 1], C)
+        self.assertEqual(C.syndrome_batch(C.encode_batch([[1, 0], [1, 1]])),
+                         [[0, 0], [0, 0]])
+        with self.assertRaises(ValueError):
+            C.syndrome([1, 0])
+
+    def test_full_length(self):
+        C = LinearCode(GF5, [[1, 0], [0, 1]])
+        self.assertEqual(C.H, [])
+        self.assertIn([3, 4], C)
+
+    def test_recover(self):
+        # RS(7, 3) over GF(8): any 4 erasures can be recovered
+        F = GF(8)
+        G = [[F.exp_scalar(F.exp_scalar(2, j), i) for j in range(7)]
+             for i in range(3)]
+        C = LinearCode(F, G, recovery_cache_size=4)
+        w = [5, 0, 3]
+        c = C.encode(w)
+        for erasures in ((), (0,), (6, 2), (1, 2, 3, 4), (0, 2, 4, 6)):
+            r = [x if j not in erasures else 0 for (j, x) in enumerate(c)]
+            self.assertEqual(C.recover(r, erasures), w)
+        W = [[1, 2], [3, 4], [5, 6]]
+        self.assertEqual(C.recover_batch(C.encode_batch(W), [5, 1, 3]), W)
+        self.assertRaises(ValueError, C.recover, c, range(5))
+        self.assertRaises(ValueError, C.recover, c, [7])
+        (info, R) = C.recovery_matrix([2, 6])
+        self.assertEqual(info, [0, 1, 3])
+        self.assertIs(C.recovery_matrix([6, 2, 2])[1], R)
+
+    def test_recovery_cache(self):
+        C = LinearCode(GF2, [[1, 0, 0, 1, 1], [0, 1, 0, 1, 0],
+                             [0, 0, 1, 0, 1]], recovery_cache_size=2)
+        cache = C.recoveries
+        for erasures in ([0], [1], [0], [2], [1], [1]):
+            C.recovery_matrix(erasures)
+        self.assertEqual((cache.hits, cache.misses, cache.evictions),
+                         (2, 4, 2))
+        self.assertEqual(len(cache), 2)
+        self.assertIn((1,), cache)
+        self.assertNotIn((0,), cache)
+        # Copies for worker processes start empty
+        import pickle
+        copied = pickle.loads(pickle.dumps(C)).recoveries
+        self.assertEqual((copied.max_entries, len(copied)), (2, 0))
+        cache.clear()
+        self.assertEqual(len(cache), 0)
+
+    def test_recovery_cache_threads(self):
+        import threading
+        C = LinearCode(GF7, [[1, 0, 0, 1, 1, 1], [0, 1, 0, 1, 2, 3],
+                             [0, 0, 1, 1, 4, 2]], recovery_cache_size=8)
+        patterns = [p for p in combinations(range(6), 2)
+                    if C.field.rank([[row[j] for j in range(6) if j not in p]
+                                     for row in C.G]) == 3]
+        w = [3, 1, 4]
+        c = C.encode(w)
+        errors = []
+
+        def worker(seed):
+            for i in range(200):
+                p = patterns[(seed * 7 + i) % len(patterns)]
+                if C.recover(c, p) != w:
+                    errors.append(p)
+        threads = [threading.Thread(target=worker, args=(t,))
+                   for t in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(errors, [])
+        cache = C.recoveries
+        self.assertEqual(cache.hits + cache.misses, 800)
+        # Threads missing the same pattern at once both count a miss
+        self.assertGreaterEqual(cache.misses - cache.evictions, len(cache))
+        self.assertLessEqual(len(cache), 8)
+
+class TestMinimumDistance(unittest.TestCase):
+    def test_hamming(self):
+        C = LinearCode(GF2, [[1, 0, 0, 0, 1, 1, 0],
+                             [0, 1, 0, 0, 1, 0, 1],
+                             [0, 0, 1, 0, 0, 1, 1],
+                             [0, 0, 0, 1, 1, 1, 1]])
+        self.assertEqual(C.weight_distribution, [1, 0, 0, 7, 7, 0, 0, 1])
+        self.assertEqual(C.minimum_distance(), 3)
+        self.assertEqual(C._brouwer_zimmermann(None), 3)
+
+    def test_golay(self):
+        g = [1, 0, 1, 0, 1, 1, 1, 0, 0, 0, 1, 1]
+        C = LinearCode(GF2, [[0] * i + g + [0] * (11 - i) for i in range(12)])
+        self.assertEqual(C.weight_distribution,
+                         [1, 0, 0, 0, 0, 0, 0, 253, 506, 0, 0, 1288, 1288, 0,
+                          0, 506, 253, 0, 0, 0, 0, 0, 0, 1])
+        self.assertEqual(C._brouwer_zimmermann(None), 7)
+        self.assertEqual(C._brouwer_zimmermann(5), 5)
+        self.assertEqual(C.minimum_distance(target=5), 5)
+
+    def test_nonbinary(self):
+        # The [4, 2, 3] tetracode and the [6, 3, 4] hexacode
+        C = LinearCode(GF3, [[1, 0, 1, 1], [0, 1, 1, 2]])
+        self.assertEqual(C.weight_distribution, [1, 0, 0, 8, 0])
+        self.assertEqual(C._brouwer_zimmermann(None), 3)
+        C = LinearCode(GF4, [[1, 0, 0, 1, a, a],
+                             [0, 1, 0, a, 1, a],
+                             [0, 0, 1, a, a, 1]])
+        self.assertEqual(C.weight_distribution, [1, 0, 0, 0, 45, 0, 18])
+        self.assertEqual(C._brouwer_zimmermann(None), 4)
+        with self.assertRaises(ValueError):
+            LinearCode(GF5, [[0, 0]]).minimum_distance()
+
+class TestSyndromeDecoder(unittest.TestCase):
+    def test_hamming(self):
+        C = LinearCode(GF2, [[1, 0, 0, 0, 1, 1, 0],
+                             [0, 1, 0, 0, 1, 0, 1],
+                             [0, 0, 1, 0, 0, 1, 1],
+                             [0, 0, 0, 1, 1, 1, 1]])
+        self.assertEqual(len(C.decoder), 8)
+        self.assertTrue(C.decoder.complete)
+        c = C.encode([1, 0, 1, 1])
+        for j in range(7):
+            r = list(c)
+            r[j] ^= 1
+            self.assertEqual(C.decode(r), c)
+            self.assertEqual(sum(C.decoder.coset_leader(C.syndrome(r))), 1)
+        R = [[x, x] for x in c]
+        R[3][1] ^= 1
+        self.assertEqual(C.decode_batch(R), [[x, x] for x in c])
+
+    def test_limits(self):
+        C = LinearCode(GF3, [[1, 0, 1, 2, 1], [0, 1, 2, 2, 0]])
+        full = SyndromeDecoder(C)
+        lazy = SyndromeDecoder(C, lazy=True)
+        small = SyndromeDecoder(C, max_entries=5)
+        self.assertEqual((len(full), len(lazy), len(small)), (27, 0, 5))
+        for r in ([2, 2, 2, 2, 2], [1, 0, 0, 0, 0], [0, 1, 2, 0, 1]):
+            c = full.decode(r)
+            self.assertIn(c, C)
+            self.assertEqual(lazy.decode(r), c)
+            self.assertEqual(small.decode(r), c)
+        self.assertEqual(len(lazy), 3)
+        self.assertEqual(len(small), 5)
+
+class TestMatrices(unittest.TestCase):
+    L = [[1, 2, 0, 4], [3, 1, 1, 0], [4, 4, 1, 4]]
+
+    def test_storage(self):
+        M = GFMatrix(GF5, [[1, 2, 7], [3, 4, 5]])
+        self.assertEqual(M.tolist(), [[1, 2, 2], [3, 4, 0]])
+        self.assertEqual(M.shape, (2, 3))
+        self.assertEqual(M._data.typecode, "B")
+        self.assertEqual(GFMatrix(GF(65536), [[1]])._data.typecode, "H")
+        self.assertRaises(ValueError, GFMatrix, GF5, [[1, 2], [3]])
+        self.assertRaises(ValueError, GFMatrix, GF4, [[4]])
+
+        row = M[1]
+        row[0] = 6
+        self.assertEqual(M[1, 0], 1)
+        self.assertEqual(M[1], [1, 4, 0])
+        self.assertEqual(row[::-1], [0, 4, 1])
+        T = M.T
+        self.assertEqual(T.tolist(), [[1, 1], [2, 4], [2, 0]])
+        T[2, 1] = 3
+        self.assertEqual(M[1, 2], 3)
+        self.assertEqual(M.column(1), [2, 4])
+        self.assertEqual(GFMatrix.identity(GF5, 2), [[1, 0], [0, 1]])
+        self.assertEqual(GFMatrix.zeros(GF5, 1, 2), [[0, 0]])
+
+    def test_slices(self):
+        M = GFMatrix(GF5, [[1, 2, 3], [4, 0, 1], [2, 2, 4]])
+        self.assertEqual(M[:, 0], [1, 4, 2])
+        self.assertEqual(M[1:, 2], [1, 4])
+        self.assertEqual(M[0, 1:], [2, 3])
+        self.assertEqual(M[::2, ::-1], [[3, 2, 1], [4, 2, 2]])
+        self.assertEqual(M[1:, :2].T, [[4, 2], [0, 2]])
+        self.assertEqual(M[3:, :].shape, (0, 3))
+        self.assertIsInstance(M[1:], GFMatrix)
+        self.assertEqual(M[1:], M[1:, :])
+        self.assertEqual(M[5:].shape, (0, 3))
+        M[:, 0] = [0, 0, 6]
+        M[:2, 1:] = [[1, 1], [1, 1]]
+        self.assertEqual(M, [[0, 1, 1], [0, 1, 1], [1, 2, 4]])
+        with self.assertRaises(ValueError):
+            M[:2, :2] = [[1, 1]]
+        rows = M[1:]
+        rows[0, 0] = 3
+        M[2:] = [[4, 4, 4]]
+        self.assertEqual(M, [[0, 1, 1], [3, 1, 1], [4, 4, 4]])
+        self.assertEqual(rows, [[3, 1, 1], [4, 4, 4]])
+
+    def test_buffer(self):
+        M = GFMatrix(GF(65536), [[1, 2], [3, 40000]])
+        view = M.data
+        self.assertEqual((view.format, view.shape), ("H", (2, 2)))
+        self.assertEqual(view.tolist(), M.tolist())
+        self.assertRaises(BufferError, lambda: M.T.data)
+        self.assertEqual(M.T.copy().data.tolist(), [[1, 3], [2, 40000]])
+
+    def test_field_methods(self):
+        for F in (GF2, GF5, GF4):
+            L = F.identity([[x % F.size for x in row] for row in self.L])
+            M = GFMatrix(F, L)
+            (R, pivots) = F.rref_with_pivots(M)
+            self.assertIsInstance(R, GFMatrix)
+            self.assertEqual((R, pivots), tuple(F.rref_with_pivots(L)))
+            self.assertEqual(F.rref(M), F.rref(L))
+            self.assertEqual(F.rank(M.T), F.rank(L))
+            self.assertEqual(F.encode(M, [1, 0, 1]), F.encode(L, [1, 0, 1]))
+            W = [[1, 0], [1, 1], [0, 1]]
+            self.assertEqual(F.encode_batch(M, GFMatrix(F, W)),
+                             F.encode_batch(L, W))
+            self.assertIsInstance(F.add(M[0], M[1]), GFVector)
+            self.assertEqual(F.add(M[0], M[1]), F.add(L[0], L[1]))
+            self.assertEqual(F.dot_vec(M[0], M[2]), F.dot_vec(L[0], L[2]))
+            F.rref_with_pivots(M, inplace=True)
+            self.assertEqual(M, R)
+
+    @unittest.skipIf(np is None, "NumPy is not installed")
+    def test_numpy(self):
+        M = GFMatrix(GF7, [[1, 2, 3], [4, 5, 6]])
+        A = np.asarray(M)
+        self.assertEqual(A.T.tolist(), np.asarray(M.T).tolist())
+        A[0, 0] = 5
+        self.assertEqual(M[0, 0], 5)
+        # copy=True copies, and copy=False refuses to
+        B = np.array(M, copy=True)
+        B[0, 0] = 6
+        self.assertEqual(M[0, 0], 5)
+        self.assertEqual(np.array(M[0], copy=True).tolist(), [5, 2, 3])
+        with self.assertRaises(ValueError):
+            np.array(M, dtype=np.float64, copy=False)
+        self.assertEqual(np.asarray(M[::-1, 1:]).tolist(), [[5, 6], [2, 3]])
+        self.assertEqual(GF7.encode_batch(np.array(M.tolist()), np.asarray(
+            GFMatrix(GF7, [[1], [1]]))).tolist(), [[2], [0], [2]])
+
+class TestPolynomials(unittest.TestCase):
+    def test_arithmetic(self):
+        f = GFPoly(GF7, [1, 0, 2, 0])
+        g = GFPoly.from_roots(GF7, [1, 2])
+        self.assertEqual(f.coeffs, (1, 0, 2))
+        self.assertEqual(g.coeffs, (2, 4, 1))
+        self.assertEqual((f + g).coeffs, (3, 4, 3))
+        self.assertEqual((f - f).degree, -1)
+        self.assertEqual((f * g).coeffs, (2, 4, 5, 1, 2))
+        self.assertEqual(divmod(f * g + 1, g), (f, GFPoly(GF7, [1])))
+        self.assertEqual((f * 3)(1), 2)
+        self.assertEqual(str(f), "2x^2 + 1")
+        self.assertEqual(GFPoly(GF4, [1, a, b]) * GFPoly(GF4, [a, 1]),
+                         GFPoly(GF4, [a, a, b, b]))
+        self.assertRaises(ZeroDivisionError, divmod, f, GFPoly(GF7))
+
+    def test_karatsuba(self):
+        import random
+        rng = random.Random(0)
+        for F in (GF2, GF7, GF(256, poly=0x11d), GF(9)):
+            f = [rng.randrange(F.size) for _ in range(150)]
+            g = [rng.randrange(F.size) for _ in range(97)]
+            expected = GFPoly(F, polynomials._schoolbook(F, f, g)
+                              if not F._modular else
+                              [c % F.size for c in
+                               polynomials._schoolbook(F, f, g)])
+            self.assertEqual(GFPoly(F, f) * GFPoly(F, g), expected)
+
+    def test_gcd(self):
+        F = GF(256, poly=0x11d)
+        (f, g, h) = (GFPoly(F, [3, 1, 7]), GFPoly(F, [9, 1]),
+                     GFPoly(F, [5, 200, 1]))
+        self.assertEqual(gcd(f * h, g * h), h)
+        (d, s, t) = xgcd(f * h, g * h)
+        self.assertEqual(d, h)
+        self.assertEqual(s * f * h + t * g * h, d)
+
+    def test_evaluation(self):
+        F = GF(256, poly=0x11d)
+        f = GFPoly(F, range(1, 60))
+        self.assertEqual(f.evaluate_many(F.elements),
+                         [f(x) for x in F.elements])
+        xs = [0, 1, 5, 77, 255]
+        ys = [3, 0, 9, 9, 1]
+        p = interpolate(F, xs, ys)
+        self.assertEqual(p.evaluate_many(xs), ys)
+        self.assertEqual(p.degree, 4)
+        self.assertEqual(interpolate(GF5, [1, 2, 3], [2, 4, 1]),
+                         GFPoly(GF5, [0, 2]))
+        self.assertRaises(ValueError, interpolate, GF5, [1, 2, 3], [2, 4])
+        self.assertRaises(ValueError, interpolate, GF5, [1, 2], [2, 4, 1])
+        self.assertRaises(ValueError, interpolate, GF7, [0, 7], [1, 2])
+        self.assertEqual(interpolate(GF5, [6, 7, 8], [2, 4, 1]),
+                         GFPoly(GF5, [0, 2]))
+        self.assertEqual(GFPoly(GF5, [1, 1]) ** 0, GFPoly(GF5, [1]))
+        with self.assertRaises(ValueError):
+            GFPoly(GF5, [1, 1]) ** -1
+        self.assertEqual(GFPoly(GF5, [1, 2, 3]).derivative(),
+                         GFPoly(GF5, [2, 1]))
+
+class TestReedSolomon(unittest.TestCase):
+    def setUp(self):
+        import random
+        self.rng = random.Random(1)
+
+    def corrupt(self, c, positions):
+        r = bytearray(c)
+        for i in positions:
+            r[i] ^= self.rng.randrange(1, 256)
+        return bytes(r)
+
+    def test_encode(self):
+        RS = ReedSolomon(20, 12)
+        m = bytes(range(1, 13))
+        c = RS.encode(m)
+        self.assertEqual(c[:12], m)
+        self.assertTrue(RS.check(c))
+        self.assertEqual(RS.syndromes(c), [0] * 8)
+        C = LinearCode(RS.field, RS.generator_matrix())
+        self.assertEqual(list(c), C.encode(list(m)))
+        self.assertEqual(RS.generator.degree, 8)
+        self.assertEqual(RS.encode(list(m)), list(c))
+        self.assertRaises(ValueError, RS.encode, m[:5])
+        self.assertRaises(ValueError, ReedSolomon, 256, 10)
+        self.assertRaises(ValueError, ReedSolomon, 10, 4, GF7)
+
+    def test_decode(self):
+        for (n, k, first_root) in ((255, 223, 0), (30, 20, 1), (12, 4, 5)):
+            RS = ReedSolomon(n, k, first_root=first_root)
+            for e in range(0, (n - k) // 2 + 1):
+                s = n - k - 2 * e
+                m = bytes(self.rng.randrange(256) for _ in range(k))
+                positions = self.rng.sample(range(n), e + s)
+                r = self.corrupt(RS.encode(m), positions)
+                self.assertEqual(RS.decode(r, erasures=positions[e:]), m)
+                (c, count) = RS.correct(r, erasures=positions[e:])
+                self.assertEqual(c, RS.encode(m))
+                self.assertEqual(count, e + s)
+        RS = ReedSolomon(30, 20)
+        r = self.corrupt(RS.encode(bytes(20)), range(6))
+        self.assertRaises(ValueError, RS.decode, r)
+        self.assertRaises(ValueError, RS.decode, r, range(11))
+
+    def test_small_field(self):
+        RS = ReedSolomon(15, 9, GF(16))
+        m = [self.rng.randrange(16) for _ in range(9)]
+        r = RS.encode(m)
+        (r[2], r[11], r[14]) = (r[2] ^ 5, r[11] ^ 1, r[14] ^ 15)
+        self.assertEqual(RS.decode(r), m)
+        self.assertRaises(ValueError, RS.encode, [16] * 9)
+        self.assertRaises(ValueError, RS.encode, [-1] + [0] * 8)
+        self.assertRaises(ValueError, RS.decode, [0] * 14 + [-1])
+
+    def batch(self):
+        RS = ReedSolomon(40, 32)
+        messages = [bytes(self.rng.randrange(256) for _ in range(32))
+                    for _ in range(20)]
+        codewords = RS.encode_batch(messages)
+        self.assertEqual(codewords, [RS.encode(m) for m in messages])
+        received = list(codewords)
+        received[3] = self.corrupt(received[3], [0, 39])
+        received[5] = self.corrupt(received[5], range(5))
+        received[7] = self.corrupt(received[7], [1, 2, 3, 4])
+        erasures = [()] * 20
+        erasures[7] = [1, 2, 3, 4]
+        (decoded, errors) = RS.decode_batch(received, erasures)
+        self.assertEqual(list(errors), [0, 0, 0, 2, 0, -1, 0, 4] + [0] * 12)
+        self.assertEqual(decoded[:5] + decoded[6:], messages[:5] +
+                         messages[6:])
+        self.assertEqual(decoded[5], received[5][:32])
+        return (RS, messages, received)
+
+    def test_batch(self):
+        self.batch()
+
+    def test_batch_without_numpy(self):
+        saved = reedsolomon.np
+        reedsolomon.np = None
+        try:
+            self.batch()
+        finally:
+            reedsolomon.np = saved
+
+    @unittest.skipIf(np is None, "NumPy is not installed")
+    def test_batch_arrays(self):
+        (RS, messages, received) = self.batch()
+        M = np.frombuffer(b"".join(messages), np.uint8).reshape(20, 32)
+        C = RS.encode_batch(M)
+        self.assertEqual(C.shape, (20, 40))
+        R = np.frombuffer(b"".join(received), np.uint8).reshape(20, 40)
+        (D, errors) = RS.decode_batch(R)
+        self.assertEqual(D.shape, (20, 32))
+        self.assertTrue((D[:5] == M[:5]).all())
+
+class TestCyclic(unittest.TestCase):
+    def setUp(self):
+        import random
+        self.rng = random.Random(2)
+
+    def poly(self, F, c):
+        """Returns codeword c as a polynomial, symbol 0 highest"""
+        return GFPoly(F, c[::-1])
+
+    def check_code(self, C, trials=20):
+        F = C.field
+        L = LinearCode(F, C.G)
+        self.assertTrue(F.is_pc_matrix(C.G, C.H))
+        self.assertEqual(C.k, C.n - C.generator.degree)
+        for _ in range(trials):
+            w = [self.rng.randrange(F.size) for _ in range(C.k)]
+            c = C.encode(w)
+            self.assertEqual(c, L.encode(w))
+            self.assertEqual(c[:C.k], w)
+            self.assertEqual(C.extract(c), w)
+            self.assertFalse(self.poly(F, c) % C.generator)
+            r = [self.rng.randrange(F.size) for _ in range(C.n)]
+            s = (self.poly(F, r) % C.generator).coeffs
+            s = list(s) + [0] * (C.generator.degree - len(s))
+            self.assertEqual(C.syndrome(r), s)
+            self.assertEqual(C.syndrome(r), F._combine(r, C.H))
+
+    def test_hamming(self):
+        C = CyclicCode(GF2, 7, [1, 1, 0, 1])
+        self.assertEqual((C.n, C.k), (7, 4))
+        self.assertEqual(C.generator * C.parity_polynomial,
+                         GFPoly.monomial(GF2, 7) - 1)
+        self.check_code(C)
+        c = C.encode([1, 0, 1, 1])
+        self.assertEqual(c, [1, 0, 1, 1, 0, 0, 0])
+        for i in range(7):
+            r = list(c)
+            r[i] ^= 1
+            self.assertEqual(C.decode(r), c)
+        self.assertEqual(C.minimum_distance(), 3)
+        self.assertRaises(ValueError, C.encode, [1, 0, 1])
+        self.assertEqual(C.encode([1, 0, 2, 1]), C.encode([1, 0, 0, 1]))
+        self.assertRaises(ValueError, CyclicCode, GF2, 7, [1, 1, 1, 1])
+        self.assertRaises(ValueError, CyclicCode, GF2, 3, [1, 1, 0, 1])
+
+    def test_unreduced_symbols(self):
+        # Unreduced ints are reduced, as by LinearCode over GF(2) and GF(3)
+        C = CyclicCode(GF2, 7, [1, 1, 0, 1])
+        L = LinearCode(GF2, C.G)
+        for w in ([2, 0, 0, 0], [-1, 0, 3, 0]):
+            self.assertEqual(C.encode(w), L.encode(w))
+        self.assertEqual(C.syndrome([2, 0, 0, 0, -1, 0, 0]),
+                         C.syndrome([0, 0, 0, 0, 1, 0, 0]))
+        C3 = CyclicCode(GF3, 4, [1, 0, 1])
+        self.assertEqual(C3.encode([4, -1]), C3.encode([1, 2]))
+
+    def test_fields(self):
+        self.check_code(CyclicCode(GF2, 15, [1, 0, 0, 0, 1, 0, 1, 1, 1]))
+        self.check_code(CyclicCode(GF3, 4, [1, 0, 1]))
+        self.check_code(CyclicCode(GF4, 3, GFPoly.from_roots(GF4, [2])))
+        self.check_code(CyclicCode(GF7, 6, GFPoly.from_roots(GF7, [3, 2])))
+        F = GF(256, poly=0x11d)
+        g = GFPoly.from_roots(F, [F._exp[j] for j in range(6)])
+        C = CyclicCode(F, 255, g)
+        self.check_code(C, 3)
+        RS = ReedSolomon(255, 249)
+        m = [self.rng.randrange(256) for _ in range(249)]
+        self.assertEqual(C.encode(m), RS.encode(m))
+
+    def test_crc(self):
+        data = b"123456789"
+        # Check values from the catalogue of parametrised CRC algorithms
+        for (args, check) in (
+                ((0x104C11DB7, 0xFFFFFFFF, True, 0xFFFFFFFF), 0xCBF43926),
+                ((0x104C11DB7, 0xFFFFFFFF, False, 0xFFFFFFFF), 0xFC891918),
+                ((0x11021, 0, False, 0), 0x31C3),
+                ((0x11021, 0, True, 0), 0x2189),
+                ((0x18005, 0, True, 0), 0xBB3D),
+                ((0x107, 0, False, 0), 0xF4),
+                ((0x25, 0x1F, True, 0x1F), 0x19),
+                ((0xB, 0, False, 7), 0x4)):
+            crc = CRC(*args)
+            self.assertEqual(crc.checksum(data), check)
+            raw = crc._table_update(crc.init, data) ^ crc.xorout
+            self.assertEqual(raw, check)
+            self.assertEqual(crc.checksum(data[4:], crc.checksum(data[:4])),
+                             check)
+            self.assertEqual(crc.checksum_stream(io.BytesIO(data), 2), check)
+            self.assertEqual(crc.checksum_stream(data), check)
+        self.assertEqual(CRC(GFPoly(GF2, [1, 1, 0, 1])).width, 3)
+        self.assertRaises(ValueError, CRC, 1)
+        self.assertRaises(ValueError, CRC, 0x107, init=0x100)
+
+    def test_crc_builtin(self):
+        import binascii
+        import zlib
+        data = bytes(self.rng.randrange(256) for _ in range(1000))
+        crc = CRC(0x104C11DB7, init=0xFFFFFFFF, reflect=True,
+                  xorout=0xFFFFFFFF)
+        self.assertEqual(crc._table_update(0xFFFFFFFF, data) ^ 0xFFFFFFFF,
+                         zlib.crc32(data))
+        crc = CRC(0x11021, init=0x1D0F)
+        self.assertEqual(crc._table_update(0x1D0F, data),
+                         binascii.crc_hqx(data, 0x1D0F))
+
+
+class TestStream(unittest.TestCase):
+    G = [[1, 0, 0, 0, 1, 1, 0],
+         [0, 1, 0, 0, 1, 0, 1],
+         [0, 0, 1, 0, 0, 1, 1],
+         [0, 0, 0, 1, 1, 1, 1]]
+
+    def roundtrip(self, C, data, correct=True):
+        encoded = io.BytesIO()
+        stats = stream.encode_stream(C, io.BytesIO(data), encoded, batch=3)
+        self.assertEqual(stats.bytes_in, len(data))
+        self.assertEqual(stats.bytes_out, len(encoded.getvalue()))
+        decoded = io.BytesIO()
+        stream.decode_stream(C, encoded.getvalue(), decoded,
+                             length=len(data), correct=correct, batch=5)
+        self.assertEqual(decoded.getvalue(), data)
+        return encoded.getvalue()
+
+    def test_roundtrip(self):
+        data = bytes(range(256)) * 3 + b"tail"
+        self.assertEqual(len(self.roundtrip(LinearCode(GF2, self.G), data)),
+                         (len(data) * 2 * 7 + 7) // 8)
+        F = GF(256, poly=0x11d)
+        C = LinearCode(F, [[1, 0, 7], [0, 1, 200]])
+        self.assertEqual(len(self.roundtrip(C, data)), len(data) * 3 // 2)
+        C = LinearCode(GF(65536), [[1, 0, 5, 7], [0, 1, 9, 3]])
+        self.assertEqual(len(self.roundtrip(C, data + b"!", False)), 1552)
+
+    def test_errors(self):
+        C = LinearCode(GF2, self.G)
+        data = b"hello world"
+        encoded = io.BytesIO()
+        stream.encode_stream(C, data, encoded)
+        corrupted = bytearray(encoded.getvalue())
+        corrupted[3] ^= 0x10
+        self.assertEqual(stream.check_stream(C, bytes(corrupted)).errors, 1)
+        decoded = io.BytesIO()
+        stats = stream.decode_stream(C, corrupted, decoded, length=len(data))
+        self.assertEqual((decoded.getvalue(), stats.errors), (data, 1))
+        C = LinearCode(GF(256), [[1, 0, 1, 1], [0, 1, 1, 2]])
+        self.assertRaises(ValueError, stream.check_stream, C, b"\0" * 5)
+        self.assertRaises(ValueError, stream.encode_stream,
+                          LinearCode(GF3, [[1, 2]]), b"", io.BytesIO())
+
+class TestService(unittest.TestCase):
+    G = [[1, 0, 0, 0, 1, 1, 0],
+         [0, 1, 0, 0, 1, 0, 1],
+         [0, 0, 1, 0, 0, 1, 1],
+         [0, 0, 0, 1, 1, 1, 1]]
+
+    def words(self, count):
+        return [[(i >> b) & 1 for b in range(4)] for i in range(count)]
+
+    def test_batches(self):
+        C = LinearCode(GF2, self.G)
+        words = self.words(20)
+
+        async def client():
+            async with BatchingService(C, max_batch=8,
+                                       max_latency=0.01) as service:
+                codewords = await asyncio.gather(*map(service.encode, words))
+                received = [list(c) for c in codewords]
+                received[3][5] ^= 1
+                decoded = await asyncio.gather(*map(service.decode, received))
+                return (codewords, decoded, service.stats())
+
+        (codewords, decoded, stats) = asyncio.run(client())
+        self.assertEqual(codewords, [C.encode(w) for w in words])
+        self.assertEqual(decoded, codewords)
+        # 8, 8 and 4 words each way
+        self.assertEqual((stats.requests, stats.batches), (40, 6))
+        self.assertEqual((stats.queued, stats.running), (0, 0))
+        self.assertEqual(stats.peak_queued, 8)
+
+    def test_deadline(self):
+        C = LinearCode(GF2, self.G)
+
+        async def client():
+            service = BatchingService(C, max_batch=100, max_latency=0.05)
+            start = time.monotonic()
+            task = asyncio.ensure_future(service.encode([1, 0, 1, 1]))
+            await asyncio.sleep(0)
+            self.assertEqual(service.queue_depth, 1)
+            codeword = await task
+            self.assertGreaterEqual(time.monotonic() - start, 0.04)
+            await service.close()
+            with self.assertRaises(RuntimeError):
+                await service.encode([1, 0, 1, 1])
+            return (codeword, service.stats())
+
+        (codeword, stats) = asyncio.run(client())
+        self.assertEqual(codeword, C.encode([1, 0, 1, 1]))
+        self.assertEqual((stats.requests, stats.batches), (1, 1))
+
+    def test_bad_word(self):
+        # A bad word fails alone, not the batch it is in
+        C = LinearCode(GF4, [[1, 0, 1], [0, 1, 1]])
+
+        async def client():
+            async with BatchingService(C, max_latency=0.01) as service:
+                return await asyncio.gather(
+                    service.encode([1, 2]), service.encode([3, 1]),
+                    service.encode([9, 1]), service.encode([2, 5]),
+                    return_exceptions=True)
+
+        results = asyncio.run(client())
+        self.assertEqual(results[:2], [C.encode([1, 2]), C.encode([3, 1])])
+        self.assertIsInstance(results[2], ValueError)
+        self.assertIsInstance(results[3], ValueError)
+        self.assertIsNot(results[2], results[3])
+
+    def test_errors(self):
+        RS = ReedSolomon(15, 11, GF(16))
+        messages = [bytes(range(i, i + 11)) for i in range(5)]
+
+        async def client():
+            async with BatchingService(RS, max_latency=0) as service:
+                with self.assertRaises(ValueError):
+                    await service.encode(b"short")
+                codewords = await asyncio.gather(*map(service.encode,
+                                                      messages))
+                received = [bytearray(c) for c in codewords]
+                received[1][:5] = bytes(5)
+                return (codewords, await asyncio.gather(
+                    *map(service.decode, received), return_exceptions=True))
+
+        (codewords, decoded) = asyncio.run(client())
+        self.assertEqual(codewords, [RS.encode(m) for m in messages])
+        self.assertIsInstance(decoded[1], ValueError)
+        del decoded[1], messages[1]
+        self.assertEqual(decoded, messages)
+
+
+class TestTableCache(unittest.TestCase):
+    def setUp(self):
+        import tempfile
+        self.tmp = tempfile.TemporaryDirectory()
+        self.cache = TableCache(self.tmp.name)
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def corrupt(self, key, offset):
+        path = self.cache.path(key)
+        with open(path, "r+b") as f:
+            f.seek(offset)
+            byte = f.read(1)
+            f.seek(offset)
+            f.write(bytes([byte[0] ^ 1]))
+
+    def test_store_load(self):
+        arrays = {"small": [1, 2, 3], "signed": [-1, 5], "big": [1 << 40],
+                  "empty": []}
+        self.assertTrue(self.cache.store("key", arrays))
+        loaded = self.cache.load("key")
+        self.assertEqual({name: view.tolist()
+                          for (name, view) in loaded.items()}, arrays)
+        self.assertEqual(loaded["small"].itemsize, 1)
+        self.assertIsNone(self.cache.load("other"))
+        self.assertEqual((self.cache.hits, self.cache.misses), (1, 1))
+        self.assertFalse(self.cache.store("huge", {"a": [1 << 64]}))
+        self.assertRaises(ValueError, self.cache.store, "key",
+                          {"a name that is too long": [1]})
+        self.assertEqual(len(self.cache), 1)
+
+    def test_integrity(self):
+        self.cache.store("key", {"a": list(range(100))})
+        self.corrupt("key", cache._HEADER.size + 50)
+        self.assertIsNone(self.cache.load("key"))
+        self.cache.store("key", {"a": list(range(100))})
+        self.corrupt("key", 8)      # the version
+        self.assertIsNone(self.cache.load("key"))
+        # A file under the wrong key, as from a hash collision
+        self.cache.store("key", {"a": [1]})
+        os.replace(self.cache.path("key"), self.cache.path("other"))
+        self.assertIsNone(self.cache.load("other"))
+
+    def test_rejected_file_unmapped(self):
+        self.cache.store("key", {"a": list(range(100))})
+        self.corrupt("key", cache._HEADER.size + 50)
+        mapped = []
+        original = cache.mmap.mmap
+
+        def record(*args, **kwargs):
+            mapped.append(original(*args, **kwargs))
+            return mapped[-1]
+        cache.mmap.mmap = record
+        try:
+            self.assertIsNone(self.cache.load("key"))
+        finally:
+            cache.mmap.mmap = original
+        self.assertTrue(mapped[0].closed)
+
+    def test_eviction(self):
+        for i in range(4):
+            self.cache.store("key %d" % i, {"a": list(range(1000))})
+        os.utime(self.cache.path("key 0"), (1, 1))
+        os.utime(self.cache.path("key 2"), (2, 2))
+        size = os.path.getsize(self.cache.path("key 1"))
+        self.cache.max_bytes = 2 * size
+        self.cache.load("key 0")    # now most recently used
+        self.cache.evict()
+        self.assertEqual(len(self.cache), 2)
+        self.assertIsNone(self.cache.load("key 2"))
+        self.assertIsNotNone(self.cache.load("key 0"))
+        self.cache.clear()
+        self.assertEqual(self.cache.size, 0)
+
+    def test_field_tables(self):
+        for (size, poly) in ((7, None), (16, None), (27, None),
+                             (256, 0x11d)):
+            GF(size, poly=poly, cache=self.cache)
+            F = GF(size, poly=poly, cache=self.cache)
+            R = GF(size, poly=poly)
+            self.assertEqual((F._exp, F._log, F._inv, F._zech),
+                             (R._exp, R._log, R._inv, R._zech))
+        self.assertEqual((self.cache.hits, self.cache.misses), (4, 4))
+
+    def test_code_artifacts(self):
+        F = GF(3, cache=self.cache)
+        G = [[1, 0, 1, 2, 0], [0, 1, 1, 1, 2]]
+        C = LinearCode(F, G)
+        D = SyndromeDecoder(C)
+        hits = self.cache.hits
+        C2 = LinearCode(F, G)
+        D2 = SyndromeDecoder(C2)
+        self.assertEqual(self.cache.hits, hits + 2)     # H and the leaders
+        self.assertEqual((C2.rref, C2.pivots, C2.H), (C.rref, C.pivots, C.H))
+        self.assertEqual(self.cache.hits, hits + 3)
+        self.assertEqual(D2._leaders, D._leaders)
+        self.assertEqual(D2._weight, D._weight)
+        r = [2, 2, 0, 1, 1]
+        self.assertEqual(D2.decode(r), D.decode(r))
+        self.assertEqual(SyndromeDecoder(C2, max_entries=3)._leaders,
+                         SyndromeDecoder(LinearCode(GF3, G),
+                                         max_entries=3)._leaders)
+
+
+@unittest.skipIf(np is None, "NumPy is not installed")
+class TestNumPy(unittest.TestCase):
+    def test_matches_lists(self):
+        for F in (GF2, GF4, GF7, GF(9), GF(256), GF(256, tables=False)):
+            u = [(3 * i + 1) % F.size for i in range(20)]
+            v = [(7 * i + 2) % F.size for i in range(20)]
+            (U, V) = (np.array(u), np.array(v))
+            self.assertEqual(F.add(U, V).tolist(), F.add(u, v))
+            self.assertEqual(F.scale_vec(F.size - 1, V).tolist(),
+                             F.scale_vec(F.size - 1, v))
+            self.assertEqual(F._mult_vec(U, V).tolist(), F._mult_vec(u, v))
+            self.assertEqual(F.dot_vec(U, V), F.dot_vec(u, v))
+
+    def test_returns_arrays(self):
+        self.assertIsInstance(GF7.add_vec(np.array([1, 2]), np.array([6, 6])),
+                              np.ndarray)
+        self.assertIsInstance(GF4.add_inverse(np.array([a, b])), np.ndarray)
+        self.assertEqual(GF11.add_inverse(np.array([2, 0])).tolist(), [9, 0])
+        self.assertEqual(GF4.encode(np.array([[a, a, 1, b],
+                                              [0, b, a, 1],
+                                              [a, 1, 0, a]]),
+                                    np.array([a, 1, b])).tolist(),
+                         [a, b, 0, 1])
+        with self.assertRaises(ValueError):
+            GF7.add(np.array([1, 2]), np.array([1, 2, 3]))
+        with self.assertRaises(ValueError):
+            GF4.identity(np.array([1, 4]))
+
+    def test_encode_batch(self):
+        for F in (GF2, GF7, GF(256)):
+            G = [[(i * j + 1) % F.size for j in range(7)] for i in range(3)]
+            W = [[(i + 5 * j) % F.size for j in range(10)] for i in range(3)]
+            C = F.encode_batch(np.array(G), np.array(W))
+            self.assertIsInstance(C, np.ndarray)
+            self.assertEqual(C.tolist(), F.encode_batch(G, W))
+
+    def test_linear_code(self):
+        C = LinearCode(GF2, np.array([[1, 0, 1, 1], [0, 1, 0, 1]]))
+        c = C.encode(np.array([1, 1]))
+        self.assertEqual(c.tolist(), [1, 1, 1, 0])
+        self.assertEqual(C.syndrome(c).tolist(), [0, 0])
+        self.assertIn(c, C)
+        R = np.array([[1, 1], [1, 1], [1, 1], [0, 1]])
+        self.assertEqual(C.syndrome_batch(R).tolist(), [[0, 0], [0, 1]])
+        self.assertEqual(C.decode_batch(R).tolist(),
+                         [[1, 1], [1, 0], [1, 1], [0, 1]])
+
+class TestBounds(unittest.TestCase):
+    def test_exact(self):
+        self.assertEqual(bounds.choose(300, 150) % 1000, 424)
+        self.assertEqual(bounds.choose(5, 6), 0)
+        self.assertEqual(bounds.ball_volume(7, 1), 8)
+        self.assertEqual(bounds.ball_volume(4, 2, 3), 33)
+        self.assertEqual(bounds.hamming_bound(7, 3), 16)
+        self.assertEqual(bounds.lower_bound(7, 3), 5)
+        self.assertEqual(bounds.hamming_bound(500, 41, 2),
+                         2**500 // sum(bounds.choose(500, i)
+                                       for i in range(21)))
+        self.assertEqual(bounds.lower_bound(5, 0), -1)
+
+    def test_volume_cache(self):
+        from concurrent.futures import ThreadPoolExecutor
+        bounds._volumes.cache_clear()
+        for n in range(2 * bounds.VOLUME_CACHE_SIZE):
+            bounds.ball_volume(n, 2)
+        self.assertEqual(bounds._volumes.cache_info().currsize,
+                         bounds.VOLUME_CACHE_SIZE)
+        expected = [sum(bounds.choose(200, i) * 2**i for i in range(r + 1))
+                    for r in range(200)]
+        radii = range(199, -1, -1)
+        with ThreadPoolExecutor(8) as executor:
+            volumes = list(executor.map(bounds.ball_volume, [200] * 200,
+                                        radii, [3] * 200))
+        self.assertEqual(volumes, [expected[r] for r in radii])
+
+    def test_krawtchouk_cache(self):
+        bounds._krawtchouk.cache_clear()
+        for n in range(2 * bounds.KRAWTCHOUK_CACHE_SIZE):
+            bounds.krawtchouk(n % 40, 2 + n // 40)
+        self.assertEqual(bounds._krawtchouk.cache_info().currsize,
+                         bounds.KRAWTCHOUK_CACHE_SIZE)
+        self.assertIs(bounds.krawtchouk(5, 3), bounds.krawtchouk(5, 3))
+
+    def test_grid(self):
+        grid = bounds.bound_grid(range(1, 30), range(1, 30), 3)
+        self.assertEqual(len(grid), 29 * 30 // 2)
+        for b in grid:
+            self.assertEqual(b.singleton, bounds.singleton_bound(b.n, b.d, 3))
+            self.assertEqual(b.hamming, bounds.hamming_bound(b.n, b.d, 3))
+            self.assertEqual(b.lower, bounds.lower_bound(b.n, b.d, 3))
+
+    def test_more_bounds(self):
+        self.assertEqual(bounds.krawtchouk(3), [[1, 1, 1, 1], [3, 1, -1, -3],
+                                                [3, -1, -1, 3], [1, -1, 1, -1]])
+        # The Golay codes meet the LP bound
+        self.assertEqual(bounds.lp_bound(23, 7), 4096)
+        self.assertEqual(bounds.lp_bound(24, 8), 4096)
+        self.assertEqual(bounds.lp_bound(11, 5, 3), 729)
+        self.assertEqual(bounds.plotkin_bound(9, 4), 32)
+        self.assertEqual(bounds.plotkin_bound(5, 4, 3), 6)
+        self.assertEqual(bounds.griesmer_bound(7, 3), 16)
+        self.assertEqual(bounds.griesmer_bound(4, 3, 3), 9)
+        self.assertEqual(bounds.elias_bound(24, 8), 7772)
+
+    def test_table(self):
+        table = bounds.bound_table(range(4, 12), range(1, 12))
+        for b in table:
+            self.assertEqual(b.best, min(b.singleton, b.hamming, b.plotkin,
+                                         b.lp, b.elias if b.elias != -1
+                                         else b.singleton))
+            self.assertGreaterEqual(b.best, b.lower)
+        self.assertIsNone(bounds.bound_table([7], [3], lp=False)[0].lp)
+
+class TestTracing(unittest.TestCase):
+    M = [[0, 0, b, 0],
+         [0, 0, 0, 0],
+         [a, 0, b, 1],
+         [1, 0, a, b]]
+
+    def test_events(self):
+        tracer = tracing.ListTracer()
+        F = GF(4, tracer=tracer)
+        self.assertTrue(F.verbose)
+        R = F.rref(self.M)
+        self.assertEqual(R, GF4.rref(self.M))
+        names = [e.name for e in tracer.events]
+        self.assertEqual(names[:5], ["rref.start", "rref.exchange", "rref.plan",
+                                     "rref.add", "rref.scale"])
+        add = tracer.events[3].data
+        self.assertEqual((add["multiplier"], add["source"], add["target"]),
+                         (b, 0, 3))
+        self.assertEqual(tracer.events[-1].data["matrix"], R)
+
+        tracer.clear()
+        F.rref(self.M, verbose=False)
+        self.assertEqual(tracer.events, [])
+        GF(983, tracer=tracer).mult_inverse(444)
+        self.assertEqual(tracer.events[-1].data, {"result": 507})
+        self.assertEqual(tracer.events[1].data["quotient"], 2)
+
+    def test_disabled(self):
+        F = GF(7, tracer=tracing.NullTracer())
+        self.assertFalse(F.verbose)
+        F.verbose = True
+        self.assertIsInstance(F.tracer, tracing.PrintTracer)
+        F.verbose = False
+        self.assertIsNone(F.tracer)
+
+    def test_backends(self):
+        out = io.StringIO()
+        GF(4, tracer=tracing.PrintTracer(out)).rref(self.M)
+        self.assertIn("| 1 0 0 3 |   Added 2 times row 2 to row 1.",
+                      out.getvalue())
+
+        records = []
+        class Handler(logging.Handler):
+            def emit(self, record):
+                records.append(record)
+        logger = logging.getLogger("galois.test")
+        logger.setLevel(logging.DEBUG)
+        logger.addHandler(Handler())
+        F = GF(3, tracer=tracing.LoggingTracer(logger))
+        self.assertFalse(F.is_pc_matrix([[1, 2, 0]], [[1, 1, 1], [1, 0, 0]]))
+        self.assertEqual([r.event for r in records], ["pc_matrix.failed"])
+        self.assertEqual((records[0].data["i"], records[0].data["j"]), (0, 1))
+
+        # A disabled logger turns tracing off altogether
+        logger.setLevel(logging.WARNING)
+        self.assertFalse(F.verbose)
+        F.rref([[1, 2], [2, 1]])
+        self.assertEqual(len(records), 1)
+        logger.setLevel(logging.DEBUG)
+        self.assertTrue(F.verbose)
+
 class TestVerbose(unittest.TestCase):
     def setUp(self):
         GF4 = GF(4)
@@ -0,0 +1,171 @@
+"""
+Tracers for step-by-step solutions.
+
+Methods of GF that support step-by-step solutions report each step to a
+tracer as an event: a name, such as "rref.add", and keyword data, such as the
+rows involved and the multiplier.  Row and column indices in the data are
+0-based.  When a field has no tracer, no events are created at all.
+
+    PrintTracer     prints each step as text (what verbose=True uses)
+    LoggingTracer   sends each event to a logging.Logger
+    ListTracer      keeps each event in a list, for inspection or audits
+    NullTracer      ignores every event
+
+Usage:
+
+    tracer = ListTracer()
+    GF3 = GF(3, tracer=tracer)
+    GF3.rref(M)
+    [event.name for event in tracer.events]
+
+Events:
+
+    rref.start              matrix
+    rref.exchange           rows, matrix
+    rref.plan               direction ("down" or "up"), row, col, matrix
+    rref.add                multiplier, source, target, matrix
+    rref.scale              row, multiplier, matrix
+    inverse.start           value, modulus
+    inverse.step            dividend, quotient, divisor, remainder, t,
+                            coefficient, new_t
+    inverse.reduce          value, modulus, result
+    inverse.result          result
+    pc_matrix.failed        i, j, u, v (row i of A and row j of B)
+
+matrix is a copy of the matrix after the step.
+"""
+from __future__ import print_function
+
+import logging
+import sys
+from collections import namedtuple
+
+__author__ = "Jerry Yin"
+
+# One recorded event, as kept by ListTracer
+TraceEvent = namedtuple("TraceEvent", "name data")
+
+
+class Tracer(object):
+    """
+    Base class of tracers.  Subclasses override event(), which is called with
+    the field reporting the step, the event name and the event data.
+    """
+    enabled = True
+
+    def event(self, field, name, **data):
+        raise NotImplementedError
+
+
+class NullTracer(Tracer):
+    """A tracer that ignores every event.  Fields treat it as no tracer"""
+    enabled = False
+
+    def event(self, field, name, **data):
+        pass
+
+
+class ListTracer(Tracer):
+    """Keeps every event, in order, as a TraceEvent in the list events"""
+
+    def __init__(self):
+        self.events = []
+
+    def event(self, field, name, **data):
+        self.events.append(TraceEvent(name, data))
+
+    def clear(self):
+        """Forgets every event recorded so far"""
+        del self.events[:]
+
+
+class LoggingTracer(Tracer):
+    """
+    Logs every event to logger (the "galois" logger by default) at level.  The
+    event name and data are attached to each record as the attributes event
+    and data, for handlers that want them structured.
+    """
+
+    def __init__(self, logger=None, level=logging.DEBUG):
+        if logger is None:
+            logger = logging.getLogger("galois")
+        self.logger = logger
+        self.level = level
+
+    @property
+    def enabled(self):
+        """
+        True iff the logger handles level, so that fields skip the work of
+        tracing while it does not
+        """
+        return self.logger.isEnabledFor(self.level)
+
+    def event(self, field, name, **data):
+        if self.logger.isEnabledFor(self.level):
+            self.logger.log(self.level, "%r %s %r", field, name, data,
+                            extra={"event": name, "data": data})
+
+
+class PrintTracer(Tracer):
+    """
+    Prints every event as the text of a step-by-step solution to file
+    (standard output by default), with 1-based indices.
+    """
+
+    def __init__(self, file=None):
+        self.file = file
+
+    def event(self, field, name, **data):
+        getattr(self, "_" + name.replace(".", "_"))(field, **data)
+
+    def _print(self, *args, **kwargs):
+        print(*args, file=self.file or sys.stdout, **kwargs)
+
+    def _matrix(self, field, M, msg):
+        self._print("")
+        for (i, row) in enumerate(M):
+            cells = " ".join(str(x).rjust(field._digits) for x in row)
+            self._print("| %s |" % cells + ("   " + msg if i == 0 else ""))
+
+    def _rref_start(self, field, matrix):
+        self._matrix(field, matrix, "Original matrix.")
+
+    def _rref_exchange(self, field, rows, matrix):
+        MSG = "Exchange rows %s and %s."
+        self._matrix(field, matrix, MSG % (rows[0] + 1, rows[1] + 1))
+
+    def _rref_plan(self, field, direction, row, col, matrix):
+        MSG = "PLAN: Pivot %s from position (%s, %s)"
+        self._matrix(field, matrix, MSG % (direction, row + 1, col + 1))
+
+    def _rref_add(self, field, multiplier, source, target, matrix):
+        MSG = "Added %s times row %s to row %s."
+        self._matrix(field, matrix, MSG % (multiplier, source + 1, target + 1))
+
+    def _rref_scale(self, field, row, multiplier, matrix):
+        MSG = "Scale row %s by %s."
+        self._matrix(field, matrix, MSG % (row + 1, multiplier))
+
+    def _inverse_start(self, field, value, modulus):
+        self._print("")
+
+    def _inverse_step(self, field, dividend, quotient, divisor, remainder, t,
+                      coefficient, new_t):
+        MSG1 = "%s = %s * %s + %s"
+        MSG2 = "   ==>   %s = %s - %s * %s"
+        MSG3 = "   ==>   t = %s - %s * %s = %s"
+        self._print(MSG1 % (dividend, quotient, divisor, remainder), end="")
+        self._print(MSG2 % (remainder, dividend, quotient, divisor), end="")
+        if remainder != 0:
+            self._print(MSG3 % (t, quotient, coefficient, new_t))
+        else:
+            self._print("")
+
+    def _inverse_reduce(self, field, value, modulus, result):
+        self._print(u"%s mod %s = %s" % (value, modulus, result))
+
+    def _inverse_result(self, field, result):
+        self._print("Multiplicative inverse is %s" % result)
+
+    def _pc_matrix_failed(self, field, i, j, u, v):
+        self._print("%s and %s are not orthogonal." % (u, v))